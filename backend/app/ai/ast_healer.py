@@ -0,0 +1,381 @@
+import re
+import ast
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.utils.logger import log
+
+# A URL is handled as a list of tokens: one str per literal character, and
+# the f-string placeholders ({base_url}, {user_id}...) as their AST nodes.
+Token = Union[str, ast.AST]
+
+HTTP_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS")
+BODY_KEYWORDS = {"content", "data", "files", "json"}
+NO_BODY_SHORTCUTS = {"GET", "HEAD", "OPTIONS", "DELETE"} # httpx.get(...) etc. take no body
+PARAM = re.compile(r"^(?:\{(\w+)(?::[^}]*)?\}|:(\w+))$") # FastAPI {id} / {id:int}, Express :id
+
+class Ambiguous(Exception):
+    """The test can't be rewritten safely: the LLM has to heal it."""
+
+class ASTHealer:
+    """
+    Heals tests broken by a plain route change without calling the LLM.
+
+    Why this?
+    Most breakages are a path or method change (`/users/{id}` became
+    `/v2/users/{id}`, PUT became PATCH). Finding the httpx calls of the old
+    route in the test's AST and rewriting their method and URL takes
+    milliseconds and costs no tokens, where an LLM heal takes seconds.
+
+    Only what's certain is rewritten: the edits are applied to the original
+    source (comments and formatting stay), path parameter values used by
+    the test are carried over, and the result must compile. Anything else
+    (several endpoints called, URLs built elsewhere, a body on a GET...)
+    raises Ambiguous, and the caller falls back to the LLM.
+    """
+
+    @staticmethod
+    def _template(path: str) -> List[Tuple[str, Optional[str]]]:
+        """Route path -> [(literal, None) or (raw segment, param name)]."""
+        segments = []
+        for segment in path.strip("/").split("/"):
+            if not segment:
+                continue
+            match = PARAM.match(segment)
+            segments.append((segment, (match.group(1) or match.group(2)) if match else None))
+        return segments
+
+    @staticmethod
+    def _tokens(node: ast.AST) -> Optional[List[Token]]:
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return list(node.value)
+        if isinstance(node, ast.JoinedStr):
+            tokens = []
+            for value in node.values:
+                if isinstance(value, ast.Constant):
+                    tokens.extend(value.value)
+                else:
+                    tokens.append(value)
+            return tokens
+        return None
+
+    @staticmethod
+    def _url_node(call: ast.Call, method_from_args: bool) -> Optional[ast.AST]:
+        """The expression holding the URL (the string part of `base + "/path"`)."""
+        position = 1 if method_from_args else 0
+        node = call.args[position] if len(call.args) > position else next(
+            (kw.value for kw in call.keywords if kw.arg == "url"), None
+        )
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            # BASE_URL + "/users/1": the path is in the right operand
+            return node.right if ASTHealer._tokens(node.right) is not None else None
+        return node if ASTHealer._tokens(node) is not None else None
+
+    @staticmethod
+    def _split(tokens: List[Token]) -> Optional[Tuple[List[Token], List[List[Token]], bool, List[Token]]]:
+        """
+        URL tokens -> (base, path segments, trailing slash, query/fragment).
+        None if the string has no path (not a URL of the API).
+        """
+        start = 0
+        text = "".join(t if isinstance(t, str) else "\0" for t in tokens)
+        scheme = text.find("://")
+        if scheme != -1 and re.match(r"^[a-zA-Z][\w+.-]*$", text[:scheme]):
+            start = text.find("/", scheme + 3)
+        elif tokens and not isinstance(tokens[0], str):
+            # f"{BASE_URL}/users/..."
+            start = text.find("/")
+        elif not text.startswith("/"):
+            return None
+        if start == -1:
+            return None
+
+        end = len(tokens)
+        for i in range(start, len(tokens)):
+            if tokens[i] in ("?", "#"):
+                end = i
+                break
+        segments: List[List[Token]] = [[]]
+        for token in tokens[start + 1:end]:
+            if token == "/":
+                segments.append([])
+            else:
+                segments[-1].append(token)
+        trailing = len(segments) > 1 and not segments[-1]
+        segments = [segment for segment in segments if segment]
+        return tokens[:start], segments, trailing, tokens[end:]
+
+    @staticmethod
+    def _literal(segment: List[Token]) -> Optional[str]:
+        return "".join(segment) if all(isinstance(t, str) for t in segment) else None
+
+    @staticmethod
+    def _matches(segments: List[List[Token]], template) -> Optional[Dict]:
+        """
+        Values of the template's parameters (by name, and by position as
+        "#0", "#1"...) if the segments fit the template, else None.
+        """
+        if len(segments) != len(template):
+            return None
+        captures = {}
+        index = 0
+        for segment, (literal, param) in zip(segments, template):
+            if param is None:
+                if ASTHealer._literal(segment) != literal:
+                    return None
+            else:
+                captures[param] = captures[f"#{index}"] = segment
+                index += 1
+        return captures
+
+    @staticmethod
+    def _render(template, captures: Dict, old_template) -> List[List[Token]]:
+        old_params = [param for _, param in old_template if param]
+        new_params = [param for _, param in template if param]
+        segments = []
+        index = 0
+        for literal, param in template:
+            if param is None:
+                segments.append(list(literal))
+                continue
+            if param in captures:
+                segments.append(captures[param])
+            elif len(old_params) == len(new_params) and f"#{index}" in captures:
+                # Renamed parameter ({id} -> {user_id}): same position
+                segments.append(captures[f"#{index}"])
+            else:
+                raise Ambiguous(f"no value for the new path parameter '{param}'")
+            index += 1
+        return segments
+
+    @staticmethod
+    def _infer(segments: List[List[Token]], template) -> List[List[Token]]:
+        """
+        New segments for a call whose old route is unknown: the new route
+        must be the called path with a prefix added or removed, or one
+        literal segment renamed. More than one reading is ambiguous.
+        """
+        candidates = []
+        # Same path (parameters match anything): only the method changed
+        captures = ASTHealer._matches(segments, template)
+        if captures is not None:
+            return ASTHealer._render(template, captures, template)
+
+        # Prefix added: /users/1 -> /v2/users/{id}
+        for k in range(1, len(template)):
+            if all(param is None for _, param in template[:k]):
+                captures = ASTHealer._matches(segments, template[k:])
+                if captures is not None:
+                    candidates.append([list(literal) for literal, _ in template[:k]] + ASTHealer._render(template[k:], captures, template[k:]))
+        # Prefix removed: /api/users/1 -> /users/{id}
+        for k in range(1, len(segments)):
+            if all(ASTHealer._literal(segment) is not None for segment in segments[:k]):
+                captures = ASTHealer._matches(segments[k:], template)
+                if captures is not None:
+                    candidates.append(ASTHealer._render(template, captures, template))
+        # One literal segment renamed: /users/1 -> /members/{id}
+        if len(segments) == len(template):
+            differences = [
+                i for i, (segment, (literal, param)) in enumerate(zip(segments, template))
+                if param is None and ASTHealer._literal(segment) != literal
+            ]
+            if len(differences) == 1 and ASTHealer._literal(segments[differences[0]]) is not None:
+                renamed = [
+                    list(literal) if param is None else segment
+                    for segment, (literal, param) in zip(segments, template)
+                ]
+                candidates.append(renamed)
+
+        distinct = {repr(candidate) for candidate in candidates}
+        if len(distinct) != 1:
+            raise Ambiguous("the called path doesn't map to the new route in exactly one way")
+        return candidates[0]
+
+    @staticmethod
+    def _rebuild(tokens: List[Token], quote: str) -> str:
+        """Source of a str (or f-string, with placeholders) holding `tokens`."""
+        def escape(char: str) -> str:
+            if char == "\\" or char == quote:
+                return "\\" + char
+            return char if char.isprintable() else char.encode("unicode_escape").decode("ascii")
+
+        if all(isinstance(token, str) for token in tokens):
+            return quote + "".join(escape(token) for token in tokens) + quote
+
+        parts = []
+        for token in tokens:
+            if isinstance(token, str):
+                parts.append({"{": "{{", "}": "}}"}.get(token) or escape(token))
+                continue
+            expression = ast.unparse(token.value)
+            conversion = {115: "!s", 114: "!r", 97: "!a"}.get(token.conversion, "")
+            spec = ""
+            if token.format_spec is not None:
+                spec = ":" + "".join(
+                    v.value if isinstance(v, ast.Constant) else "{" + ast.unparse(v.value) + "}"
+                    for v in token.format_spec.values
+                )
+            if quote in expression + spec or "\\" in expression:
+                # Can't be written inside this f-string: let ast choose the quotes
+                values = []
+                for t in tokens:
+                    if isinstance(t, str) and values and isinstance(values[-1], ast.Constant):
+                        values[-1] = ast.Constant(values[-1].value + t)
+                    else:
+                        values.append(ast.Constant(t) if isinstance(t, str) else t)
+                return ast.unparse(ast.JoinedStr(values=values))
+            parts.append("{" + expression + conversion + spec + "}")
+        return "f" + quote + "".join(parts) + quote
+
+    @staticmethod
+    def _quote(source: str, node: ast.AST) -> str:
+        segment = ast.get_source_segment(source, node) or ""
+        match = re.match(r"^[a-zA-Z]*(['\"])", segment)
+        if match is None or segment.lstrip("fFrRuU")[:3] in ('"""', "'''"):
+            return '"'
+        return match.group(1)
+
+    @staticmethod
+    def _call_sites(tree: ast.AST):
+        """(call, method, url node, uses .request(method, url)) of every HTTP call in the test."""
+        sites = []
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)):
+                continue
+            attr = node.func.attr
+            receiver = ast.unparse(node.func.value)
+            looks_like_client = receiver == "httpx" or "client" in receiver.lower()
+            if attr.upper() in HTTP_METHODS:
+                url = ASTHealer._url_node(node, False)
+                if url is None or ASTHealer._split(ASTHealer._tokens(url)) is None:
+                    if looks_like_client:
+                        raise Ambiguous(f"can't read the URL of {receiver}.{attr}(...)")
+                    continue
+                sites.append((node, attr.upper(), url, False))
+            elif attr in ("request", "stream") and looks_like_client:
+                method = node.args[0] if node.args else None
+                url = ASTHealer._url_node(node, True)
+                if not (isinstance(method, ast.Constant) and isinstance(method.value, str)) or url is None:
+                    raise Ambiguous(f"can't read the method or URL of {receiver}.{attr}(...)")
+                if ASTHealer._split(ASTHealer._tokens(url)) is None:
+                    raise Ambiguous(f"can't read the URL of {receiver}.{attr}(...)")
+                sites.append((node, method.value.upper(), url, True))
+        return sites
+
+    @staticmethod
+    def heal(
+        test_code: str,
+        new_method: str,
+        new_path: str,
+        old_method: Optional[str] = None,
+        old_path: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """
+        Rewrites the calls of the old route to `new_method new_path`.
+        Returns {"reason", "patched_test_code"} (like AIResponseParser.
+        parse_healing) plus the "old_method" and "old_path" it rewrote.
+        Raises Ambiguous when the LLM must do it.
+
+        Without the old signature, it is inferred: the test must call a
+        single (method, path), and that path must map to the new route.
+        """
+        try:
+            tree = ast.parse(test_code)
+        except SyntaxError as e:
+            raise Ambiguous(f"the test doesn't parse: {e}")
+        new_method = new_method.upper()
+        new_template = ASTHealer._template(new_path)
+
+        sites = ASTHealer._call_sites(tree)
+        if old_path is not None:
+            old_template = ASTHealer._template(old_path)
+            targets = [
+                site for site in sites
+                if (old_method is None or site[1] == old_method.upper())
+                and ASTHealer._matches(ASTHealer._split(ASTHealer._tokens(site[2]))[1], old_template) is not None
+            ]
+        else:
+            old_template = None
+            signatures = {
+                (method, repr(ASTHealer._split(ASTHealer._tokens(url))[1])) for _, method, url, _ in sites
+            }
+            if len(signatures) > 1:
+                raise Ambiguous("the test calls several endpoints and the old route is unknown")
+            targets = sites
+        if not targets:
+            raise Ambiguous("no call of the old route found in the test")
+
+        edits = []
+        for call, method, url, method_from_args in targets:
+            base, segments, trailing, rest = ASTHealer._split(ASTHealer._tokens(url))
+            if old_template is not None:
+                new_segments = ASTHealer._render(new_template, ASTHealer._matches(segments, old_template), old_template)
+            else:
+                new_segments = ASTHealer._infer(segments, new_template)
+
+            if new_segments != segments:
+                tokens = list(base) + ["/"]
+                for i, segment in enumerate(new_segments):
+                    tokens.extend(([] if i == 0 else ["/"]) + segment)
+                if trailing and new_segments:
+                    tokens.append("/")
+                edits.append((url, ASTHealer._rebuild(tokens + list(rest), ASTHealer._quote(test_code, url)), False))
+
+            if method != new_method:
+                if method_from_args:
+                    quote = ASTHealer._quote(test_code, call.args[0])
+                    edits.append((call.args[0], quote + new_method + quote, False))
+                else:
+                    if new_method not in HTTP_METHODS:
+                        raise Ambiguous(f"httpx has no shortcut for {new_method}")
+                    if new_method in NO_BODY_SHORTCUTS and any(kw.arg in BODY_KEYWORDS for kw in call.keywords):
+                        raise Ambiguous(f"the call sends a body, which httpx.{new_method.lower()}() can't")
+                    edits.append((call.func, new_method.lower(), True))
+
+        if not edits:
+            raise Ambiguous("the test already calls the new route")
+
+        patched = ASTHealer._apply(test_code, edits)
+        try:
+            compile(patched, "<healed test>", "exec")
+        except SyntaxError as e:
+            raise Ambiguous(f"the rewritten test doesn't compile: {e}")
+
+        if old_path is None:
+            # Shown as the test wrote it, e.g. /users/{user_id}
+            _, segments, _, _ = ASTHealer._split(ASTHealer._tokens(targets[0][2]))
+            old_path = "/" + "/".join(
+                "".join(t if isinstance(t, str) else "{" + ast.unparse(t.value) + "}" for t in segment)
+                for segment in segments
+            )
+        old_method = (old_method or targets[0][1]).upper()
+        reason = f"Rewrote {len(targets)} httpx call(s) from {old_method} {old_path} to {new_method} {new_path} (no LLM needed)."
+        log.info(f"AST heal: {reason}")
+        return {"reason": reason, "patched_test_code": patched, "old_method": old_method, "old_path": old_path}
+
+    @staticmethod
+    def _apply(source: str, edits) -> str:
+        """
+        Applies (node, new text, attribute name only) edits to the source. Node columns are UTF-8 byte
+        offsets, so they are converted to str offsets line by line.
+        """
+        lines = source.splitlines(keepends=True)
+        starts = [0]
+        for line in lines:
+            starts.append(starts[-1] + len(line))
+
+        def offset(lineno: int, col: int) -> int:
+            line = lines[lineno - 1]
+            return starts[lineno - 1] + len(line.encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+
+        replacements = []
+        for node, text, attribute_only in edits:
+            end = offset(node.end_lineno, node.end_col_offset)
+            if attribute_only:
+                # `put` of `client.put`: the last characters of the node
+                replacements.append((end - len(node.attr), end, text))
+            else:
+                replacements.append((offset(node.lineno, node.col_offset), end, text))
+
+        for start, end, text in sorted(replacements, reverse=True):
+            source = source[:start] + text + source[end:]
+        return source
@@ -7,6 +7,9 @@ These prompts guide the AI to 'repair' broken test code based on changes
 to the API metadata.
 """
 
+# Part of the LLM response cache key: bump it whenever the prompt changes
+HEALING_PROMPT_VERSION = "1"
+
 HEALING_PROMPT = PromptTemplate.from_template("""
 You are a Senior QA Automation Engineer. A test case for an API endpoint has failed because the API metadata changed.
 Your task is to 'heal' the test code by updating it to reflect the new signature.
@@ -31,3 +34,36 @@ OUTPUT FORMAT (Strict JSON only):
   "patched_test_code": "import pytest\\nimport httpx\\n..."
 }}
 """)
+
+# The tests facing the same endpoint change in one call: the change and
+# the instructions are sent once, and every test gets the same rewrite.
+BATCH_HEALING_PROMPT_VERSION = "1"
+
+BATCH_HEALING_PROMPT = PromptTemplate.from_template("""
+You are a Senior QA Automation Engineer. Several test cases for an API endpoint have failed because the API metadata changed.
+Your task is to 'heal' EACH test below by updating it to reflect the new signature.
+
+CONTEXT:
+Framework: {framework}
+Original API: {old_method} {old_path}
+New API: {new_method} {new_path}
+
+OLD TESTS (each one starts with its test_id label):
+{old_tests}
+
+INSTRUCTIONS:
+1. Identify how the new signature (method/path) differs from the old one.
+2. Apply the same change to every test: update the 'pytest' + 'httpx' code to use the correct new method and path.
+3. Keep the existing assertion logic the same unless it's obviously broken by the change.
+4. Return exactly one item per test, with its test_id label (T1, T2, ...) copied unchanged.
+5. DO NOT include any explanatory text outside the JSON.
+
+OUTPUT FORMAT (Strict JSON array only):
+[
+  {{
+    "test_id": "the test_id label from the list",
+    "reason": "Detailed explanation of what was changed and why it was healed.",
+    "patched_test_code": "import pytest\\nimport httpx\\n..."
+  }}
+]
+""")
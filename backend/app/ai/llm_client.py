@@ -1,20 +1,216 @@
+import os
+import asyncio
+from typing import Dict, Optional, Tuple
+
+import httpx
+import openai
 from langchain_community.chat_models import ChatOpenAI
+
 from app.config import settings
+from app.utils.logger import log
+
+OPENROUTER_HEADERS = {
+    "HTTP-Referer": "https://github.com/VinayakWankhade/LLM_powered_Api_testing",
+    "X-Title": "AI TestGen",
+}
+
+def _http2_available() -> bool:
+    try:
+        import h2 # noqa: F401 (httpx[http2] extra)
+        return True
+    except ImportError:
+        return False
+
+class LLMClientRegistry:
+    """
+    Long-lived LLM clients, one per profile, shared by everything in a process.
+
+    Why this?
+    Building a ChatOpenAI per call also builds a new HTTP connection pool,
+    so every AI call paid for a fresh TCP + TLS handshake to OpenRouter.
+    Here each profile keeps one pooled httpx client (HTTP/2 when available,
+    keep-alive otherwise) for the life of the worker or API process.
+
+    Profiles:
+    - "generation": writing new tests (GENERATION_MODEL / GENERATION_TIMEOUT)
+    - "healing": patching broken tests (HEALING_MODEL / HEALING_TIMEOUT)
+
+    Each pool only talks to OpenRouter, so its connection limit is the
+    per-host limit (LLM_MAX_CONNECTIONS).
+    """
+    PROFILES = ("generation", "healing")
+
+    # (profile, model) -> (ChatOpenAI, event loop its async pool belongs to)
+    _clients: Dict[Tuple[str, str], Tuple[ChatOpenAI, Optional[asyncio.AbstractEventLoop]]] = {}
+    _pid: Optional[int] = None
+    _metrics: Dict[str, Dict[str, int]] = {}
+    _warned_http1 = False
+
+    @staticmethod
+    def profile(name: str) -> Dict:
+        """Model and timeout of a profile (unset values fall back to OPENROUTER_MODEL)."""
+        if name == "healing":
+            return {"model": settings.HEALING_MODEL or settings.OPENROUTER_MODEL, "timeout": settings.HEALING_TIMEOUT}
+        if name == "generation":
+            return {"model": settings.GENERATION_MODEL or settings.OPENROUTER_MODEL, "timeout": settings.GENERATION_TIMEOUT}
+        raise ValueError(f"Unknown LLM profile: {name}")
+
+    @staticmethod
+    def _counters(profile: str) -> Dict[str, int]:
+        return LLMClientRegistry._metrics.setdefault(
+            profile, {"requests": 0, "connections_opened": 0, "tls_handshakes": 0}
+        )
+
+    @staticmethod
+    def _hooks(profile: str, is_async: bool) -> Dict:
+        """
+        httpx hooks that count requests, and httpcore trace events that count
+        new connections. requests / connections_opened is the reuse ratio.
+        """
+        counters = LLMClientRegistry._counters(profile)
+
+        def on_trace(event_name: str):
+            if event_name == "connection.connect_tcp.complete":
+                counters["connections_opened"] += 1
+            elif event_name == "connection.start_tls.complete":
+                counters["tls_handshakes"] += 1
+
+        if is_async:
+            async def trace(event_name, info):
+                on_trace(event_name)
+
+            async def on_request(request):
+                counters["requests"] += 1
+                request.extensions["trace"] = trace
+        else:
+            def trace(event_name, info):
+                on_trace(event_name)
 
-def get_llm():
+            def on_request(request):
+                counters["requests"] += 1
+                request.extensions["trace"] = trace
+        return {"request": [on_request]}
+
+    @staticmethod
+    def _http_options(profile: str) -> Dict:
+        http2 = settings.LLM_HTTP2 and _http2_available()
+        if settings.LLM_HTTP2 and not http2 and not LLMClientRegistry._warned_http1:
+            log.warning("HTTP/2 requested for LLM clients but 'h2' is not installed, using HTTP/1.1 keep-alive.")
+            LLMClientRegistry._warned_http1 = True
+        return {
+            "http2": http2,
+            "timeout": httpx.Timeout(LLMClientRegistry.profile(profile)["timeout"], connect=10.0),
+            "limits": httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE,
+                keepalive_expiry=settings.LLM_KEEPALIVE_SECONDS,
+            ),
+        }
+
+    @staticmethod
+    def _build(profile: str, model: str) -> ChatOpenAI:
+        options = LLMClientRegistry._http_options(profile)
+        timeout = LLMClientRegistry.profile(profile)["timeout"]
+        client_params = {
+            "api_key": settings.OPENROUTER_API_KEY,
+            "base_url": settings.OPENROUTER_BASE_URL,
+            "timeout": timeout,
+            # Retries (and 429 backoff) are done by LLMRunner, so the rate
+            # limiter sees every 429 instead of the client retrying it alone
+            "max_retries": 0,
+            "default_headers": OPENROUTER_HEADERS,
+        }
+        sync_http = httpx.Client(event_hooks=LLMClientRegistry._hooks(profile, False), **options)
+        async_http = httpx.AsyncClient(event_hooks=LLMClientRegistry._hooks(profile, True), **options)
+
+        return ChatOpenAI(
+            model_name=model,
+            openai_api_key=settings.OPENROUTER_API_KEY,
+            openai_api_base=settings.OPENROUTER_BASE_URL,
+            request_timeout=timeout,
+            max_retries=0,
+            default_headers=OPENROUTER_HEADERS,
+            # Passed in ready-made, so ChatOpenAI doesn't build its own pools
+            client=openai.OpenAI(http_client=sync_http, **client_params).chat.completions,
+            async_client=openai.AsyncOpenAI(http_client=async_http, **client_params).chat.completions,
+        )
+
+    @staticmethod
+    def get(profile: str = "generation", model: Optional[str] = None) -> ChatOpenAI:
+        """
+        Returns the shared client for a profile (optionally with another model).
+
+        Clients are rebuilt after a fork (Celery prefork children must not
+        share sockets with their parent) and when called from a different
+        event loop than the one their async pool was opened on.
+        """
+        if LLMClientRegistry._pid != os.getpid():
+            LLMClientRegistry._clients = {}
+            LLMClientRegistry._metrics = {}
+            LLMClientRegistry._pid = os.getpid()
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        model = model or LLMClientRegistry.profile(profile)["model"]
+        key = (profile, model)
+        cached = LLMClientRegistry._clients.get(key)
+        if cached:
+            client, client_loop = cached
+            if loop is None or client_loop is None or client_loop is loop:
+                if client_loop is None and loop is not None:
+                    LLMClientRegistry._clients[key] = (client, loop)
+                return client
+
+        client = LLMClientRegistry._build(profile, model)
+        LLMClientRegistry._clients[key] = (client, loop)
+        log.info(f"Created pooled LLM client for profile '{profile}' ({model}).")
+        return client
+
+    @staticmethod
+    def _pool_snapshot(client: ChatOpenAI) -> Dict[str, int]:
+        """Open/idle connections of a client's async pool (best effort, httpcore internals)."""
+        try:
+            pool = client.async_client._client._client._transport._pool
+            connections = list(pool.connections)
+            idle = sum(1 for conn in connections if conn.is_idle())
+            return {"open_connections": len(connections), "idle_connections": idle}
+        except Exception:
+            return {"open_connections": 0, "idle_connections": 0}
+
+    @staticmethod
+    def pool_stats() -> Dict:
+        """Per-profile request/connection counters of this process."""
+        stats = {}
+        for profile in LLMClientRegistry.PROFILES:
+            counters = dict(LLMClientRegistry._counters(profile))
+            opened = counters["connections_opened"]
+            counters["requests_per_connection"] = round(counters["requests"] / opened, 2) if opened else 0.0
+            counters["model"] = LLMClientRegistry.profile(profile)["model"]
+            counters["open_connections"] = 0
+            counters["idle_connections"] = 0
+            for (client_profile, _), (client, _) in LLMClientRegistry._clients.items():
+                if client_profile == profile:
+                    for name, value in LLMClientRegistry._pool_snapshot(client).items():
+                        counters[name] += value
+            stats[profile] = counters
+        return {
+            "pid": os.getpid(),
+            "http2": settings.LLM_HTTP2 and _http2_available(),
+            "max_connections_per_host": settings.LLM_MAX_CONNECTIONS,
+            "profiles": stats,
+        }
+
+def get_llm(profile: str = "generation", model: Optional[str] = None) -> ChatOpenAI:
     """
-    Initializes the LangChain ChatOpenAI client configured for OpenRouter.
-    
+    Returns the LangChain ChatOpenAI client configured for OpenRouter.
+
     Why OpenRouter?
-    It gives us access to multiple high-quality models (DeepSeek, GPT-4, etc.) 
+    It gives us access to multiple high-quality models (DeepSeek, GPT-4, etc.)
     using a single API, which is perfect for an enterprise AI tool.
+
+    The client is pooled and shared (see LLMClientRegistry): don't close it.
     """
-    return ChatOpenAI(
-        model_name=settings.OPENROUTER_MODEL,
-        openai_api_key=settings.OPENROUTER_API_KEY,
-        openai_api_base="https://openrouter.ai/api/v1",
-        default_headers={
-            "HTTP-Referer": "https://github.com/VinayakWankhade/LLM_powered_Api_testing",
-            "X-Title": "AI TestGen",
-        }
-    )
+    return LLMClientRegistry.get(profile, model)
@@ -0,0 +1,291 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, Optional, Tuple
+from uuid import UUID, uuid4
+
+import openai
+
+from app.ai.llm_client import get_llm
+from app.ai.model_router import LLMRouter
+from app.ai.rate_limiter import LLMRateLimiter
+from app.ai.response_cache import LLMResponseCache
+from app.ai.stream_preview import StreamingJSONPreview
+from app.ai.telemetry import LLMTelemetry
+from app.ai.token_counter import TokenCounter
+from app.config import settings
+from app.utils.logger import log
+
+class LLMRunner:
+    """
+    The one place services call the AI through.
+
+    Why this?
+    Generation and healing both need the same steps around the actual
+    call: look in the response cache, wait for a rate limit slot, call the
+    pooled client (retrying 429s and connection errors), parse, and cache
+    the parsed answer. Keeping them here means every AI feature gets them,
+    and the services only deal with prompts and results.
+    """
+
+    @staticmethod
+    async def _stream(
+        profile: str,
+        model: str,
+        prompt: str,
+        on_partial: Callable[[Optional[str], str], None],
+        preview_field: str,
+        timing: Optional[dict] = None,
+    ) -> str:
+        """
+        Streams the answer, calling `on_partial(key, code so far)` at most
+        every LLM_STREAM_PREVIEW_SECONDS (see StreamingJSONPreview).
+
+        An answer that obviously won't parse is cancelled right away: the
+        stream is closed and ValueError raised, so we stop paying for it.
+
+        The arrival time of the first chunk is stored in `timing["first"]`.
+        """
+        preview = StreamingJSONPreview(field=preview_field)
+        last_sent = None
+        last_time = 0.0
+        stream = get_llm(profile, model).astream(prompt)
+        try:
+            async for chunk in stream:
+                if timing is not None and "first" not in timing:
+                    timing["first"] = time.monotonic()
+                preview.feed(chunk.content)
+                if preview.malformed:
+                    raise ValueError(f"Cancelled a malformed streamed answer: {preview.malformed}.")
+
+                now = time.monotonic()
+                if now - last_time >= settings.LLM_STREAM_PREVIEW_SECONDS:
+                    current = preview.current()
+                    if current and current != last_sent:
+                        on_partial(*current)
+                        last_sent, last_time = current, now
+        finally:
+            await stream.aclose()
+
+        current = preview.current()
+        if current and current != last_sent:
+            on_partial(*current)
+        return preview.text
+
+    @staticmethod
+    async def _invoke(
+        profile: str,
+        model: str,
+        tokens: int,
+        send: Callable[[], Awaitable[str]],
+        on_flight: Optional[Callable[[bool], None]] = None
+    ) -> str:
+        """
+        Sends one prompt with `send()`, waiting for the rate limiter first.
+        `on_flight(True/False)` is told when a request goes out and comes
+        back (see LLMRouter.hedged), so limiter waits are never taken for
+        a slow model.
+
+        A 429 makes every worker back off from the model (see
+        LLMRateLimiter) and the call is queued again, up to
+        LLM_RATE_LIMIT_RETRIES times. Connection errors and 5xx are retried
+        LLM_MAX_RETRIES times with a short exponential delay.
+        """
+        rate_limits = 0
+        failures = 0
+        while True:
+            await LLMRateLimiter.acquire(model, tokens)
+            if on_flight is not None:
+                on_flight(True)
+            try:
+                content = await send()
+            except openai.RateLimitError as e:
+                rate_limits += 1
+                if rate_limits > settings.LLM_RATE_LIMIT_RETRIES:
+                    raise
+                await LLMRateLimiter.rate_limited(model, e)
+                continue
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                failures += 1
+                if failures > settings.LLM_MAX_RETRIES:
+                    raise
+                log.warning(f"LLM call to {model} failed ({e}), retry {failures}/{settings.LLM_MAX_RETRIES}.")
+                await asyncio.sleep(0.5 * 2 ** (failures - 1))
+                continue
+            finally:
+                if on_flight is not None:
+                    on_flight(False)
+
+            await LLMRateLimiter.succeeded(model, after_rate_limit=rate_limits > 0)
+            return content
+
+    @staticmethod
+    def _usage(message) -> Optional[dict]:
+        """Token usage reported by the API, when the client exposes it."""
+        metadata = getattr(message, "response_metadata", None) or {}
+        return metadata.get("token_usage") or None
+
+    @staticmethod
+    async def _call(
+        profile: str,
+        model: str,
+        prompt: str,
+        tokens: int,
+        on_partial: Optional[Callable[[Optional[str], str], None]],
+        preview_field: str,
+        project_id: Optional[UUID],
+        on_flight: Optional[Callable[[bool], None]] = None,
+        attempt_id: Optional[UUID] = None,
+    ) -> Tuple[str, Callable[..., None]]:
+        """
+        One request to `model` (with the retries of `_invoke`). Returns the
+        answer and a `record(outcome, results)` to log it with LLMTelemetry
+        once the caller knows whether it was usable. Failed and cancelled
+        requests are recorded here.
+        """
+        timing = {}
+        usage = {}
+        async def send():
+            # Only the attempt that answers is timed (not rate limit waits)
+            timing.clear()
+            timing["start"] = time.monotonic()
+            if on_partial is not None:
+                content = await LLMRunner._stream(profile, model, prompt, on_partial, preview_field, timing)
+            else:
+                message = await get_llm(profile, model).ainvoke(prompt)
+                usage.update(LLMRunner._usage(message) or {})
+                content = message.content
+            timing["end"] = time.monotonic()
+            return content
+
+        def record(outcome: str, content: Optional[str] = None, results: int = 0):
+            start, end = timing.get("start"), timing.get("end")
+            LLMTelemetry.record(
+                profile, model, outcome,
+                prompt_tokens=usage.get("prompt_tokens") or TokenCounter.count(prompt),
+                completion_tokens=usage.get("completion_tokens") or (TokenCounter.count(content) if content else 0),
+                latency_ms=int((end - start) * 1000) if start is not None and end is not None else None,
+                ttft_ms=int((timing["first"] - start) * 1000) if "first" in timing and start is not None else None,
+                results=results, project_id=project_id, attempt_id=attempt_id
+            )
+
+        try:
+            content = await LLMRunner._invoke(profile, model, tokens, send, on_flight)
+        except openai.RateLimitError:
+            record("RATE_LIMITED")
+            raise
+        except ValueError:
+            # A streamed answer cancelled as malformed
+            record("PARSE_ERROR")
+            raise
+        except asyncio.CancelledError:
+            # The loser of a hedge (or the job was cancelled)
+            record("CANCELLED")
+            raise
+        except Exception:
+            record("ERROR")
+            raise
+
+        # Send to answer only: rate limit waits would read as a slow model
+        LLMRouter.record_latency(model, timing["end"] - timing["start"])
+        return content, lambda outcome, results=0: record(outcome, content, results)
+
+    @staticmethod
+    async def complete(
+        profile: str,
+        prompt: str,
+        template_version: str,
+        parse: Callable[[str], dict],
+        use_cache: bool = True,
+        expected_answer_tokens: Optional[int] = None,
+        on_partial: Optional[Callable[[Optional[str], str], None]] = None,
+        preview_field: str = "test_code",
+        project_id: Optional[UUID] = None,
+        count_results: Callable[[dict], int] = lambda data: 1,
+        validate: Optional[Callable[[dict], dict]] = None,
+    ) -> dict:
+        """
+        Returns `parse(answer)` for a rendered prompt.
+
+        Only answers that parse are cached, so a malformed reply is never
+        served again. `use_cache=False` skips the lookup (the fresh answer
+        still replaces the cached one). `expected_answer_tokens` is charged
+        against the model's TPM budget with the prompt
+        (default LLM_EXPECTED_ANSWER_TOKENS).
+
+        With `on_partial`, the answer is streamed and the partial value of
+        `preview_field` is passed to it as it grows (see `_stream`).
+
+        Models are tried in the order of LLMRouter.route: an answer that
+        doesn't parse, or that `validate(parsed)` rejects (ValueError), goes
+        to the next model. Non-streamed calls are hedged (LLMRouter.hedged);
+        streamed ones aren't, two previews of the same code would clash.
+
+        Every call, cache hits and failures included, is recorded by
+        LLMTelemetry under `project_id`, all with the same attempt id;
+        `count_results(parsed)` is how many tests (or patches) the answer
+        produced.
+        """
+        route = LLMRouter.route(profile)
+        # The whole route is part of the key: changing models invalidates answers
+        key = LLMResponseCache.make_key(prompt, "+".join(route), template_version)
+        prompt_tokens = TokenCounter.count(prompt)
+        # Every record of this answer (cache hit, hedges, escalations) is one attempt
+        attempt_id = uuid4()
+
+        if settings.LLM_CACHE_ENABLED:
+            if use_cache:
+                # Redis/SQLite calls are blocking: keep them off the event loop
+                cached = await asyncio.to_thread(LLMResponseCache.get, key)
+                if cached is not None:
+                    LLMTelemetry.record(
+                        profile, route[-1], "OK", prompt_tokens=prompt_tokens, cache_hit=True,
+                        results=count_results(cached), project_id=project_id, attempt_id=attempt_id
+                    )
+                    await LLMRunner._flush_telemetry_if_due()
+                    return cached
+            else:
+                LLMResponseCache.record_bypass()
+
+        tokens = prompt_tokens + (expected_answer_tokens or settings.LLM_EXPECTED_ANSWER_TOKENS)
+        start = time.monotonic()
+        try:
+            for position, model in enumerate(route):
+                last = position == len(route) - 1
+                call = lambda on_flight=None: LLMRunner._call(
+                    profile, model, prompt, tokens, on_partial, preview_field, project_id, on_flight, attempt_id
+                )
+                try:
+                    content, record = await (call() if on_partial is not None else LLMRouter.hedged(model, call))
+                except ValueError as e:
+                    # Streamed answer cancelled as malformed
+                    if last:
+                        raise
+                    LLMRouter.escalated(profile, model, route[position + 1], str(e), time.monotonic() - start)
+                    continue
+
+                try:
+                    data = parse(content)
+                    if validate is not None:
+                        data = validate(data)
+                except Exception as e:
+                    record("PARSE_ERROR")
+                    if last:
+                        raise
+                    LLMRouter.escalated(profile, model, route[position + 1], str(e), time.monotonic() - start)
+                    continue
+
+                record("OK", count_results(data))
+                if position:
+                    log.info(f"LLM route ({profile}): answered by {model} after {time.monotonic() - start:.2f}s.")
+                break
+        finally:
+            await LLMRunner._flush_telemetry_if_due()
+
+        if settings.LLM_CACHE_ENABLED:
+            await asyncio.to_thread(LLMResponseCache.put, key, data)
+        return data
+
+    @staticmethod
+    async def _flush_telemetry_if_due():
+        if LLMTelemetry.due():
+            await LLMTelemetry.flush()
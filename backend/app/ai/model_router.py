@@ -0,0 +1,162 @@
+import time
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from app.ai.llm_client import LLMClientRegistry
+from app.config import settings
+from app.utils.logger import log
+
+T = TypeVar("T")
+
+class LLMRouter:
+    """
+    Chooses which models answer a call, and hedges slow calls.
+
+    Why this?
+    One model per profile meant every call paid for the strongest model,
+    and a single slow provider response stalled an endpoint for tens of
+    seconds.
+
+    - Routing: with GENERATION_FAST_MODEL / HEALING_FAST_MODEL set, a call
+      goes to the fast (cheap) model first and is escalated to the
+      profile's model only when the answer doesn't parse or fails static
+      validation (see LLMRunner.complete).
+    - Hedging: once a model has LLM_HEDGE_MIN_SAMPLES latencies, a call
+      whose request has been out longer than their LLM_HEDGE_PERCENTILE
+      fires a duplicate request (rate limit waits are not counted). Whichever answers first wins and the other is cancelled,
+      so only the tail pays for a second request.
+
+    Latencies and counters are kept per process.
+    """
+    _latencies: Dict[str, Deque[float]] = {}
+    _stats: Dict[str, int] = {
+        "calls": 0, "escalations": 0, "hedges_fired": 0, "hedges_won": 0
+    }
+
+    @staticmethod
+    def route(profile: str) -> List[str]:
+        """Models to try in order: the fast model (if any), then the profile's model."""
+        strong = LLMClientRegistry.profile(profile)["model"]
+        fast = {"generation": settings.GENERATION_FAST_MODEL, "healing": settings.HEALING_FAST_MODEL}.get(profile)
+        if fast and fast != strong:
+            return [fast, strong]
+        return [strong]
+
+    @staticmethod
+    def escalated(profile: str, from_model: str, to_model: str, reason: str, elapsed: float):
+        LLMRouter._stats["escalations"] += 1
+        log.info(f"LLM route ({profile}): {from_model} rejected after {elapsed:.2f}s ({reason}), escalating to {to_model}.")
+
+    @staticmethod
+    def record_latency(model: str, seconds: float):
+        samples = LLMRouter._latencies.get(model)
+        if samples is None:
+            samples = LLMRouter._latencies[model] = deque(maxlen=max(1, settings.LLM_HEDGE_WINDOW))
+        samples.append(seconds)
+
+    @staticmethod
+    def hedge_delay(model: str) -> Optional[float]:
+        """
+        Seconds after which a call to `model` gets a duplicate, or None
+        (hedging off, or not enough latencies yet to know what's slow).
+        """
+        if not settings.LLM_HEDGE_ENABLED:
+            return None
+        samples = LLMRouter._latencies.get(model)
+        if not samples or len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * settings.LLM_HEDGE_PERCENTILE / 100))
+        return max(settings.LLM_HEDGE_MIN_DELAY, ordered[index])
+
+    @staticmethod
+    async def _until_hedge(call: "asyncio.Future", flight: Dict, delay: float) -> bool:
+        """
+        Waits until the call has been on the wire for `delay` seconds (True)
+        or is done (False). Time spent queued for a rate limit slot doesn't
+        count: a throttled model isn't a slow one, and a duplicate would
+        only spend more of the budget it is waiting for.
+        """
+        while not call.done():
+            if flight["since"] is None:
+                sent = asyncio.ensure_future(flight["event"].wait())
+                try:
+                    await asyncio.wait([call, sent], return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    sent.cancel()
+                continue
+            remaining = flight["since"] + delay - time.monotonic()
+            if remaining <= 0:
+                return True
+            await asyncio.wait([call], timeout=remaining)
+        return False
+
+    @staticmethod
+    async def hedged(model: str, call: Callable[[Callable[[bool], None]], Awaitable[T]]) -> T:
+        """
+        Runs `call(on_flight)`, and a second call if the first has been
+        sending its request for longer than `hedge_delay(model)`. Returns
+        the first successful result and cancels the other call. Fails only
+        when every call started failed.
+
+        `call` reports `on_flight(True)` when its request goes out (after
+        the rate limiter let it through) and `on_flight(False)` when the
+        answer is back or it has to queue again: only the time in between
+        counts towards the hedge delay.
+        """
+        LLMRouter._stats["calls"] += 1
+        delay = LLMRouter.hedge_delay(model)
+        flight = {"since": None, "event": asyncio.Event()}
+
+        def on_flight(sending: bool):
+            if sending:
+                flight["since"] = time.monotonic()
+                flight["event"].set()
+            else:
+                flight["since"] = None
+                flight["event"].clear()
+
+        tasks = [asyncio.ensure_future(call(on_flight))]
+        try:
+            if delay is None or not await LLMRouter._until_hedge(tasks[0], flight, delay):
+                return await tasks[0]
+
+            start = flight["since"]
+            LLMRouter._stats["hedges_fired"] += 1
+            log.info(f"LLM hedge: {model} still sending after {delay:.2f}s (p{settings.LLM_HEDGE_PERCENTILE:g}), sending a duplicate.")
+            tasks.append(asyncio.ensure_future(call(lambda sending: None)))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    elapsed = time.monotonic() - start
+                    if task is tasks[1]:
+                        LLMRouter._stats["hedges_won"] += 1
+                        log.info(
+                            f"LLM hedge: duplicate to {model} answered in {elapsed - delay:.2f}s, the original "
+                            f"was still running after {elapsed:.2f}s; cancelling it."
+                        )
+                    else:
+                        log.info(f"LLM hedge: original call to {model} won after {elapsed:.2f}s, cancelling the duplicate.")
+                    return task.result()
+            raise error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            # Let them finish cancelling (and record it) before we move on
+            await asyncio.gather(*losers, return_exceptions=True)
+
+    @staticmethod
+    def stats() -> Dict:
+        return {
+            "routes": {profile: LLMRouter.route(profile) for profile in LLMClientRegistry.PROFILES},
+            "hedging": settings.LLM_HEDGE_ENABLED,
+            "hedge_delays": {model: LLMRouter.hedge_delay(model) for model in LLMRouter._latencies},
+            **LLMRouter._stats,
+        }
@@ -7,6 +7,9 @@ We use controlled prompts to ensure the AI behaves like a senior
 QA engineer and returns data in a format our code can understand.
 """
 
+# Part of the LLM response cache key: bump it whenever the prompt changes
+TEST_GEN_PROMPT_VERSION = "1"
+
 TEST_GEN_PROMPT = PromptTemplate.from_template("""
 You are a Senior QA Automation Engineer. Your task is to generate a professional, executable API test case.
 
@@ -29,3 +32,34 @@ OUTPUT FORMAT (Strict JSON only):
   "test_code": "import pytest\\nimport httpx\\n..."
 }}
 """)
+
+# Several endpoints of one project per call: the instructions above are
+# sent (and billed) once per batch instead of once per route.
+BATCH_TEST_GEN_PROMPT_VERSION = "2" # 2: endpoints keyed by position label, not id
+
+BATCH_TEST_GEN_PROMPT = PromptTemplate.from_template("""
+You are a Senior QA Automation Engineer. Your task is to generate one professional, executable API test case for EACH endpoint below.
+
+CONTEXT:
+Project Name: {project_name}
+
+ENDPOINTS (one per line: endpoint_id label | framework | HTTP method | API path):
+{endpoint_lines}
+
+INSTRUCTIONS:
+1. For each endpoint, write a Python test case that uses the 'pytest' framework and 'httpx' library.
+2. Each test should verify the status code and at least one other property of the response.
+3. Keep the code concise and production-grade.
+4. Return exactly one item per endpoint, with its endpoint_id label (E1, E2, ...) copied unchanged.
+5. DO NOT include any explanatory text outside the JSON.
+
+OUTPUT FORMAT (Strict JSON array only):
+[
+  {{
+    "endpoint_id": "the endpoint_id label from the list",
+    "description": "Short description of what the test does",
+    "priority": "HIGH or MEDIUM or LOW",
+    "test_code": "import pytest\\nimport httpx\\n..."
+  }}
+]
+""")
@@ -0,0 +1,296 @@
+import os
+import time
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from app.config import settings
+from app.utils.logger import log
+
+# Two token buckets per model (requests and tokens per minute), plus the
+# shared "back off until" time set after a 429. Checked and charged in one
+# atomic step, so every worker sees the same budget.
+# KEYS: request bucket, token bucket, backoff-until
+# ARGV: now, rpm, tpm, tokens wanted
+# Returns 0 when the call may go, otherwise the wait in milliseconds.
+TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local backoff_until = tonumber(redis.call('GET', KEYS[3]) or '0')
+if backoff_until > now then
+    return math.ceil((backoff_until - now) * 1000)
+end
+
+local function refill(key, capacity)
+    local state = redis.call('HMGET', key, 'level', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    return math.min(capacity, level + math.max(0, now - ts) * capacity / 60.0)
+end
+
+local rpm, tpm = tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = math.min(tonumber(ARGV[4]), tpm)
+local requests_left = refill(KEYS[1], rpm)
+local tokens_left = refill(KEYS[2], tpm)
+
+local wait = 0
+if requests_left < 1 then wait = (1 - requests_left) * 60.0 / rpm end
+if tokens_left < tokens then wait = math.max(wait, (tokens - tokens_left) * 60.0 / tpm) end
+if wait > 0 then
+    return math.ceil(wait * 1000)
+end
+
+redis.call('HSET', KEYS[1], 'level', tostring(requests_left - 1), 'ts', tostring(now))
+redis.call('HSET', KEYS[2], 'level', tostring(tokens_left - tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], 120)
+redis.call('EXPIRE', KEYS[2], 120)
+return 0
+"""
+
+class LLMRateLimiter:
+    """
+    Keeps all workers together under the provider's rate limits.
+
+    Why this?
+    Several generation jobs running at once used to blow through
+    OpenRouter's requests/tokens per minute, get 429s and fail. Now each
+    call first takes one request and its estimated tokens (prompt counted
+    with tiktoken, plus the expected answer) from the model's buckets, and
+    waits when they're empty instead of failing.
+
+    A 429 anyway (limits shared with other apps, estimates off) sets a
+    "back off until" time for the model that every worker honours. It is
+    the later of the Retry-After header and an exponential backoff that
+    grows with each 429 in a row, and it resets after the next success.
+
+    State lives in Redis. If Redis is unreachable, each process falls back
+    to its own buckets with the same rules.
+    """
+    KEY_PREFIX = "llm_rate:"
+
+    _redis = None
+    _redis_pid: Optional[int] = None
+    _script = None
+    _redis_warned = False
+
+    # Per-process fallback state and counters
+    _local_buckets: Dict[str, Dict[str, float]] = {}
+    _local_backoff: Dict[str, float] = {}
+    _local_strikes: Dict[str, int] = {}
+    _waiting: Dict[str, int] = {}
+    _metrics: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def limits(model: str) -> Dict[str, int]:
+        """RPM/TPM of a model: LLM_RATE_LIMITS overrides, else LLM_RPM / LLM_TPM."""
+        override = settings.LLM_RATE_LIMITS.get(model, {})
+        return {
+            "rpm": max(1, int(override.get("rpm", settings.LLM_RPM))),
+            "tpm": max(1, int(override.get("tpm", settings.LLM_TPM))),
+        }
+
+    @staticmethod
+    def _counters(model: str) -> Dict[str, float]:
+        return LLMRateLimiter._metrics.setdefault(
+            model, {"calls": 0, "throttled": 0, "wait_seconds": 0.0, "rate_limited": 0}
+        )
+
+    @staticmethod
+    def _client():
+        """One client per process (rebuilt after a fork), or None without Redis."""
+        if LLMRateLimiter._redis is None or LLMRateLimiter._redis_pid != os.getpid():
+            import redis as sync_redis
+            LLMRateLimiter._redis = sync_redis.from_url(settings.REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+            LLMRateLimiter._script = LLMRateLimiter._redis.register_script(TAKE_SCRIPT)
+            LLMRateLimiter._redis_pid = os.getpid()
+        return LLMRateLimiter._redis
+
+    @staticmethod
+    def _redis_failed(e: Exception):
+        if not LLMRateLimiter._redis_warned:
+            log.warning(f"LLM rate limiter can't reach Redis ({e}), limiting per process instead.")
+            LLMRateLimiter._redis_warned = True
+
+    @staticmethod
+    def _keys(model: str):
+        prefix = LLMRateLimiter.KEY_PREFIX
+        return [f"{prefix}requests:{model}", f"{prefix}tokens:{model}", f"{prefix}backoff:{model}"]
+
+    @staticmethod
+    def _take_local(model: str, tokens: int, now: float) -> float:
+        """Same rules as TAKE_SCRIPT, for this process only."""
+        backoff_until = LLMRateLimiter._local_backoff.get(model, 0.0)
+        if backoff_until > now:
+            return backoff_until - now
+
+        limits = LLMRateLimiter.limits(model)
+        rpm, tpm = limits["rpm"], limits["tpm"]
+        tokens = min(tokens, tpm)
+        bucket = LLMRateLimiter._local_buckets.setdefault(model, {"requests": rpm, "tokens": tpm, "ts": now})
+        elapsed = max(0.0, now - bucket["ts"])
+        requests_left = min(rpm, bucket["requests"] + elapsed * rpm / 60.0)
+        tokens_left = min(tpm, bucket["tokens"] + elapsed * tpm / 60.0)
+
+        wait = 0.0
+        if requests_left < 1:
+            wait = (1 - requests_left) * 60.0 / rpm
+        if tokens_left < tokens:
+            wait = max(wait, (tokens - tokens_left) * 60.0 / tpm)
+        if wait > 0:
+            return wait
+
+        bucket.update({"requests": requests_left - 1, "tokens": tokens_left - tokens, "ts": now})
+        return 0.0
+
+    @staticmethod
+    def _take(model: str, tokens: int) -> float:
+        """Charges the buckets if possible. Returns 0, or how long to wait first."""
+        now = time.time()
+        try:
+            LLMRateLimiter._client()
+            limits = LLMRateLimiter.limits(model)
+            wait_ms = LLMRateLimiter._script(
+                keys=LLMRateLimiter._keys(model), args=[now, limits["rpm"], limits["tpm"], tokens]
+            )
+            return int(wait_ms) / 1000.0
+        except Exception as e:
+            LLMRateLimiter._redis_failed(e)
+            return LLMRateLimiter._take_local(model, tokens, now)
+
+    @staticmethod
+    def _track_queue(model: str, delta: int):
+        LLMRateLimiter._waiting[model] = LLMRateLimiter._waiting.get(model, 0) + delta
+        try:
+            r = LLMRateLimiter._client()
+            r.hincrby(f"{LLMRateLimiter.KEY_PREFIX}queue", model, delta)
+        except Exception:
+            pass
+
+    @staticmethod
+    async def acquire(model: str, tokens: int):
+        """
+        Waits until a call of about `tokens` tokens may be sent to `model`.
+        Raises TimeoutError after LLM_RATE_LIMIT_MAX_WAIT seconds.
+        """
+        counters = LLMRateLimiter._counters(model)
+        counters["calls"] += 1
+        if not settings.LLM_RATE_LIMIT_ENABLED:
+            return
+
+        # Redis calls are blocking: keep them off the event loop
+        wait = await asyncio.to_thread(LLMRateLimiter._take, model, tokens)
+        if wait <= 0:
+            return
+
+        counters["throttled"] += 1
+        started = time.monotonic()
+        await asyncio.to_thread(LLMRateLimiter._track_queue, model, 1)
+        try:
+            while wait > 0:
+                waited = time.monotonic() - started
+                if waited + wait > settings.LLM_RATE_LIMIT_MAX_WAIT:
+                    raise TimeoutError(f"Waited {waited:.0f}s for an LLM rate limit slot on {model}.")
+                # Small jitter so waiting workers don't all retry at the same instant
+                await asyncio.sleep(wait + random.uniform(0, 0.1))
+                wait = await asyncio.to_thread(LLMRateLimiter._take, model, tokens)
+        finally:
+            counters["wait_seconds"] += time.monotonic() - started
+            await asyncio.to_thread(LLMRateLimiter._track_queue, model, -1)
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        """Seconds from a 429's Retry-After (or retry-after-ms) header, if any."""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000.0
+            value = headers.get("retry-after")
+            if not value:
+                return None
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def backoff_seconds(strikes: int, retry_after: Optional[float]) -> float:
+        """Exponential in the number of 429s in a row, never shorter than Retry-After."""
+        exponential = settings.LLM_BACKOFF_BASE_SECONDS * (2 ** max(0, strikes - 1))
+        delay = max(retry_after or 0.0, exponential)
+        return min(delay, settings.LLM_BACKOFF_MAX_SECONDS) * random.uniform(1.0, 1.2)
+
+    @staticmethod
+    def _record_rate_limited(model: str, retry_after: Optional[float]) -> float:
+        LLMRateLimiter._counters(model)["rate_limited"] += 1
+        try:
+            r = LLMRateLimiter._client()
+            strikes_key = f"{LLMRateLimiter.KEY_PREFIX}strikes:{model}"
+            strikes = r.incr(strikes_key)
+            r.expire(strikes_key, 600)
+            delay = LLMRateLimiter.backoff_seconds(strikes, retry_after)
+            until = time.time() + delay
+            backoff_key = LLMRateLimiter._keys(model)[2]
+            current = float(r.get(backoff_key) or 0)
+            if until > current:
+                r.set(backoff_key, until, px=int(delay * 1000) + 1000)
+        except Exception as e:
+            LLMRateLimiter._redis_failed(e)
+            strikes = LLMRateLimiter._local_strikes.get(model, 0) + 1
+            LLMRateLimiter._local_strikes[model] = strikes
+            delay = LLMRateLimiter.backoff_seconds(strikes, retry_after)
+            LLMRateLimiter._local_backoff[model] = max(LLMRateLimiter._local_backoff.get(model, 0.0), time.time() + delay)
+        return delay
+
+    @staticmethod
+    async def rate_limited(model: str, error: Exception) -> float:
+        """
+        Called on a 429: makes every worker back off from `model`.
+        Returns the backoff in seconds (the next `acquire` waits it out).
+        """
+        retry_after = LLMRateLimiter.retry_after(error)
+        delay = await asyncio.to_thread(LLMRateLimiter._record_rate_limited, model, retry_after)
+        log.warning(f"Rate limited by the LLM provider on {model}, backing off {delay:.1f}s (Retry-After: {retry_after}).")
+        return delay
+
+    @staticmethod
+    def _reset_strikes(model: str):
+        LLMRateLimiter._local_strikes.pop(model, None)
+        try:
+            LLMRateLimiter._client().delete(f"{LLMRateLimiter.KEY_PREFIX}strikes:{model}")
+        except Exception:
+            pass
+
+    @staticmethod
+    async def succeeded(model: str, after_rate_limit: bool):
+        """Resets the backoff growth once a call gets through after 429s."""
+        if after_rate_limit:
+            await asyncio.to_thread(LLMRateLimiter._reset_strikes, model)
+
+    @staticmethod
+    def stats() -> dict:
+        """Per-model limits, queue depth (fleet-wide when Redis is up) and counters of this process."""
+        queue = {model: float(count) for model, count in LLMRateLimiter._waiting.items()}
+        shared = False
+        try:
+            raw = LLMRateLimiter._client().hgetall(f"{LLMRateLimiter.KEY_PREFIX}queue")
+            queue = {key.decode(): max(0, int(value)) for key, value in raw.items()}
+            shared = True
+        except Exception:
+            pass
+
+        models = set(queue) | set(LLMRateLimiter._metrics)
+        return {
+            "enabled": settings.LLM_RATE_LIMIT_ENABLED,
+            "shared": shared,
+            "models": {
+                model: {
+                    **LLMRateLimiter.limits(model),
+                    "queue_depth": int(queue.get(model, 0)),
+                    **{k: round(v, 1) for k, v in LLMRateLimiter._counters(model).items()},
+                }
+                for model in sorted(models)
+            },
+        }
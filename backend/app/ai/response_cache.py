@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from typing import Dict, Optional
+
+from app.config import settings
+from app.utils.logger import log
+
+class LLMResponseCache:
+    """
+    Remembers parsed LLM answers, keyed by what was asked.
+
+    Why this?
+    Re-running generation on a re-scanned project sends the exact same
+    prompts again (same project, framework, method and path). The answer
+    we already have is as good as a new one, and costs nothing.
+
+    The key is a SHA-256 of the template version, the model and the
+    rendered prompt, so changing any of them is a miss. Bump the
+    template's *_PROMPT_VERSION when its instructions change.
+
+    Backends (LLM_CACHE_BACKEND):
+    - "redis": shared by every worker. Entries expire with SETEX and a
+      sorted set of last-use times evicts the least recently used ones
+      above LLM_CACHE_MAX_ENTRIES.
+    - "disk": a local SQLite file per machine, same TTL and LRU rules.
+
+    The cache is best effort: a backend error counts as a miss and is
+    logged, it never fails the AI call.
+    """
+    KEY_PREFIX = "llm_cache:"
+    INDEX_KEY = "llm_cache:index" # Sorted set: key -> last use
+    METRICS_KEY = "llm_cache:metrics"
+
+    _local_metrics: Dict[str, int] = {"hits": 0, "misses": 0, "writes": 0, "bypassed": 0, "evictions": 0, "errors": 0}
+    _redis = None
+    _redis_pid: Optional[int] = None
+    _initialized_for: set = set()
+
+    @staticmethod
+    def make_key(prompt: str, model: str, template_version: str) -> str:
+        digest = hashlib.sha256()
+        for part in (template_version, model, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @staticmethod
+    def _record(metric: str, amount: int = 1):
+        """Counts locally and (best effort) in Redis, like MirrorCache."""
+        LLMResponseCache._local_metrics[metric] += amount
+        try:
+            LLMResponseCache._client().hincrby(LLMResponseCache.METRICS_KEY, metric, amount)
+        except Exception:
+            pass
+
+    # Redis backend
+
+    @staticmethod
+    def _client():
+        """One client (and connection pool) per process, rebuilt after a fork."""
+        if LLMResponseCache._redis is None or LLMResponseCache._redis_pid != os.getpid():
+            import redis as sync_redis
+            LLMResponseCache._redis = sync_redis.from_url(settings.REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+            LLMResponseCache._redis_pid = os.getpid()
+        return LLMResponseCache._redis
+
+    @staticmethod
+    def _redis_get(key: str) -> Optional[str]:
+        r = LLMResponseCache._client()
+        value = r.get(LLMResponseCache.KEY_PREFIX + key)
+        if value is not None:
+            r.zadd(LLMResponseCache.INDEX_KEY, {key: time.time()})
+        return value
+
+    @staticmethod
+    def _redis_put(key: str, value: str) -> int:
+        r = LLMResponseCache._client()
+        now = time.time()
+        pipe = r.pipeline()
+        pipe.setex(LLMResponseCache.KEY_PREFIX + key, settings.LLM_CACHE_TTL_SECONDS, value)
+        pipe.zadd(LLMResponseCache.INDEX_KEY, {key: now})
+        # Keys Redis already expired: drop them from the index too
+        pipe.zremrangebyscore(LLMResponseCache.INDEX_KEY, 0, now - settings.LLM_CACHE_TTL_SECONDS)
+        pipe.zcard(LLMResponseCache.INDEX_KEY)
+        size = pipe.execute()[-1]
+
+        excess = size - settings.LLM_CACHE_MAX_ENTRIES
+        if excess <= 0:
+            return 0
+        oldest = [member for member, _ in r.zpopmin(LLMResponseCache.INDEX_KEY, excess)]
+        if oldest:
+            r.delete(*[LLMResponseCache.KEY_PREFIX + member.decode() for member in oldest])
+        return len(oldest)
+
+    # Disk backend
+
+    @staticmethod
+    def _connect() -> sqlite3.Connection:
+        path = settings.LLM_CACHE_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30)
+
+        if path not in LLMResponseCache._initialized_for:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_used_at ON llm_cache (used_at)")
+            conn.commit()
+            LLMResponseCache._initialized_for.add(path)
+        return conn
+
+    @staticmethod
+    def _disk_get(key: str) -> Optional[str]:
+        conn = LLMResponseCache._connect()
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND created_at > ?",
+                (key, now - settings.LLM_CACHE_TTL_SECONDS)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return row[0]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _disk_put(key: str, value: str) -> int:
+        conn = LLMResponseCache._connect()
+        try:
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            evicted = conn.execute(
+                "DELETE FROM llm_cache WHERE created_at <= ?", (now - settings.LLM_CACHE_TTL_SECONDS,)
+            ).rowcount
+            excess = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - settings.LLM_CACHE_MAX_ENTRIES
+            if excess > 0:
+                evicted += conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY used_at LIMIT ?)", (excess,)
+                ).rowcount
+            conn.commit()
+            return evicted
+        finally:
+            conn.close()
+
+    # Public API
+
+    @staticmethod
+    def get(key: str) -> Optional[dict]:
+        """Returns the cached parsed answer, or None on a miss."""
+        try:
+            if settings.LLM_CACHE_BACKEND == "redis":
+                value = LLMResponseCache._redis_get(key)
+            else:
+                value = LLMResponseCache._disk_get(key)
+        except Exception as e:
+            log.warning(f"LLM response cache read failed: {e}")
+            LLMResponseCache._record("errors")
+            value = None
+
+        if value is None:
+            LLMResponseCache._record("misses")
+            return None
+        LLMResponseCache._record("hits")
+        return json.loads(value)
+
+    @staticmethod
+    def put(key: str, data: dict):
+        """Stores a parsed answer. Only call this with output that parsed cleanly."""
+        try:
+            value = json.dumps(data)
+            if settings.LLM_CACHE_BACKEND == "redis":
+                evicted = LLMResponseCache._redis_put(key, value)
+            else:
+                evicted = LLMResponseCache._disk_put(key, value)
+        except Exception as e:
+            log.warning(f"LLM response cache write failed: {e}")
+            LLMResponseCache._record("errors")
+            return
+        LLMResponseCache._record("writes")
+        if evicted:
+            LLMResponseCache._record("evictions", evicted)
+
+    @staticmethod
+    def record_bypass():
+        LLMResponseCache._record("bypassed")
+
+    @staticmethod
+    def stats() -> dict:
+        """Hit/miss counters (fleet-wide via Redis when available) and the hit rate."""
+        counters = dict(LLMResponseCache._local_metrics)
+        try:
+            shared = LLMResponseCache._client().hgetall(LLMResponseCache.METRICS_KEY)
+            counters = {k: int(shared.get(k.encode(), 0)) for k in counters}
+        except Exception:
+            pass
+
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups * 100, 1) if lookups else 0.0,
+            "enabled": settings.LLM_CACHE_ENABLED,
+            "backend": settings.LLM_CACHE_BACKEND,
+            "ttl_seconds": settings.LLM_CACHE_TTL_SECONDS,
+            "max_entries": settings.LLM_CACHE_MAX_ENTRIES,
+        }
@@ -4,34 +4,141 @@ from app.utils.logger import log
 class AIResponseParser:
     """
     Safe Parsing for AI Output.
-    
-    AI models sometimes include extra text (markdown tags like ```json) 
+
+    AI models sometimes include extra text (markdown tags like ```json)
     even when told not to. This parser cleans that up.
     """
-    
+
     @staticmethod
-    def parse_test_generation(raw_content: str) -> dict:
+    def _extract_json(raw_content: str):
         """
-        Parses the JSON response from the LLM for test generation.
+        Extracts the JSON value from an answer, stripping markdown fences.
+        """
+        if "```json" in raw_content:
+            json_str = raw_content.split("```json")[1].split("```")[0].strip()
+        elif "```" in raw_content:
+            json_str = raw_content.split("```")[1].split("```")[0].strip()
+        else:
+            json_str = raw_content.strip()
+        return json.loads(json_str)
+
+    @staticmethod
+    def _parse_json(raw_content: str, required: list) -> dict:
+        """
+        Extracts the JSON object from an answer and checks its required fields.
         """
         try:
-            # 1. Try to find JSON block if markdown is used
-            if "```json" in raw_content:
-                json_str = raw_content.split("```json")[1].split("```")[0].strip()
-            elif "```" in raw_content:
-                json_str = raw_content.split("```")[1].split("```")[0].strip()
-            else:
-                json_str = raw_content.strip()
-                
-            data = json.loads(json_str)
-            
+            # 1. Find the JSON block, even if markdown is used
+            data = AIResponseParser._extract_json(raw_content)
+
             # 2. Basic Validation
-            required = ["description", "priority", "test_code"]
             if not all(k in data for k in required):
                 raise ValueError(f"Missing required fields in AI response: {data.keys()}")
-                
+
             return data
-            
+
         except Exception as e:
             log.error(f"Failed to parse AI response: {e}. Raw content: {raw_content[:500]}")
             raise ValueError("The AI returned an invalid response format.") from e
+
+    @staticmethod
+    def parse_test_generation(raw_content: str) -> dict:
+        """
+        Parses the JSON response from the LLM for test generation.
+        """
+        return AIResponseParser._parse_json(raw_content, ["description", "priority", "test_code"])
+
+    @staticmethod
+    def parse_healing(raw_content: str) -> dict:
+        """
+        Parses the JSON response from the LLM for self-healing (see HEALING_PROMPT).
+        """
+        return AIResponseParser._parse_json(raw_content, ["reason", "patched_test_code"])
+
+    @staticmethod
+    def _parse_batch(raw_content: str, labels: list, key: str, required: list) -> dict:
+        """
+        Splits a batched answer (a JSON array of items naming their label
+        in `key`) into {label: item}, keeping only the complete items of
+        known labels. Raises if none is usable.
+        """
+        try:
+            data = AIResponseParser._extract_json(raw_content)
+            if isinstance(data, dict):
+                # Some models wrap the array: {"tests": [...]}
+                data = next((value for value in data.values() if isinstance(value, list)), None)
+            if not isinstance(data, list):
+                raise ValueError("Expected a JSON array of test cases.")
+        except Exception as e:
+            log.error(f"Failed to parse batched AI response: {e}. Raw content: {raw_content[:500]}")
+            raise ValueError("The AI returned an invalid response format.") from e
+
+        wanted = {str(label) for label in labels}
+        results = {}
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            label = str(item.get(key, "")).strip()
+            if label not in wanted or label in results:
+                continue
+            if all(isinstance(item.get(k), str) and item[k] for k in required):
+                results[label] = {k: item[k] for k in required}
+
+        if not results:
+            raise ValueError(f"The AI response had no usable item for any {key}.")
+        if len(results) < len(wanted):
+            log.warning(f"Batched AI response covered {len(results)}/{len(wanted)} items.")
+        return results
+
+    @staticmethod
+    def parse_batch_generation(raw_content: str, endpoint_ids: list) -> dict:
+        """
+        Splits a BATCH_TEST_GEN_PROMPT answer back into per-endpoint results.
+
+        Returns {endpoint_id: test data} for the items that are complete.
+        Missing, unknown, duplicated or incomplete items are left out, so
+        the caller can retry just those endpoints on their own. Only an
+        answer without a single usable item raises (and is never cached).
+        """
+        return AIResponseParser._parse_batch(raw_content, endpoint_ids, "endpoint_id", ["description", "priority", "test_code"])
+
+    @staticmethod
+    def parse_batch_healing(raw_content: str, test_ids: list) -> dict:
+        """
+        Splits a BATCH_HEALING_PROMPT answer into {test_id: patch data},
+        with the same rules as `parse_batch_generation`.
+        """
+        return AIResponseParser._parse_batch(raw_content, test_ids, "test_id", ["reason", "patched_test_code"])
+
+    @staticmethod
+    def _check_code(code: str):
+        try:
+            compile(code, "<generated test>", "exec")
+        except (SyntaxError, ValueError) as e:
+            raise ValueError(f"The AI returned code that doesn't compile: {e}") from e
+
+    @staticmethod
+    def validate_test(data: dict) -> dict:
+        """
+        Static check of a parsed test (or healing patch): its code must
+        compile. Raises ValueError otherwise.
+        """
+        AIResponseParser._check_code(data.get("test_code", data.get("patched_test_code", "")))
+        return data
+
+    @staticmethod
+    def validate_batch(data: dict) -> dict:
+        """
+        Keeps the batch items whose code compiles (the others are retried
+        on their own, like missing items). Raises ValueError if none does.
+        """
+        results = {}
+        for label, item in data.items():
+            try:
+                AIResponseParser._check_code(item.get("test_code", item.get("patched_test_code", "")))
+                results[label] = item
+            except ValueError as e:
+                log.warning(f"Dropped the batched test of {label}: {e}")
+        if not results:
+            raise ValueError("No test of the batched AI response compiles.")
+        return results
@@ -0,0 +1,96 @@
+import re
+import json
+from typing import Optional, Tuple
+
+class StreamingJSONPreview:
+    """
+    Reads a JSON answer while it streams in and exposes the code written so far.
+
+    Why this?
+    The full answer takes seconds, but the test code starts arriving after
+    a few hundred milliseconds. Pulling the partial string value of
+    `field` out of the unfinished JSON lets us show it live, long before
+    AIResponseParser can see a complete document.
+
+    It also spots answers that are obviously not going to parse (prose
+    instead of JSON, or no `field` long after it should have appeared), so
+    the caller can stop the stream and stop paying for tokens.
+
+    For batched answers (an array of items), `current()` also returns the
+    `key_field` (endpoint_id) of the item being written.
+    """
+    # No JSON (or markdown fence) after this many characters: not our format
+    MAX_PREAMBLE_CHARS = 300
+    # Every item puts `field` after a couple of short fields
+    MAX_CHARS_BEFORE_FIELD = 4000
+
+    def __init__(self, field: str = "test_code", key_field: str = "endpoint_id"):
+        self.text = ""
+        self.malformed: Optional[str] = None
+        self._field_seen = False
+        self._field_re = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._key_re = re.compile(r'"%s"\s*:\s*"([^"\\]*)"' % re.escape(key_field))
+
+    def feed(self, delta: str):
+        self.text += delta or ""
+        if self.malformed is None:
+            self.malformed = self._check()
+
+    def _check(self) -> Optional[str]:
+        if self._field_seen:
+            return None
+        start = re.search(r"[{\[`]", self.text)
+        if start is None:
+            if len(self.text.strip()) > self.MAX_PREAMBLE_CHARS:
+                return "the answer doesn't contain JSON"
+            return None
+        if start.start() > self.MAX_PREAMBLE_CHARS:
+            return "too much text before the JSON"
+        self._field_seen = self._field_re.search(self.text, start.start()) is not None
+        if not self._field_seen and len(self.text) - start.start() > self.MAX_CHARS_BEFORE_FIELD:
+            return "the JSON has no test code"
+        return None
+
+    @staticmethod
+    def _partial_string(text: str, start: int) -> str:
+        """
+        Decodes the JSON string that begins at `start` (just after its
+        opening quote), up to its closing quote or the last complete
+        character received so far.
+        """
+        i = start
+        end = len(text)
+        while i < len(text):
+            char = text[i]
+            if char == '"':
+                end = i
+                break
+            if char == "\\":
+                # Stop before an escape that hasn't fully arrived yet
+                size = 6 if text[i + 1:i + 2] == "u" else 2
+                if i + size > len(text):
+                    end = i
+                    break
+                i += size
+                continue
+            i += 1
+        try:
+            # strict=False: models often put raw newlines inside strings
+            return json.loads('"' + text[start:end] + '"', strict=False)
+        except ValueError:
+            return text[start:end]
+
+    def current(self) -> Optional[Tuple[Optional[str], str]]:
+        """
+        (key, partial value) of the last `field` seen so far, or None
+        before it starts. The key is None for single-object answers.
+        """
+        matches = list(self._field_re.finditer(self.text))
+        if not matches:
+            return None
+        match = matches[-1]
+        # Only look inside the current item, after the previous item's code
+        item_start = matches[-2].end() if len(matches) > 1 else 0
+        keys = list(self._key_re.finditer(self.text, item_start, match.start()))
+        key = keys[-1].group(1) if keys else None
+        return key, self._partial_string(self.text, match.end())
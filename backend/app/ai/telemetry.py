@@ -0,0 +1,125 @@
+import time
+import uuid
+import threading
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.utils.logger import log
+
+class LLMTelemetry:
+    """
+    Buffers one record per LLM call and appends them to `llm_calls` in bulk.
+
+    Why this?
+    Every generation and healing call should be measurable (latency,
+    tokens, cache hits, parse failures, cost), but a DB write per call
+    would slow down the very thing being measured. Records are kept in
+    memory and written with one multi-row INSERT once LLM_TELEMETRY_BATCH
+    are waiting or the oldest is LLM_TELEMETRY_FLUSH_SECONDS old. Workers
+    also flush at the end of every task.
+
+    Telemetry is best effort: a failed write is logged and never fails
+    the AI call. If the DB stays down, the buffer is capped at
+    LLM_TELEMETRY_MAX_BUFFER records (oldest dropped).
+    """
+    _buffer: List[dict] = []
+    _oldest: Optional[float] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def price(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Cost in USD, from LLM_PRICES (per million tokens) or the defaults."""
+        prices = settings.LLM_PRICES.get(model, {})
+        prompt_price = prices.get("prompt", settings.LLM_PRICE_PROMPT_PER_MTOK)
+        completion_price = prices.get("completion", settings.LLM_PRICE_COMPLETION_PER_MTOK)
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+    @staticmethod
+    def record(
+        profile: str,
+        model: str,
+        outcome: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        latency_ms: Optional[int] = None,
+        ttft_ms: Optional[int] = None,
+        cache_hit: bool = False,
+        results: int = 0,
+        project_id: Optional[UUID] = None,
+        attempt_id: Optional[UUID] = None,
+    ):
+        """
+        Buffers one call. Every call made for the same answer (the models
+        of an escalation, a hedge and its duplicate) shares `attempt_id`;
+        without it the record is an attempt of its own.
+        """
+        if not settings.LLM_TELEMETRY_ENABLED:
+            return
+        row_id = uuid.uuid4()
+        row = {
+            "id": row_id,
+            "attempt_id": attempt_id or row_id,
+            "created_at": datetime.utcnow(),
+            "profile": profile,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": latency_ms,
+            "ttft_ms": ttft_ms,
+            "cache_hit": cache_hit,
+            "parse_ok": outcome == "OK",
+            "outcome": outcome,
+            "results": results,
+            # Cache hits cost nothing
+            "cost_usd": 0.0 if cache_hit else LLMTelemetry.price(model, prompt_tokens, completion_tokens),
+            "project_id": project_id,
+        }
+        with LLMTelemetry._lock:
+            if LLMTelemetry._oldest is None:
+                LLMTelemetry._oldest = time.monotonic()
+            LLMTelemetry._buffer.append(row)
+            overflow = len(LLMTelemetry._buffer) - settings.LLM_TELEMETRY_MAX_BUFFER
+            if overflow > 0:
+                del LLMTelemetry._buffer[:overflow]
+
+    @staticmethod
+    def due() -> bool:
+        """True when the buffer should be written (size or age threshold)."""
+        with LLMTelemetry._lock:
+            if not LLMTelemetry._buffer:
+                return False
+            return (
+                len(LLMTelemetry._buffer) >= settings.LLM_TELEMETRY_BATCH
+                or time.monotonic() - LLMTelemetry._oldest >= settings.LLM_TELEMETRY_FLUSH_SECONDS
+            )
+
+    @staticmethod
+    async def flush() -> int:
+        """Writes every buffered record. Returns how many were written."""
+        with LLMTelemetry._lock:
+            rows, LLMTelemetry._buffer, LLMTelemetry._oldest = LLMTelemetry._buffer, [], None
+        if not rows:
+            return 0
+
+        # Imported here: the AI layer otherwise doesn't depend on the DB
+        from app.db.session import async_session_maker
+        from app.domain.models.llm_call import LLMCall
+        try:
+            async with async_session_maker() as db:
+                await db.execute(insert(LLMCall), rows)
+                await db.commit()
+        except Exception as e:
+            log.warning(f"Could not write {len(rows)} LLM call records: {e}")
+            with LLMTelemetry._lock:
+                # Keep them for the next flush, within the cap
+                LLMTelemetry._buffer[:0] = rows
+                overflow = len(LLMTelemetry._buffer) - settings.LLM_TELEMETRY_MAX_BUFFER
+                if overflow > 0:
+                    del LLMTelemetry._buffer[:overflow]
+                LLMTelemetry._oldest = time.monotonic()
+            return 0
+        return len(rows)
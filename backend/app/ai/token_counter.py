@@ -0,0 +1,40 @@
+from typing import Optional
+
+from app.utils.logger import log
+
+class TokenCounter:
+    """
+    Estimates how many tokens a prompt costs before we send it.
+
+    Why this?
+    Batch sizing and the rate limiter both need token counts up front.
+    tiktoken's cl100k_base is close enough for the models we route to
+    through OpenRouter (none of them publish their own tokenizer here).
+
+    tiktoken downloads its encoding file on first use. Where that isn't
+    possible (offline worker, no cache), we fall back to ~4 characters
+    per token rather than failing the AI call.
+    """
+    ENCODING = "cl100k_base"
+    CHARS_PER_TOKEN = 4
+
+    _encoding = None
+    _unavailable = False
+
+    @staticmethod
+    def _get_encoding() -> Optional[object]:
+        if TokenCounter._encoding is None and not TokenCounter._unavailable:
+            try:
+                import tiktoken
+                TokenCounter._encoding = tiktoken.get_encoding(TokenCounter.ENCODING)
+            except Exception as e:
+                log.warning(f"tiktoken unavailable ({e}), estimating tokens from text length.")
+                TokenCounter._unavailable = True
+        return TokenCounter._encoding
+
+    @staticmethod
+    def count(text: str) -> int:
+        encoding = TokenCounter._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return len(text) // TokenCounter.CHARS_PER_TOKEN + 1
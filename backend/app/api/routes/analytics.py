@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
@@ -41,10 +41,12 @@ async def get_project_dashboard(
 
 @router.get("/ai-efficiency", response_model=AIEfficiencyMetrics)
 async def get_ai_metrics(
+    window: str = Query("7d", pattern="^(1h|24h|7d|30d)$"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Returns metrics on AI generation speed and healing success.
+    Returns metrics on AI generation speed, cost and healing success
+    over the last `window` (1h, 24h, 7d or 30d).
     """
-    return await AnalyticsService.get_ai_efficiency(db, current_user.id)
+    return await AnalyticsService.get_ai_efficiency(db, current_user.id, window)
@@ -19,3 +19,41 @@ async def health_check():
         "environment": settings.ENV,
         "debug_mode": settings.DEBUG
     }
+
+@router.get("/health/repo-cache", tags=["System"])
+def repo_cache_stats():
+    """
+    Repository mirror cache metrics.
+
+    Why this?
+    Lets us confirm scans are reusing mirrors (hit rate) and that
+    LRU eviction keeps the cache inside its disk budget.
+    Plain `def`: it touches the disk and Redis synchronously, so FastAPI
+    runs it in a thread instead of on the event loop.
+    """
+    from app.utils.mirror_cache import MirrorCache
+    return MirrorCache.stats()
+
+@router.get("/health/llm", tags=["System"])
+def llm_stats():
+    """
+    LLM client metrics.
+
+    Why this?
+    `requests_per_connection` well above 1 confirms the pooled clients
+    of this API process reuse connections instead of paying a new TLS
+    handshake per call. The response cache hit rate and the rate limiter
+    queue depth (calls waiting for a slot) are fleet-wide when Redis is
+    available. Routing (escalations) and hedging counters are per process.
+    Plain `def` for the same reason as above.
+    """
+    from app.ai.llm_client import LLMClientRegistry
+    from app.ai.model_router import LLMRouter
+    from app.ai.rate_limiter import LLMRateLimiter
+    from app.ai.response_cache import LLMResponseCache
+    return {
+        "pool": LLMClientRegistry.pool_stats(),
+        "cache": LLMResponseCache.stats(),
+        "rate_limiter": LLMRateLimiter.stats(),
+        "router": LLMRouter.stats(),
+    }
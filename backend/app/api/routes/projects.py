@@ -60,7 +60,7 @@ async def get_project(
     stats = {
         "endpoints": stats_data.endpoints if stats_data else 0,
         "tests": stats_data.tests if stats_data else 0,
-        "pass_rate": 95.0 # Dummy for now
+        "pass_rate": stats_data.pass_rate if stats_data else 0.0
     }
     
     return adapt_project_to_detail(project, stats)
@@ -101,7 +101,7 @@ async def patch_project(
     stats = {
         "endpoints": stats_data.endpoints if stats_data else 0,
         "tests": stats_data.tests if stats_data else 0,
-        "pass_rate": 95.0
+        "pass_rate": stats_data.pass_rate if stats_data else 0.0
     }
     
     return adapt_project_to_detail(project, stats)
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, status, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from uuid import UUID
+
+from app.db.session import get_db
+from app.services.project_service import ProjectService
+from app.services.test_run_service import TestRunService
+from app.dependencies.auth import get_current_user
+from app.domain.models.user import User
+from app.workers.test_run_job import run_tests
+from app.dto.test_run_dto import TestRunDTO, TestRunDetailDTO, adapt_test_run, adapt_test_run_detail
+from app.dto.auth_dto import BaseDTO
+
+router = APIRouter(prefix="/projects", tags=["Runs"])
+
+class RunTestsRequest(BaseDTO):
+    test_case_ids: Optional[List[UUID]] = None # None = every test of the project
+
+@router.post("/{project_id}/runs", status_code=status.HTTP_202_ACCEPTED)
+async def start_run(
+    project_id: UUID,
+    request: RunTestsRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Runs tests against the project's `apiBaseUrl`: `testCaseIds`, or
+    without them every test of the project. Progress is streamed as
+    TEST_RUN_PROGRESS events, the totals as JOB_COMPLETED (jobType "run").
+    """
+    await ProjectService.get_project(db, project_id, current_user.id)
+    run, test_case_ids = await TestRunService.create_run(db, project_id, request.test_case_ids)
+
+    try:
+        # The task id is the run id
+        run_tests.apply_async(args=[str(project_id), str(run.id), test_case_ids], task_id=str(run.id))
+    except Exception as e:
+        await TestRunService.finish_run(db, run.id, error=f"Could not enqueue: {e}")
+        raise HTTPException(status_code=503, detail="Could not queue the test run.")
+
+    return {
+        "runId": str(run.id),
+        "status": "queued",
+        "message": f"Running {len(test_case_ids)} tests."
+    }
+
+@router.get("/{project_id}/runs", response_model=List[TestRunDTO])
+async def list_runs(
+    project_id: UUID,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    The project's latest test runs, newest first.
+    """
+    await ProjectService.get_project(db, project_id, current_user.id)
+    runs = await TestRunService.list_runs(db, project_id, limit)
+    return [adapt_test_run(run) for run in runs]
+
+@router.get("/{project_id}/runs/{run_id}", response_model=TestRunDetailDTO)
+async def get_run(
+    project_id: UUID,
+    run_id: UUID,
+    result_status: Optional[str] = Query(None, alias="status"),
+    limit: int = Query(1000, ge=1, le=10000),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    A test run with a page of its results. Works while the run is going:
+    finished chunks are already there. `?status=FAILED` only lists failures.
+    """
+    await ProjectService.get_project(db, project_id, current_user.id)
+    run, results = await TestRunService.get_run(db, project_id, run_id, result_status, limit, offset)
+    return adapt_test_run_detail(run, results)
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
 from app.db.session import get_db
@@ -10,14 +10,22 @@ from app.dependencies.auth import get_current_user
 from app.domain.models.user import User
 from app.domain.models.test_case import TestCase
 from app.workers.generation_job import batch_generate_tests
-from app.workers.healing_job import run_self_healing
+from app.services.generation_job_service import GenerationJobService
+from app.workers.healing_job import run_self_healing, run_batch_healing
 from app.dto.test_case_dto import TestCaseListItemDTO, TestCaseDetailDTO, adapt_test_case_to_list_item, adapt_test_case_to_detail
+from app.dto.generation_job_dto import GenerationJobDTO, adapt_generation_job
 from app.dto.auth_dto import BaseDTO
 
 router = APIRouter(prefix="/projects", tags=["Tests"])
 
 class GenerateTestsRequest(BaseDTO):
     endpoint_ids: List[UUID]
+    bypass_cache: bool = False # Ask the AI again even if an identical prompt was answered before
+    stream_preview: bool = False # Push the test code to the project's WebSocket while it's written (GENERATION_PREVIEW)
+
+class HealTestsRequest(BaseDTO):
+    test_case_ids: Optional[List[UUID]] = None # None = every broken test and every test of a renamed endpoint
+    bypass_cache: bool = False
 
 @router.get("/{project_id}/test-cases", response_model=List[TestCaseListItemDTO])
 async def list_test_cases(
@@ -63,30 +71,93 @@ async def generate_tests(
 ):
     """
     Triggers AI test generation for specific endpoints.
+
+    The same endpoints submitted again while their job is still queued or
+    running get that job's id back instead of a second job.
     """
     await ProjectService.get_project(db, project_id, current_user.id)
     
     ep_id_strs = [str(eid) for eid in request.endpoint_ids]
-    task = batch_generate_tests.delay(str(project_id), ep_id_strs)
+    job, created = await GenerationJobService.submit(db, project_id, ep_id_strs)
+    if not created:
+        return {
+            "jobId": str(job.id),
+            "status": job.status.lower(),
+            "message": "The same generation is already in progress."
+        }
+
+    try:
+        # The task id is the job id: retries and redeliveries resume the same job
+        batch_generate_tests.apply_async(
+            args=[str(project_id), ep_id_strs],
+            kwargs={
+                "use_cache": not request.bypass_cache,
+                "stream_preview": request.stream_preview,
+                "job_id": str(job.id),
+            },
+            task_id=str(job.id)
+        )
+    except Exception as e:
+        await GenerationJobService.finish(db, job.id, "FAILED", f"Could not enqueue: {e}")
+        raise HTTPException(status_code=503, detail="Could not queue the generation job.")
     
     return {
-        "jobId": task.id,
+        "jobId": str(job.id),
         "status": "queued",
         "message": f"AI Generation started for {len(ep_id_strs)} endpoints."
     }
 
+@router.get("/{project_id}/tests/generate/{job_id}", response_model=GenerationJobDTO)
+async def get_generation_job(
+    project_id: UUID,
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Progress of a generation job, per endpoint. Works while the job runs:
+    finished endpoints already link to their test case.
+    """
+    await ProjectService.get_project(db, project_id, current_user.id)
+    job, items = await GenerationJobService.get_job(db, project_id, job_id)
+    return adapt_generation_job(job, items)
+
+@router.post("/{project_id}/tests/heal", status_code=status.HTTP_202_ACCEPTED)
+async def heal_tests(
+    project_id: UUID,
+    request: HealTestsRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Triggers self-healing for many tests in one job: `testCaseIds`, or
+    without them every test of the project that needs it. Progress is
+    streamed as HEALING_STATUS events carrying the job id.
+    """
+    await ProjectService.get_project(db, project_id, current_user.id)
+    test_case_ids = [str(tid) for tid in request.test_case_ids] if request.test_case_ids is not None else None
+    task = run_batch_healing.delay(str(project_id), test_case_ids, use_cache=not request.bypass_cache)
+
+    return {
+        "jobId": task.id,
+        "status": "queued",
+        "message": "Batch self-healing has been enqueued."
+    }
+
 @router.post("/{project_id}/tests/{test_case_id}/heal", status_code=status.HTTP_202_ACCEPTED)
 async def heal_test(
     project_id: UUID,
     test_case_id: UUID,
+    bypass_cache: bool = Query(False, alias="bypassCache"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Triggers self-healing for a specific failed test.
+    `?bypassCache=true` asks the AI for a fresh patch.
     """
     await ProjectService.get_project(db, project_id, current_user.id)
-    task = run_self_healing.delay(str(project_id), str(test_case_id))
+    task = run_self_healing.delay(str(project_id), str(test_case_id), use_cache=not bypass_cache)
     
     return {
         "jobId": task.id,
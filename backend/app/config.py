@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, Optional
+import os
+import tempfile
 
 class Settings(BaseSettings):
     """
@@ -30,7 +32,83 @@ class Settings(BaseSettings):
     # AI Settings (OpenRouter)
     OPENROUTER_API_KEY: str = "sk-or-v1-..." # User should set this in .env
     OPENROUTER_MODEL: str = "deepseek/deepseek-chat"
-    
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+    GENERATION_CONCURRENCY: int = 16 # Max LLM calls in flight per generation job
+    GENERATION_BATCH_MAX: int = 8 # Endpoints per generation prompt (1 = one call per endpoint)
+    GENERATION_BATCH_TOKEN_BUDGET: int = 6000 # Prompt + expected answer tokens per batched call
+    GENERATION_TOKENS_PER_TEST: int = 400 # Expected answer size per endpoint, used to size batches
+    GENERATION_JOB_STALE_SECONDS: int = 3600 # A queued/running job without progress this long stops blocking resubmits
+    GENERATION_WRITE_BATCH: int = 200 # Generated tests buffered before they are written in one transaction
+    GENERATION_WRITE_SECONDS: float = 2.0 # Max age of a buffered test before it is written anyway
+    GENERATION_MODEL: str = "" # Empty = OPENROUTER_MODEL
+    GENERATION_FAST_MODEL: str = "" # Tried before GENERATION_MODEL, which only gets the answers it gets wrong (empty = off)
+    GENERATION_TIMEOUT: float = 90.0 # Seconds per generation call
+    HEALING_MODEL: str = "" # Empty = OPENROUTER_MODEL
+    HEALING_FAST_MODEL: str = "" # Same as GENERATION_FAST_MODEL, for healing
+    HEALING_AST_ENABLED: bool = True # Rewrite plain method/path changes locally, without the LLM
+    HEALING_TIMEOUT: float = 45.0 # Seconds per healing call
+    HEALING_CONCURRENCY: int = 8 # Max LLM calls in flight per batch healing job
+    HEALING_BATCH_MAX: int = 8 # Tests of one endpoint change per healing prompt (1 = one call per test)
+    HEALING_ON_SCAN: bool = True # Start a batch heal for the tests of endpoints a scan renamed
+    RUN_TESTS_ON_SCAN: bool = True # Start a test run for the tests of endpoints whose source a scan saw change (same signature)
+    LLM_HTTP2: bool = True # Needs the httpx[http2] extra, falls back to HTTP/1.1 keep-alive
+    LLM_MAX_CONNECTIONS: int = 20 # Per LLM client pool (each pool talks to one host)
+    LLM_MAX_KEEPALIVE: int = 10 # Idle connections kept open per pool
+    LLM_KEEPALIVE_SECONDS: float = 60.0
+    LLM_MAX_RETRIES: int = 2 # Retries of a call after connection errors / 5xx (429s: LLM_RATE_LIMIT_RETRIES)
+    LLM_RATE_LIMIT_ENABLED: bool = True # Shared per-model RPM/TPM buckets (Redis, per process without it)
+    LLM_RPM: int = 60 # Requests per minute per model, for all workers together
+    LLM_TPM: int = 100000 # Tokens per minute per model (prompt + expected answer)
+    LLM_RATE_LIMITS: Dict[str, Dict[str, int]] = {} # Per-model overrides, e.g. {"openai/gpt-4o": {"rpm": 500, "tpm": 300000}}
+    LLM_EXPECTED_ANSWER_TOKENS: int = 500 # Charged against TPM for a call before its answer is known
+    LLM_RATE_LIMIT_MAX_WAIT: float = 600.0 # Seconds a call may wait for a slot before it fails
+    LLM_RATE_LIMIT_RETRIES: int = 5 # 429s tolerated per call, with backoff between them
+    LLM_BACKOFF_BASE_SECONDS: float = 2.0 # Backoff after the first 429, doubled for each one in a row
+    LLM_BACKOFF_MAX_SECONDS: float = 120.0
+    LLM_HEDGE_ENABLED: bool = True # Send a duplicate of calls slower than usual, keep the first answer
+    LLM_HEDGE_PERCENTILE: float = 95.0 # "Slower than usual": this percentile of the model's recent latencies
+    LLM_HEDGE_MIN_SAMPLES: int = 20 # Latencies needed before a model's calls are hedged
+    LLM_HEDGE_WINDOW: int = 200 # Recent latencies kept per model
+    LLM_HEDGE_MIN_DELAY: float = 2.0 # Never hedge before this many seconds
+    LLM_STREAM_PREVIEW_SECONDS: float = 0.25 # Min interval between live test code previews per call
+    STREAM_PREVIEW_MAX_PENDING: int = 64 # Endpoints with a preview waiting for Redis per job; more are dropped
+    STREAM_PREVIEW_PUBLISH_TIMEOUT: float = 2.0 # Seconds per preview publish before Redis counts as down
+    LLM_CACHE_ENABLED: bool = True # Reuse answers to identical prompts (same model + template version)
+    LLM_CACHE_BACKEND: str = "redis" # "redis" (shared by all workers) or "disk" (SQLite file per machine)
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    LLM_CACHE_MAX_ENTRIES: int = 50000 # Least recently used answers are evicted above this
+    LLM_CACHE_PATH: str = os.path.join(tempfile.gettempdir(), "ai_testgen_llm_cache.sqlite3") # "disk" backend only
+    LLM_TELEMETRY_ENABLED: bool = True # Record every LLM call in llm_calls (AI efficiency analytics)
+    LLM_TELEMETRY_BATCH: int = 50 # Call records buffered before they are written in one INSERT
+    LLM_TELEMETRY_FLUSH_SECONDS: float = 10.0 # Max age of a buffered record (checked on the next call and at task end)
+    LLM_TELEMETRY_MAX_BUFFER: int = 10000 # Records kept while the DB is unreachable, oldest dropped
+    LLM_PRICE_PROMPT_PER_MTOK: float = 0.0 # USD per million prompt tokens, for models not in LLM_PRICES
+    LLM_PRICE_COMPLETION_PER_MTOK: float = 0.0 # USD per million completion tokens
+    LLM_PRICES: Dict[str, Dict[str, float]] = {} # Per-model prices, e.g. {"openai/gpt-4o": {"prompt": 2.5, "completion": 10}}
+
+    # Scanner Settings
+    SCAN_WORKERS: int = 0 # 0 = one parser process per CPU core, 1 = serial
+    SCAN_CHUNK_SIZE: int = 256 # Files handed to a parser process at a time
+    SCAN_PARALLEL_MIN_FILES: int = 500 # Below this, a process pool costs more than it saves
+    SCAN_SHARDS: int = 0 # >1 fans full scans of big repos out over this many Celery tasks
+    SCAN_SHARD_MIN_FILES: int = 20000 # Repos with fewer source files are scanned by one worker
+    SCAN_MAX_FILE_KB: int = 1024 # Bigger files (minified bundles, fixtures) are skipped
+    REPO_CACHE_DIR: str = os.path.join(tempfile.gettempdir(), "ai_testgen_repos") # Bare mirrors + scan worktrees
+    REPO_CACHE_MAX_MB: int = 5120 # LRU eviction kicks in above this size
+    REPO_CACHE_MAINTENANCE_SECONDS: int = 300 # How often eviction + stale worktree cleanup run
+    REPO_PARTIAL_CLONE: bool = True # Blobless clone + sparse checkout of source files (projects can override)
+    PARSE_CACHE_ENABLED: bool = True
+    PARSE_CACHE_PATH: str = os.path.join(tempfile.gettempdir(), "ai_testgen_repos", "parse_cache.sqlite3") # Keyed by git blob SHA
+
+    # Test Execution Settings
+    TEST_RUN_CHUNK_SIZE: int = 200 # Tests per Celery task of a run (the unit spread across worker nodes)
+    TEST_RUN_WORKERS: int = 0 # Test processes per chunk task: 0 = one per CPU core, 1 = serial
+    TEST_RUN_POOL_CHUNK: int = 10 # Tests handed to a test process at a time
+    TEST_RUN_MAX_TASKS_PER_CHILD: int = 50 # Pool chunks a test process runs before it is replaced (leaked state)
+    TEST_TIMEOUT_SECONDS: float = 30.0 # Per test, then it is reported as TIMEOUT
+    TEST_RUN_MAX_ERROR_CHARS: int = 2000 # Traceback tail kept per failed test
+    TEST_RUN_WRITE_BATCH: int = 1000 # TestResult rows per INSERT
+
     # Load from .env file if it exists
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
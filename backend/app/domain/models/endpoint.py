@@ -1,8 +1,9 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, DateTime, ForeignKey
+from sqlalchemy import String, Integer, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
+from typing import Optional
 
 from app.db.base import Base
 
@@ -11,11 +12,17 @@ class Endpoint(Base):
     Represents an API route discovered in a project's codebase.
     """
     __tablename__ = "endpoints"
+    __table_args__ = (
+        # One row per route: lets the scanner upsert with ON CONFLICT
+        UniqueConstraint("project_id", "method", "path", name="uq_endpoints_project_method_path"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     method: Mapped[str] = mapped_column(String, nullable=False) # GET, POST, etc.
     path: Mapped[str] = mapped_column(String, nullable=False)
     framework: Mapped[str] = mapped_column(String, nullable=False) # FastAPI, Express, etc.
+    source_file: Mapped[Optional[str]] = mapped_column(String, nullable=True, index=True) # Primary declaring file (all of them: EndpointSource)
+    source_line: Mapped[Optional[int]] = mapped_column(Integer, nullable=True) # Line of the declaration in source_file
     status: Mapped[str] = mapped_column(String, default="Scanned") # Scanned, Unscanned, Error, Warning
     last_scanned: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -24,4 +31,4 @@ class Endpoint(Base):
 
     # Relationships
     project: Mapped["Project"] = relationship("Project", back_populates="endpoints")
-    test_cases: Mapped[list["TestCase"]] = relationship("TestCase", back_populates="endpoint", cascade="all, delete-orphan")
+    test_cases: Mapped[list["TestCase"]] = relationship("TestCase", back_populates="endpoint", cascade="all, delete-orphan", passive_deletes=True)
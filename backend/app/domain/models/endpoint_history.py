@@ -0,0 +1,57 @@
+import uuid
+import hashlib
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.base import Base
+
+class EndpointHistory(Base):
+    """
+    One row per change a scan made to an endpoint: ADDED, MODIFIED (its
+    method or path changed in place, see ScannerService.plan_reconcile)
+    or REMOVED. Append-only, written in bulk by the scanner.
+
+    Why this?
+    Healing needs to know what an endpoint looked like before it changed,
+    and impact analysis needs to know what a scan changed. Both are single
+    index lookups here:
+    - previous versions of endpoint X: (endpoint_id, created_at)
+    - endpoints changed by scan S: (project_id, scan_sha)
+
+    `endpoint_id` has no foreign key so REMOVED rows outlive the endpoint.
+    Moves of a route inside its file (only the line changed) aren't
+    recorded: the endpoint row always has the current file and line.
+    """
+    __tablename__ = "endpoint_history"
+    __table_args__ = (
+        Index("ix_endpoint_history_endpoint_created", "endpoint_id", "created_at"),
+        Index("ix_endpoint_history_project_scan", "project_id", "scan_sha"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    endpoint_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    scan_sha: Mapped[Optional[str]] = mapped_column(String, nullable=True) # Commit the scan ran at
+    change: Mapped[str] = mapped_column(String, nullable=False) # ADDED, MODIFIED, REMOVED
+
+    # The endpoint after the change (before it, for REMOVED)
+    method: Mapped[str] = mapped_column(String, nullable=False)
+    path: Mapped[str] = mapped_column(String, nullable=False)
+    framework: Mapped[str] = mapped_column(String, nullable=False)
+    signature_hash: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    source_file: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    source_line: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    # MODIFIED only: the signature it had before
+    old_method: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    old_path: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def signature(method: str, path: str) -> str:
+        """Hash of what a test depends on: the method and the path."""
+        return hashlib.sha1(f"{method.upper()} {path}".encode("utf-8")).hexdigest()
@@ -0,0 +1,24 @@
+import uuid
+from sqlalchemy import String, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.base import Base
+
+class EndpointSource(Base):
+    """
+    Links an endpoint to every file that declares it.
+
+    Why this?
+    The same route is often declared in several files (e.g. `router.get('/')`
+    in many Express routers). An incremental scan only re-parses changed files,
+    so it may only delete a route once NO file declares it anymore.
+    """
+    __tablename__ = "endpoint_sources"
+    __table_args__ = (
+        Index("ix_endpoint_sources_project_file", "project_id", "source_file"),
+    )
+
+    endpoint_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("endpoints.id", ondelete="CASCADE"), primary_key=True)
+    source_file: Mapped[str] = mapped_column(String, primary_key=True) # Repo-relative path
+    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
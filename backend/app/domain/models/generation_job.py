@@ -0,0 +1,56 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, Text, Integer, DateTime, ForeignKey, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.base import Base
+
+class GenerationJob(Base):
+    """
+    One request to generate tests for a set of endpoints.
+
+    Why this?
+    The Celery task can be retried or redelivered. With the job and its
+    items stored here, a rerun only does the endpoints that aren't done
+    yet, and the same batch submitted twice maps to one active job.
+    """
+    __tablename__ = "generation_jobs"
+    __table_args__ = (
+        # At most one queued/running job per (project, endpoint set)
+        Index(
+            "uq_generation_jobs_active_key", "dedupe_key", unique=True,
+            postgresql_where=text("status IN ('QUEUED', 'RUNNING')")
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4) # Also the Celery task id
+    dedupe_key: Mapped[str] = mapped_column(String, nullable=False) # Hash of project + sorted endpoint ids
+    status: Mapped[str] = mapped_column(String, default="QUEUED") # QUEUED, RUNNING, COMPLETED, FAILED
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    project_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+
+class GenerationJobItem(Base):
+    """
+    The state of one endpoint inside a GenerationJob.
+
+    The TestCase and the DONE mark are written in the same transaction,
+    so an endpoint can never get a test without being marked done (or
+    the other way round).
+    """
+    __tablename__ = "generation_job_items"
+
+    job_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("generation_jobs.id", ondelete="CASCADE"), primary_key=True)
+    endpoint_id: Mapped[str] = mapped_column(String, primary_key=True) # As submitted, so malformed ids can be reported too
+    status: Mapped[str] = mapped_column(String, default="PENDING") # PENDING, DONE, FAILED
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    test_case_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), ForeignKey("test_cases.id", ondelete="SET NULL"), nullable=True)
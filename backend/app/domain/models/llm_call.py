@@ -0,0 +1,42 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, Integer, Float, Boolean, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.base import Base
+
+class LLMCall(Base):
+    """
+    One LLM request made by generation or healing (cache hits included).
+
+    Why this?
+    AI efficiency analytics (latency percentiles, tokens per test, heal
+    success rate, spend) are computed from these rows. The table is
+    append-only and written in batches by LLMTelemetry, so recording a
+    call never costs it a round trip of its own.
+    """
+    __tablename__ = "llm_calls"
+    __table_args__ = (
+        Index("ix_llm_calls_project_created", "project_id", "created_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    profile: Mapped[str] = mapped_column(String, nullable=False) # generation, healing
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    prompt_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    latency_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True) # Model time of the last attempt, None for cache hits
+    ttft_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True) # Time to first token, streamed calls only
+    cache_hit: Mapped[bool] = mapped_column(Boolean, default=False)
+    parse_ok: Mapped[bool] = mapped_column(Boolean, default=False)
+    outcome: Mapped[str] = mapped_column(String, nullable=False) # OK, PARSE_ERROR, RATE_LIMITED, ERROR
+    results: Mapped[int] = mapped_column(Integer, default=0) # Tests (or patches) the answer produced
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0) # At the prices configured when the call was made
+    # Shared by the calls made for one answer (escalations, hedges): success rates count attempts, not calls
+    attempt_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), nullable=True)
+
+    # No foreign key: telemetry outlives deleted projects and never blocks a delete
+    project_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), nullable=True)
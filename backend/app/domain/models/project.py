@@ -1,8 +1,9 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, DateTime, ForeignKey
+from sqlalchemy import String, Boolean, DateTime, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
+from typing import Optional
 
 from app.db.base import Base
 
@@ -19,6 +20,10 @@ class Project(Base):
     api_base_url: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     status: Mapped[str] = mapped_column(String, default="Active") # Active, Scanning, Failed, Error
     icon: Mapped[str] = mapped_column(String, default="🚀")
+    scan_ignore: Mapped[Optional[str]] = mapped_column(String, nullable=True) # Extra .gitignore-style patterns, one per line
+    partial_clone: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True) # None = use REPO_PARTIAL_CLONE
+    last_scanned_sha: Mapped[Optional[str]] = mapped_column(String, nullable=True) # Commit of the last successful scan
+    scan_fingerprint: Mapped[Optional[str]] = mapped_column(String, nullable=True) # Parser version + scan settings of that scan
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
     owner_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -1,5 +1,6 @@
 import uuid
 from datetime import datetime
+from typing import Optional
 from sqlalchemy import String, Text, DateTime, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
@@ -18,8 +19,9 @@ class TestCase(Base):
     test_code: Mapped[str] = mapped_column(Text, nullable=False)
     status: Mapped[str] = mapped_column(String, default="DRAFT") # DRAFT, ACTIVE, BROKEN
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    healed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True) # Last time healing rewrote it
     
-    endpoint_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("endpoints.id"), nullable=False)
+    endpoint_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("endpoints.id", ondelete="CASCADE"), nullable=False, index=True) # Impact index: endpoint -> tests
 
     # Relationships
     endpoint: Mapped["Endpoint"] = relationship("Endpoint", back_populates="test_cases")
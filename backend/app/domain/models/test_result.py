@@ -0,0 +1,30 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, Text, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.base import Base
+
+class TestResult(Base):
+    """
+    The outcome of one test case in a TestRun.
+
+    Written in bulk by the run's chunk tasks (one INSERT per
+    TEST_RUN_WRITE_BATCH rows), never updated.
+    """
+    __tablename__ = "test_results"
+    __table_args__ = (
+        # Results of a run, optionally only the failures
+        Index("ix_test_results_run_status", "run_id", "status"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    run_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("test_runs.id", ondelete="CASCADE"), nullable=False)
+    # Kept (without its test) when the test case is deleted
+    test_case_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), ForeignKey("test_cases.id", ondelete="SET NULL"), nullable=True)
+    status: Mapped[str] = mapped_column(String, nullable=False) # PASSED, FAILED, ERROR, TIMEOUT, SKIPPED
+    duration_ms: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True) # Traceback tail, TEST_RUN_MAX_ERROR_CHARS at most
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
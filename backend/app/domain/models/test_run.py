@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import String, DateTime, ForeignKey
+from sqlalchemy import String, Integer, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -10,13 +10,28 @@ from app.db.base import Base
 class TestRun(Base):
     """
     Records an execution task of tests for a project.
+
+    The counters are incremented by each chunk of the run as it finishes
+    (see TestRunService.save_results), so progress and the pass rate are
+    read without counting TestResult rows.
     """
     __tablename__ = "test_runs"
+    __table_args__ = (
+        # Latest runs of a project (run history, last run status, pass rate)
+        Index("ix_test_runs_project_started", "project_id", "started_at"),
+    )
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    status: Mapped[str] = mapped_column(String, default="RUNNING") # RUNNING, SUCCESS, FAILED
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4) # Also the Celery task id
+    status: Mapped[str] = mapped_column(String, default="RUNNING") # RUNNING, SUCCESS, FAILED, ERROR (the run itself broke)
     started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    total_count: Mapped[int] = mapped_column(Integer, default=0) # Tests the run was started with
+    passed_count: Mapped[int] = mapped_column(Integer, default=0)
+    failed_count: Mapped[int] = mapped_column(Integer, default=0)
+    error_count: Mapped[int] = mapped_column(Integer, default=0) # ERROR + TIMEOUT
+    skipped_count: Mapped[int] = mapped_column(Integer, default=0) # Includes tests deleted before they ran
+    pass_rate: Mapped[Optional[float]] = mapped_column(Float, nullable=True) # Set when the run finishes
     
     project_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("projects.id"), nullable=False)
 
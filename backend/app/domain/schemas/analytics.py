@@ -16,9 +16,19 @@ class ProjectAnalytics(BaseSchema):
     endpoints: int
     tests: int
     last_run_status: Optional[str] = "N/A"
+    pass_rate: float = 0.0 # Latest finished run
     healing_rate: float
 
 class AIEfficiencyMetrics(BaseSchema):
-    avg_generation_time_sec: float
+    window: str = "7d"
+    avg_generation_time_sec: float # Uncached generation calls only
+    p50_latency_sec: float = 0.0
+    p95_latency_sec: float = 0.0
+    p50_ttft_sec: Optional[float] = None # Streamed calls only
+    llm_calls: int = 0
+    cache_hit_rate: float = 0.0
+    parse_failure_rate: float = 0.0
+    tokens_per_test: float = 0.0 # Prompt + completion tokens of uncached generation calls per test they produced
     healing_success_rate: float
     failed_heal_attempts: int
+    spend_usd: float = 0.0
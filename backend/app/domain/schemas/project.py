@@ -11,6 +11,8 @@ class ProjectBase(BaseSchema):
     git_url: str
     description: Optional[str] = None
     api_base_url: Optional[str] = None
+    scan_ignore: Optional[str] = None # .gitignore-style patterns the scanner should skip
+    partial_clone: Optional[bool] = None # Only download source files when scanning (default from settings)
 
 class ProjectCreate(ProjectBase):
     """Fields required to create a project."""
@@ -22,6 +24,8 @@ class ProjectUpdate(BaseSchema):
     git_url: Optional[str] = None
     description: Optional[str] = None
     api_base_url: Optional[str] = None
+    scan_ignore: Optional[str] = None
+    partial_clone: Optional[bool] = None
 
 class ProjectShort(BaseSchema):
     """Summarized view for listing multiple projects."""
@@ -3,3 +3,4 @@ from .project_dto import ProjectCardDTO, ProjectResponseDTO, adapt_project_to_ca
 from .endpoint_dto import EndpointDTO, adapt_endpoint_to_list_item
 from .test_case_dto import TestCaseListItemDTO, TestCaseDetailDTO, adapt_test_case_to_list_item, adapt_test_case_to_detail
 from .analytics_dto import AnalyticsDashboardDTO, adapt_analytics_to_dashboard
+from .generation_job_dto import GenerationJobDTO, GenerationJobItemDTO, adapt_generation_job
@@ -0,0 +1,60 @@
+from pydantic import BaseModel, ConfigDict
+from pydantic.alias_generators import to_camel
+from uuid import UUID
+from typing import List, Optional
+from app.domain.models.generation_job import GenerationJob, GenerationJobItem
+
+class BaseDTO(BaseModel):
+    """Base DTO with camelCase alias support."""
+    model_config = ConfigDict(
+        alias_generator=to_camel,
+        populate_by_name=True,
+        from_attributes=True
+    )
+
+class GenerationJobItemDTO(BaseDTO):
+    endpoint_id: str
+    status: str
+    test_case_id: Optional[UUID] = None
+    error: Optional[str] = None
+    attempts: int
+
+class GenerationJobDTO(BaseDTO):
+    id: UUID
+    status: str
+    total: int
+    completed: int
+    failed: int
+    pending: int
+    error: Optional[str] = None
+    created_at: str
+    finished_at: Optional[str] = None
+    items: List[GenerationJobItemDTO]
+
+def adapt_generation_job(job: GenerationJob, items: List[GenerationJobItem]) -> GenerationJobDTO:
+    """
+    Adapter: Domain GenerationJob (+ items) -> GenerationJobDTO
+    """
+    completed = sum(1 for item in items if item.status == "DONE")
+    failed = sum(1 for item in items if item.status == "FAILED")
+    return GenerationJobDTO(
+        id=job.id,
+        status=job.status,
+        total=job.total,
+        completed=completed,
+        failed=failed,
+        pending=len(items) - completed - failed,
+        error=job.error,
+        created_at=job.created_at.isoformat(),
+        finished_at=job.finished_at.isoformat() if job.finished_at else None,
+        items=[
+            GenerationJobItemDTO(
+                endpoint_id=item.endpoint_id,
+                status=item.status,
+                test_case_id=item.test_case_id,
+                error=item.error,
+                attempts=item.attempts or 0
+            )
+            for item in items
+        ]
+    )
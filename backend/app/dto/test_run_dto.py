@@ -0,0 +1,76 @@
+from pydantic import BaseModel, ConfigDict
+from pydantic.alias_generators import to_camel
+from uuid import UUID
+from typing import List, Optional
+from app.domain.models.test_run import TestRun
+from app.domain.models.test_result import TestResult
+
+class BaseDTO(BaseModel):
+    """Base DTO with camelCase alias support."""
+    model_config = ConfigDict(
+        alias_generator=to_camel,
+        populate_by_name=True,
+        from_attributes=True
+    )
+
+class TestRunDTO(BaseDTO):
+    id: UUID
+    status: str
+    total: int
+    passed: int
+    failed: int
+    errors: int
+    skipped: int
+    pending: int
+    pass_rate: Optional[float] = None
+    started_at: str
+    finished_at: Optional[str] = None
+    duration: Optional[float] = None # Seconds, once finished
+
+class TestResultDTO(BaseDTO):
+    test_case_id: Optional[UUID] = None
+    status: str
+    duration_ms: int
+    error: Optional[str] = None
+
+class TestRunDetailDTO(TestRunDTO):
+    results: List[TestResultDTO]
+
+def adapt_test_run(run: TestRun) -> TestRunDTO:
+    """
+    Adapter: Domain TestRun -> TestRunDTO
+    """
+    total, passed, failed, errors, skipped = (
+        count or 0 for count in (run.total_count, run.passed_count, run.failed_count, run.error_count, run.skipped_count)
+    )
+    return TestRunDTO(
+        id=run.id,
+        status=run.status,
+        total=total,
+        passed=passed,
+        failed=failed,
+        errors=errors,
+        skipped=skipped,
+        pending=max(0, total - passed - failed - errors - skipped),
+        pass_rate=run.pass_rate,
+        started_at=run.started_at.isoformat(),
+        finished_at=run.finished_at.isoformat() if run.finished_at else None,
+        duration=round((run.finished_at - run.started_at).total_seconds(), 1) if run.finished_at else None
+    )
+
+def adapt_test_run_detail(run: TestRun, results: List[TestResult]) -> TestRunDetailDTO:
+    """
+    Adapter: Domain TestRun (+ a page of its results) -> TestRunDetailDTO
+    """
+    return TestRunDetailDTO(
+        **adapt_test_run(run).model_dump(),
+        results=[
+            TestResultDTO(
+                test_case_id=result.test_case_id,
+                status=result.status,
+                duration_ms=result.duration_ms or 0,
+                error=result.error
+            )
+            for result in results
+        ]
+    )
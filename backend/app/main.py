@@ -4,8 +4,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.config import settings
+from app.ai.telemetry import LLMTelemetry
 from app.utils.logger import log
-from app.api.routes import health, auth, projects, scanning, tests, websocket, analytics, api_keys
+from app.api.routes import health, auth, projects, scanning, tests, websocket, analytics, api_keys, runs
 from app.websocket.dispatcher import EventDispatcher
 
 @asynccontextmanager
@@ -14,6 +15,7 @@ async def lifespan(app: FastAPI):
     dispatcher_task = create_task(EventDispatcher.listen())
     yield
     log.info(f"Shutting down {settings.APP_NAME}...")
+    await LLMTelemetry.flush()
     dispatcher_task.cancel()
     try:
         await dispatcher_task
@@ -41,6 +43,7 @@ app.include_router(auth.router, prefix=settings.API_V1_STR)
 app.include_router(projects.router, prefix=settings.API_V1_STR)
 app.include_router(scanning.router, prefix=settings.API_V1_STR)
 app.include_router(tests.router, prefix=settings.API_V1_STR)
+app.include_router(runs.router, prefix=settings.API_V1_STR)
 app.include_router(websocket.router, prefix=settings.API_V1_STR)
 app.include_router(analytics.router, prefix=settings.API_V1_STR)
 app.include_router(api_keys.router, prefix=settings.API_V1_STR)
@@ -1,12 +1,15 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from uuid import UUID
+from datetime import datetime, timedelta
 from typing import List
 
 from app.domain.models.project import Project
 from app.domain.models.endpoint import Endpoint
 from app.domain.models.test_case import TestCase
 from app.domain.models.test_run import TestRun
+from app.domain.models.llm_call import LLMCall
+from app.services.test_run_service import TestRunService
 from app.domain.schemas.analytics import DashboardSummary, ProjectAnalytics, AIEfficiencyMetrics
 
 class AnalyticsService:
@@ -39,11 +42,25 @@ class AnalyticsService:
         )
         h_count = (await db.execute(h_query)).scalar() or 0
 
+        # 5. Pass rate of the latest finished run of each project, all
+        # projects' tests together (index: test_runs (project_id, started_at))
+        latest_runs = (
+            select(TestRun.passed_count, TestRun.failed_count, TestRun.error_count)
+            .join(Project, TestRun.project_id == Project.id)
+            .where(Project.owner_id == user_id, TestRun.pass_rate.is_not(None))
+            .distinct(TestRun.project_id)
+            .order_by(TestRun.project_id, TestRun.started_at.desc())
+            .subquery()
+        )
+        passed, failed, errors = (await db.execute(select(
+            func.sum(latest_runs.c.passed_count), func.sum(latest_runs.c.failed_count), func.sum(latest_runs.c.error_count)
+        ))).one()
+
         return DashboardSummary(
             total_projects=p_count,
             total_endpoints=e_count,
             total_tests=t_count,
-            pass_rate=95.0, # Dummy for now, would be calculated from TestRun
+            pass_rate=TestRunService.pass_rate(passed or 0, failed or 0, errors or 0) or 0.0,
             healed_tests=h_count
         )
 
@@ -71,19 +88,91 @@ class AnalyticsService:
         h_count = (await db.execute(h_count_query)).scalar() or 0
         healing_rate = (h_count / t_count * 100) if t_count > 0 else 0
 
+        # 5. Latest run (maybe still going) and the pass rate of the latest finished one
+        runs = select(TestRun).where(TestRun.project_id == project_id).order_by(TestRun.started_at.desc()).limit(1)
+        last_run = (await db.execute(runs)).scalar()
+        last_pass_rate = (await db.execute(
+            select(TestRun.pass_rate)
+            .where(TestRun.project_id == project_id, TestRun.pass_rate.is_not(None))
+            .order_by(TestRun.started_at.desc())
+            .limit(1)
+        )).scalar()
+
         return ProjectAnalytics(
             project_name=project.name,
             endpoints=e_count,
             tests=t_count,
-            last_run_status="SUCCESS",
+            last_run_status=last_run.status if last_run else "N/A",
+            pass_rate=last_pass_rate or 0.0,
             healing_rate=healing_rate
         )
 
+    # Windows offered by /analytics/ai-efficiency
+    WINDOWS = {
+        "1h": timedelta(hours=1),
+        "24h": timedelta(hours=24),
+        "7d": timedelta(days=7),
+        "30d": timedelta(days=30),
+    }
+
     @staticmethod
-    async def get_ai_efficiency(db: AsyncSession, user_id: UUID) -> AIEfficiencyMetrics:
-        # Mocking these as they require time-tracking logic we might add later
+    async def get_ai_efficiency(db: AsyncSession, user_id: UUID, window: str = "7d") -> AIEfficiencyMetrics:
+        """
+        AI speed, cost and healing quality over the last `window`, from the
+        LLM call records of the user's projects (see LLMTelemetry).
+
+        Latencies only count calls that reached the model: cache hits would
+        hide regressions. Tokens per test and spend are what was actually
+        paid for, so cache hits count as free.
+
+        Heals are counted per attempt (the calls made for one answer, see
+        LLMTelemetry.record): an attempt succeeds when one of its models
+        returned a patch that parses and compiles, so a cheap model's bad
+        answer that the strong one fixed is not a failed heal.
+        """
+        since = datetime.utcnow() - AnalyticsService.WINDOWS[window]
+        scope = (
+            LLMCall.created_at >= since,
+            LLMCall.project_id.in_(select(Project.id).where(Project.owner_id == user_id)),
+        )
+        generation = LLMCall.profile == "generation"
+        healing = LLMCall.profile == "healing"
+        paid = LLMCall.cache_hit.is_(False)
+        # Records written before attempts were tracked are an attempt each
+        attempt = func.coalesce(LLMCall.attempt_id, LLMCall.id)
+
+        totals = (await db.execute(select(
+            func.count(LLMCall.id),
+            func.count(LLMCall.id).filter(LLMCall.cache_hit.is_(True)),
+            func.count(LLMCall.id).filter(LLMCall.outcome == "PARSE_ERROR"),
+            func.avg(LLMCall.latency_ms).filter(generation),
+            func.sum(LLMCall.prompt_tokens + LLMCall.completion_tokens).filter(generation, paid),
+            func.sum(LLMCall.results).filter(generation, paid, LLMCall.outcome == "OK"),
+            func.count(attempt.distinct()).filter(healing),
+            func.count(attempt.distinct()).filter(healing, LLMCall.outcome == "OK"),
+            func.sum(LLMCall.cost_usd),
+        ).where(*scope))).one()
+        calls, hits, parse_failures, avg_generation_ms, generation_tokens, generated, heals, healed, spend = totals
+
+        latency = (await db.execute(select(
+            func.percentile_cont(0.5).within_group(LLMCall.latency_ms),
+            func.percentile_cont(0.95).within_group(LLMCall.latency_ms),
+        ).where(*scope, LLMCall.latency_ms.is_not(None)))).one()
+        ttft = (await db.execute(select(
+            func.percentile_cont(0.5).within_group(LLMCall.ttft_ms)
+        ).where(*scope, LLMCall.ttft_ms.is_not(None)))).scalar()
+
         return AIEfficiencyMetrics(
-            avg_generation_time_sec=4.2,
-            healing_success_rate=88.5,
-            failed_heal_attempts=2
+            window=window,
+            avg_generation_time_sec=round(float(avg_generation_ms or 0) / 1000, 3),
+            p50_latency_sec=round(float(latency[0] or 0) / 1000, 3),
+            p95_latency_sec=round(float(latency[1] or 0) / 1000, 3),
+            p50_ttft_sec=round(float(ttft) / 1000, 3) if ttft is not None else None,
+            llm_calls=calls,
+            cache_hit_rate=round(hits / calls * 100, 1) if calls else 0.0,
+            parse_failure_rate=round(parse_failures / calls * 100, 1) if calls else 0.0,
+            tokens_per_test=round((generation_tokens or 0) / generated, 1) if generated else 0.0,
+            healing_success_rate=round(healed / heals * 100, 1) if heals else 0.0,
+            failed_heal_attempts=heals - healed,
+            spend_usd=round(float(spend or 0), 4),
         )
@@ -0,0 +1,71 @@
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from uuid import UUID
+from typing import Dict, List, Optional, Tuple
+
+from app.domain.models.endpoint_history import EndpointHistory
+
+class EndpointHistoryService:
+    """
+    Reads the endpoint history the scanner writes (see EndpointHistory).
+    Each lookup is served by one of the table's indexes.
+    """
+    QUERY_BATCH = 1000 # Ids per IN (...) list
+
+    @staticmethod
+    async def previous_signatures(
+        db: AsyncSession,
+        endpoint_id: UUID,
+        since: Optional[datetime] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        The (method, path) pairs the endpoint had before its changes (made
+        after `since`, if given), newest first and without repeats.
+
+        A test written before several renames may call any of them, so
+        healing tries each, starting with the most recent.
+        """
+        changes = await EndpointHistoryService.renames(db, [endpoint_id])
+        return EndpointHistoryService.signatures_since(changes.get(endpoint_id, []), since)
+
+    @staticmethod
+    async def renames(db: AsyncSession, endpoint_ids: List[UUID]) -> Dict[UUID, List[Tuple[datetime, str, str]]]:
+        """
+        Every rename of the given endpoints as (when, old method, old path),
+        newest first, in one query per QUERY_BATCH endpoints.
+        """
+        renames: Dict[UUID, List[Tuple[datetime, str, str]]] = {}
+        batch_size = EndpointHistoryService.QUERY_BATCH
+        for i in range(0, len(endpoint_ids), batch_size):
+            query = (
+                select(EndpointHistory.endpoint_id, EndpointHistory.created_at,
+                       EndpointHistory.old_method, EndpointHistory.old_path)
+                .where(EndpointHistory.endpoint_id.in_(endpoint_ids[i:i + batch_size]))
+                .where(EndpointHistory.change == "MODIFIED")
+                .order_by(EndpointHistory.endpoint_id, EndpointHistory.created_at.desc())
+            )
+            for endpoint_id, created_at, method, path in (await db.execute(query)).all():
+                renames.setdefault(endpoint_id, []).append((created_at, method, path))
+        return renames
+
+    @staticmethod
+    def signatures_since(renames: List[Tuple[datetime, str, str]], since: Optional[datetime]) -> List[Tuple[str, str]]:
+        """Old (method, path) pairs of the renames made after `since`, without repeats."""
+        signatures = []
+        for created_at, method, path in renames:
+            if since is not None and created_at < since:
+                break # Newest first: the rest is older
+            if (method, path) not in signatures:
+                signatures.append((method, path))
+        return signatures
+
+    @staticmethod
+    async def changed_in_scan(db: AsyncSession, project_id: UUID, scan_sha: str) -> List[EndpointHistory]:
+        """Every change the scan of `scan_sha` made to the project's endpoints."""
+        query = (
+            select(EndpointHistory)
+            .where(EndpointHistory.project_id == project_id)
+            .where(EndpointHistory.scan_sha == scan_sha)
+        )
+        return list((await db.execute(query)).scalars().all())
@@ -0,0 +1,218 @@
+import uuid
+import hashlib
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from uuid import UUID
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+
+from app.domain.models.generation_job import GenerationJob, GenerationJobItem
+from app.domain.models.test_case import TestCase
+from app.config import settings
+from app.utils.logger import log
+
+class GenerationJobService:
+    """
+    Checkpoints for test generation jobs.
+
+    Why this?
+    A retried `batch_generate_tests` used to start over: endpoints that
+    had already succeeded got a second TestCase and a second LLM bill.
+    Each endpoint of a job now has a row that is marked DONE together with
+    its TestCase, and every run only picks up the endpoints not done yet.
+
+    The same batch (project + endpoint set) submitted again while its job
+    is still queued or running returns that job instead of a new one.
+    """
+    ACTIVE = ("QUEUED", "RUNNING")
+    QUERY_BATCH = 1000 # Ids per IN (...) list
+
+    @staticmethod
+    def dedupe_key(project_id: UUID, endpoint_ids: List[str]) -> str:
+        digest = hashlib.sha256(str(project_id).encode())
+        for endpoint_id in sorted(set(endpoint_ids)):
+            digest.update(b"\0" + endpoint_id.encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    async def _insert_items(db: AsyncSession, job_id: UUID, endpoint_ids: List[str]):
+        rows = [{"job_id": job_id, "endpoint_id": endpoint_id} for endpoint_id in dict.fromkeys(endpoint_ids)]
+        batch_size = 1000
+        for i in range(0, len(rows), batch_size):
+            await db.execute(pg_insert(GenerationJobItem).values(rows[i:i + batch_size]).on_conflict_do_nothing())
+
+    @staticmethod
+    async def submit(db: AsyncSession, project_id: UUID, endpoint_ids: List[str]) -> Tuple[GenerationJob, bool]:
+        """
+        Creates a job for the batch, or returns the active job already
+        doing it. Returns (job, created).
+
+        A job that has been queued/running without progress for
+        GENERATION_JOB_STALE_SECONDS (worker lost, task dropped) no longer
+        blocks new submissions: it is marked FAILED first.
+        """
+        key = GenerationJobService.dedupe_key(project_id, endpoint_ids)
+        total = len(set(endpoint_ids))
+
+        for _ in range(3):
+            job_id = uuid.uuid4()
+            now = datetime.utcnow()
+            stmt = pg_insert(GenerationJob).values(
+                id=job_id, project_id=project_id, dedupe_key=key, status="QUEUED",
+                total=total, created_at=now, updated_at=now
+            ).on_conflict_do_nothing(
+                index_elements=["dedupe_key"],
+                index_where=GenerationJob.status.in_(GenerationJobService.ACTIVE)
+            ).returning(GenerationJob.id)
+
+            if (await db.execute(stmt)).scalar_one_or_none() is not None:
+                await GenerationJobService._insert_items(db, job_id, endpoint_ids)
+                await db.commit()
+                return await db.get(GenerationJob, job_id), True
+
+            query = select(GenerationJob).where(
+                GenerationJob.dedupe_key == key, GenerationJob.status.in_(GenerationJobService.ACTIVE)
+            )
+            existing = (await db.execute(query)).scalar_one_or_none()
+            if existing is None:
+                continue # Finished in the meantime: try to insert again
+
+            stale_before = now - timedelta(seconds=settings.GENERATION_JOB_STALE_SECONDS)
+            if existing.updated_at >= stale_before:
+                await db.commit()
+                return existing, False
+
+            log.warning(f"Generation job {existing.id} made no progress since {existing.updated_at}, replacing it.")
+            existing.status = "FAILED"
+            existing.error = "Abandoned: no progress."
+            existing.finished_at = now
+            await db.commit()
+
+        raise HTTPException(status_code=409, detail="This batch is being submitted concurrently, please retry.")
+
+    @staticmethod
+    async def ensure(db: AsyncSession, job_id: UUID, project_id: UUID, endpoint_ids: List[str]):
+        """
+        Makes sure a job row exists for a task that was enqueued without
+        `submit` (e.g. by an older API version). No deduplication.
+        """
+        now = datetime.utcnow()
+        await db.execute(pg_insert(GenerationJob).values(
+            id=job_id, project_id=project_id, dedupe_key=f"task:{job_id}", status="QUEUED",
+            total=len(set(endpoint_ids)), created_at=now, updated_at=now
+        ).on_conflict_do_nothing())
+        await GenerationJobService._insert_items(db, job_id, endpoint_ids)
+        await db.commit()
+
+    @staticmethod
+    async def start(db: AsyncSession, job_id: UUID) -> Tuple[List[str], int, int]:
+        """
+        Marks the job RUNNING and returns (endpoint ids still to do,
+        already done, total). A finished job has nothing left to do.
+        """
+        job = await db.get(GenerationJob, job_id)
+        if job is None or job.status == "COMPLETED":
+            await db.commit()
+            return [], (job.total if job else 0), (job.total if job else 0)
+
+        job.status = "RUNNING"
+        job.updated_at = datetime.utcnow()
+        rows = (await db.execute(
+            select(GenerationJobItem.endpoint_id, GenerationJobItem.status)
+            .where(GenerationJobItem.job_id == job_id)
+        )).all()
+        await db.commit()
+
+        pending = [endpoint_id for endpoint_id, status in rows if status != "DONE"]
+        return pending, len(rows) - len(pending), len(rows)
+
+    @staticmethod
+    async def record(
+        db: AsyncSession,
+        job_id: UUID,
+        generated: Dict[str, dict],
+        failed: Dict[str, str],
+    ) -> int:
+        """
+        Saves the tests of finished items and marks them DONE in ONE
+        transaction; failed items are marked FAILED with their error.
+        Returns how many tests were saved.
+
+        Items are locked first and items already DONE are skipped, so a
+        redelivered task running next to the original can't save an
+        endpoint's test twice. Tests go in as multi-row INSERTs and items
+        are updated in one executemany, whatever the number of rows
+        (see BufferedTestCaseWriter).
+        """
+        now = datetime.utcnow()
+        wanted = list(dict.fromkeys([*generated, *failed]))
+        open_items = {}
+        for i in range(0, len(wanted), GenerationJobService.QUERY_BATCH):
+            rows = await db.execute(
+                select(GenerationJobItem.endpoint_id, GenerationJobItem.attempts)
+                .where(
+                    GenerationJobItem.job_id == job_id,
+                    GenerationJobItem.endpoint_id.in_(wanted[i:i + GenerationJobService.QUERY_BATCH]),
+                    GenerationJobItem.status != "DONE"
+                )
+                .with_for_update()
+            )
+            open_items.update({endpoint_id: attempts or 0 for endpoint_id, attempts in rows.all()})
+
+        test_rows = []
+        item_rows = []
+        for endpoint_id, attempts in open_items.items():
+            item = {"job_id": job_id, "endpoint_id": endpoint_id, "attempts": attempts + 1, "updated_at": now}
+            if endpoint_id in generated:
+                ai_data = generated[endpoint_id]
+                test_case_id = uuid.uuid4()
+                test_rows.append({
+                    "id": test_case_id,
+                    "endpoint_id": UUID(endpoint_id),
+                    "description": ai_data["description"],
+                    "priority": ai_data["priority"],
+                    "test_code": ai_data["test_code"],
+                    "status": "DRAFT",
+                    "created_at": now,
+                })
+                item.update(status="DONE", test_case_id=test_case_id, error=None)
+            else:
+                item.update(status="FAILED", error=failed[endpoint_id][:2000])
+            item_rows.append(item)
+
+        # Tests first: the items reference them
+        if test_rows:
+            await db.execute(insert(TestCase), test_rows)
+        if item_rows:
+            await db.execute(update(GenerationJobItem), item_rows)
+        await db.execute(update(GenerationJob).where(GenerationJob.id == job_id).values(updated_at=now))
+        await db.commit()
+        return len(test_rows)
+
+    @staticmethod
+    async def finish(db: AsyncSession, job_id: UUID, status: str, error: Optional[str] = None):
+        now = datetime.utcnow()
+        await db.execute(
+            update(GenerationJob).where(GenerationJob.id == job_id)
+            .values(status=status, error=error, updated_at=now, finished_at=now)
+        )
+        await db.commit()
+
+    @staticmethod
+    async def get_job(db: AsyncSession, project_id: UUID, job_id: UUID) -> Tuple[GenerationJob, List[GenerationJobItem]]:
+        """
+        A job with its items, readable while it runs: DONE items already
+        point to their TestCase.
+        """
+        job = (await db.execute(
+            select(GenerationJob).where(GenerationJob.id == job_id, GenerationJob.project_id == project_id)
+        )).scalar_one_or_none()
+        if job is None:
+            raise HTTPException(status_code=404, detail="Generation job not found.")
+
+        items = (await db.execute(
+            select(GenerationJobItem).where(GenerationJobItem.job_id == job_id).order_by(GenerationJobItem.endpoint_id)
+        )).scalars().all()
+        return job, list(items)
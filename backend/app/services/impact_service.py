@@ -0,0 +1,50 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from uuid import UUID
+from typing import Dict, List
+
+from app.domain.models.test_case import TestCase
+
+class ImpactService:
+    """
+    Change impact analysis: which tests a scan's change set affects.
+
+    Why this?
+    Healing used to wait for someone to notice a broken test. A scan knows
+    exactly which endpoints it changed (ScannerService.change_set), so
+    only their tests need work, however big the project is:
+    - added: no tests yet, nothing to do
+    - removed: their tests were deleted with them
+    - modified (method or path changed): their tests need healing
+    - source changed (same signature, declaring file changed): their
+      tests need to run again
+
+    Lookups go through the index on test_cases.endpoint_id.
+    """
+    QUERY_BATCH = 1000 # Ids per IN (...) list
+
+    @staticmethod
+    async def tests_by_endpoint(db: AsyncSession, endpoint_ids: List[UUID]) -> Dict[UUID, List[UUID]]:
+        """endpoint id -> ids of its test cases, for endpoints that have any."""
+        index: Dict[UUID, List[UUID]] = {}
+        batch_size = ImpactService.QUERY_BATCH
+        for i in range(0, len(endpoint_ids), batch_size):
+            query = (
+                select(TestCase.endpoint_id, TestCase.id)
+                .where(TestCase.endpoint_id.in_(endpoint_ids[i:i + batch_size]))
+            )
+            for endpoint_id, test_case_id in (await db.execute(query)).all():
+                index.setdefault(endpoint_id, []).append(test_case_id)
+        return index
+
+    @staticmethod
+    async def tests_to_heal(db: AsyncSession, change_set: Dict[str, List[UUID]]) -> List[UUID]:
+        """Tests of the endpoints the scan modified."""
+        index = await ImpactService.tests_by_endpoint(db, change_set["modified"])
+        return [test_case_id for test_ids in index.values() for test_case_id in test_ids]
+
+    @staticmethod
+    async def tests_to_run(db: AsyncSession, change_set: Dict[str, List[UUID]]) -> List[UUID]:
+        """Tests of the endpoints whose source changed but whose signature didn't."""
+        index = await ImpactService.tests_by_endpoint(db, change_set["source_changed"])
+        return [test_case_id for test_ids in index.values() for test_case_id in test_ids]
@@ -23,6 +23,8 @@ class ProjectService:
             description=project_in.description,
             git_url=project_in.git_url,
             api_base_url=project_in.api_base_url,
+            scan_ignore=project_in.scan_ignore,
+            partial_clone=project_in.partial_clone,
             owner_id=owner_id
         )
         db.add(db_project)
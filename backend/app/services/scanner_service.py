@@ -1,75 +1,698 @@
 import os
+import json
+import uuid
+import sqlite3
+import hashlib
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, insert, update, delete, func, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from uuid import UUID
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
 
 from app.utils.repo_manager import RepoManager
+from app.utils.parallel_parser import ParallelParser
 from app.utils.route_parsers import RouteParsers
+from app.utils.parse_cache import ParseCache
+from app.utils.file_walker import FileWalker
 from app.domain.models.endpoint import Endpoint
+from app.domain.models.endpoint_source import EndpointSource
+from app.domain.models.endpoint_history import EndpointHistory
+from app.domain.models.project import Project
+from app.config import settings
 from app.utils.logger import log
 
 class ScannerService:
     """
     The Orchestrator of the Scanning Engine.
-    
+
     1. It gets a project's git URL.
-    2. It asks RepoManager to download it.
-    3. It walks every file and asks RouteParsers to find routes.
-    4. It saves all discovered routes to our DB.
+    2. It asks RepoManager for a worktree of the latest commit.
+    3. It walks every file (or only the files changed since the last scan)
+       and asks RouteParsers (via a process pool) to find routes.
+    4. It reconciles the discovered routes with our DB in bulk.
     """
-    
+    # Rows per bulk statement (Postgres caps bind parameters at 32767)
+    WRITE_BATCH = 1000
+
+    @staticmethod
+    def collect_source_files(
+        repo_path: str,
+        ignore_patterns: Optional[str] = None,
+        subtrees: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Lists every file the parsers should look at (optionally only inside
+        some top-level `subtrees`). Ignored and vendored directories are
+        pruned, never entered.
+        """
+        file_paths, _ = FileWalker.walk(
+            repo_path,
+            extensions=RouteParsers.SUPPORTED_EXTENSIONS,
+            extra_patterns=ignore_patterns,
+            max_file_bytes=settings.SCAN_MAX_FILE_KB * 1024,
+            subtrees=subtrees
+        )
+        return file_paths
+
+    @staticmethod
+    def parse_files(repo_path: str, file_paths: List[str]) -> List[Dict[str, str]]:
+        """
+        Runs the parsers over `file_paths` and returns the endpoints found,
+        with `source_file` made relative to the repository root.
+
+        Files whose git blob was parsed before (in any project) are served
+        from the ParseCache; only the rest go to the parser pool. The cache
+        is best effort: if it is locked or corrupt, everything is a miss.
+        """
+        discovered_endpoints = []
+        to_parse = []
+        blob_by_file = {}
+
+        candidates = [f for f in file_paths if f.endswith(RouteParsers.SUPPORTED_EXTENSIONS)]
+        if settings.PARSE_CACHE_ENABLED:
+            try:
+                blob_shas = RepoManager.blob_shas(repo_path)
+            except Exception as e:
+                log.warning(f"Could not list blob SHAs, parse cache disabled for this scan: {e}")
+                blob_shas = {}
+
+            for file_path in candidates:
+                sha = blob_shas.get(os.path.relpath(file_path, repo_path).replace(os.sep, "/"))
+                if sha:
+                    blob_by_file[file_path] = sha
+            try:
+                cached = ParseCache.get_many(blob_by_file.values())
+            except sqlite3.Error as e:
+                log.warning(f"Parse cache unavailable, parsing every file: {e}")
+                cached = {}
+                blob_by_file = {}
+
+            for file_path in candidates:
+                sha = blob_by_file.get(file_path)
+                if sha in cached:
+                    rel_path = os.path.relpath(file_path, repo_path)
+                    discovered_endpoints.extend({**ep, "source_file": rel_path} for ep in cached[sha])
+                else:
+                    to_parse.append(file_path)
+            log.info(f"Parse cache: {len(candidates) - len(to_parse)} hits, {len(to_parse)} files to parse.")
+        else:
+            to_parse = candidates
+
+        # Batches stream back from the parser pool as each chunk finishes.
+        parsed = {file_path: [] for file_path in to_parse}
+        for batch in ParallelParser.iter_endpoint_batches(
+            to_parse,
+            workers=settings.SCAN_WORKERS,
+            chunk_size=settings.SCAN_CHUNK_SIZE,
+            min_files=settings.SCAN_PARALLEL_MIN_FILES
+        ):
+            for ep_data in batch:
+                parsed[ep_data["source_file"]].append(ep_data)
+                ep_data["source_file"] = os.path.relpath(ep_data["source_file"], repo_path)
+            discovered_endpoints.extend(batch)
+
+        if blob_by_file:
+            try:
+                ParseCache.put_many({
+                    blob_by_file[file_path]: endpoints
+                    for file_path, endpoints in parsed.items()
+                    if file_path in blob_by_file
+                })
+            except sqlite3.Error as e:
+                log.warning(f"Could not store parse results in the cache: {e}")
+        return discovered_endpoints
+
+    @staticmethod
+    async def remote_unchanged(db: AsyncSession, project_id: UUID, git_url: str) -> bool:
+        """
+        Cheap precheck before a scan: True when the remote's HEAD is still the
+        commit we last scanned AND the parser version and scan settings are
+        the ones that scan used, so the clone/parse/DB work can be skipped.
+        Any error answers False and the normal scan runs.
+        """
+        options = await ScannerService.project_scan_options(db, project_id)
+        if options["full_scan_needed"]:
+            return False
+        try:
+            remote_sha = RepoManager.remote_head_sha(git_url)
+        except Exception as e:
+            log.warning(f"ls-remote precheck failed for {git_url}: {e}")
+            return False
+        return remote_sha == options["last_scanned_sha"]
+
     @staticmethod
-    async def scan_project_codebase(db: AsyncSession, project_id: UUID, git_url: str):
+    async def scan_project_codebase(db: AsyncSession, project_id: UUID, git_url: str) -> Tuple[int, Dict[str, List[UUID]]]:
         """
-        Performs a full scan of a git repository.
+        Scans a git repository and syncs its endpoints into the DB.
+        Returns the number of endpoints and the scan's change set (see
+        `change_set`).
+
+        If the project remembers the commit it was last scanned at, only the
+        files changed since then are re-parsed. Otherwise a full scan runs.
+        So does a project whose parser version or scan settings changed since
+        that scan, or whose ignore files changed: untouched files could then
+        give different results too.
         """
-        temp_path = None
+        repo_path = None
         try:
-            # 1. Clone the repository
-            temp_path = RepoManager.clone_repo(git_url)
-            
-            # 2. Walk through the code and find endpoints
-            discovered_endpoints = []
-            for root, dirs, files in os.walk(temp_path):
-                # Optimization: skip common non-source directories
-                if any(skip in root for skip in ['node_modules', '.git', '__pycache__', 'venv']):
-                    continue
-                    
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    endpoints = RouteParsers.detect_endpoints(file_path)
-                    discovered_endpoints.extend(endpoints)
-            
-            # 3. Save to database
-            # First, clean up old endpoints for this project
-            delete_query = delete(Endpoint).where(Endpoint.project_id == project_id)
-            await db.execute(delete_query)
-            
-            # Now, add the new ones
-            # We use a set to deduplicate (same method + path)
-            seen = set()
-            for ep_data in discovered_endpoints:
-                identifier = f"{ep_data['method']}:{ep_data['path']}"
-                if identifier not in seen:
-                    db_endpoint = Endpoint(
-                        project_id=project_id,
-                        method=ep_data['method'],
-                        path=ep_data['path'],
-                        framework=ep_data['framework']
-                    )
-                    db.add(db_endpoint)
-                    seen.add(identifier)
-            
+            options = await ScannerService.project_scan_options(db, project_id)
+            last_sha = options["last_scanned_sha"] if not options["full_scan_needed"] else None
+            ignore_patterns = options["ignore_patterns"]
+
+            # 1. Get a worktree of the latest commit (from the mirror cache)
+            repo_path = RepoManager.checkout_repo(git_url, partial=options["partial"])
+            head_sha = RepoManager.head_sha(repo_path)
+
+            changes = None
+            changed_files = None
+            if last_sha and last_sha == head_sha:
+                log.info(f"Project {project_id} is already scanned at {head_sha}, nothing to do.")
+                return await ScannerService.count_endpoints(db, project_id), ScannerService.change_set([])
+            if last_sha:
+                changes = RepoManager.changed_files(repo_path, last_sha, head_sha)
+                changed_files = {rel_path for paths in changes.values() for rel_path in paths}
+            if changes and ScannerService.touches_ignore_files(changes):
+                log.info(f"Ignore files changed in project {project_id}, running a full scan.")
+                changes = None
+
+            # 2. Find endpoints and save them
+            if changes is None:
+                count, change_set = await ScannerService.full_scan(
+                    db, project_id, repo_path, ignore_patterns, scan_sha=head_sha, changed_files=changed_files
+                )
+            else:
+                count, change_set = await ScannerService.incremental_scan(
+                    db, project_id, repo_path, changes, ignore_patterns, scan_sha=head_sha
+                )
+
+            project = await db.get(Project, project_id)
+            if project:
+                project.last_scanned_sha = head_sha
+                project.scan_fingerprint = options["fingerprint"]
             await db.commit()
-            log.info(f"Scan complete for project {project_id}. Found {len(seen)} unique endpoints.")
-            return len(seen)
+            log.info(f"Scan complete for project {project_id} at {head_sha}. {count} unique endpoints.")
+            return count, change_set
 
         except Exception as e:
             log.error(f"Error during scan: {e}")
             await db.rollback()
             raise
         finally:
-            # 4. Cleanup temporary files
-            if temp_path:
-                RepoManager.cleanup_repo(temp_path)
+            # 3. Give the worktree back
+            if repo_path:
+                RepoManager.release_repo(repo_path)
+
+    @staticmethod
+    def touches_ignore_files(changes: Dict[str, List[str]]) -> bool:
+        """True when a diff adds, edits or removes a .gitignore / .testgenignore."""
+        return any(
+            rel_path.rsplit("/", 1)[-1] in FileWalker.IGNORE_FILES
+            for paths in changes.values()
+            for rel_path in paths
+        )
+
+    @staticmethod
+    def group_routes(discovered_endpoints: List[Dict]) -> Dict[Tuple[str, str], Dict]:
+        """
+        Groups parser output by (method, path). Every declaring file is kept
+        in `files`, with the first line it declares the route on in `lines`;
+        the framework comes from the first occurrence.
+        """
+        fresh = {}
+        for ep_data in discovered_endpoints:
+            route = fresh.setdefault((ep_data['method'], ep_data['path']), {
+                "method": ep_data['method'],
+                "path": ep_data['path'],
+                "framework": ep_data['framework'],
+                "files": set(),
+                "lines": {},
+            })
+            if ep_data.get('source_file'):
+                source_file = ep_data['source_file'].replace(os.sep, "/")
+                route["files"].add(source_file)
+                line = ep_data.get('line')
+                if line is not None and line < route["lines"].get(source_file, line + 1):
+                    route["lines"][source_file] = line
+        return fresh
+
+    @staticmethod
+    async def full_scan(
+        db: AsyncSession,
+        project_id: UUID,
+        repo_path: str,
+        ignore_patterns: Optional[str] = None,
+        scan_sha: Optional[str] = None,
+        changed_files: Optional[Set[str]] = None
+    ) -> Tuple[int, Dict[str, List[UUID]]]:
+        """
+        Parses every file and reconciles all of the project's endpoints.
+        Returns the number of endpoints and the change set.
+        `changed_files` is the commit's diff, when known.
+        """
+        file_paths = ScannerService.collect_source_files(repo_path, ignore_patterns)
+        fresh = ScannerService.group_routes(ScannerService.parse_files(repo_path, file_paths))
+        change_set = await ScannerService.reconcile_endpoints(
+            db, project_id, fresh, scan_sha=scan_sha, changed_files=changed_files
+        )
+        return len(fresh), change_set
+
+    @staticmethod
+    async def incremental_scan(
+        db: AsyncSession,
+        project_id: UUID,
+        repo_path: str,
+        changes: Dict[str, List[str]],
+        ignore_patterns: Optional[str] = None,
+        scan_sha: Optional[str] = None
+    ) -> Tuple[int, Dict[str, List[UUID]]]:
+        """
+        Re-parses only the files listed in `changes`.
+        Endpoints from untouched files are left alone.
+        Returns the number of endpoints and the change set.
+        """
+        touched = set(changes["added"]) | set(changes["modified"]) | set(changes["deleted"])
+        reparse = FileWalker.filter_paths(
+            repo_path,
+            changes["added"] + changes["modified"],
+            extensions=RouteParsers.SUPPORTED_EXTENSIONS,
+            extra_patterns=ignore_patterns,
+            max_file_bytes=settings.SCAN_MAX_FILE_KB * 1024
+        )
+        log.info(f"Incremental scan: {len(touched)} changed files, {len(reparse)} to re-parse.")
+
+        fresh = ScannerService.group_routes(ScannerService.parse_files(repo_path, reparse))
+        change_set = await ScannerService.reconcile_endpoints(db, project_id, fresh, scope_files=touched, scan_sha=scan_sha)
+        return await ScannerService.count_endpoints(db, project_id), change_set
+
+    @staticmethod
+    def plan_reconcile(
+        existing: List[Tuple[UUID, str, str, str, Optional[str], Optional[int], Optional[str]]],
+        fresh: Dict[Tuple[str, str], Dict],
+        scope_files: Optional[Set[str]] = None
+    ) -> Dict:
+        """
+        Pure diff between the DB and a scan, so it can be tested without a DB.
+
+        `existing` has one (endpoint id, method, path, framework, primary file,
+        primary line, linked file) row per endpoint/file link; linked file is
+        None for an endpoint without links (rows from before links existed).
+        `fresh` comes from `group_routes`. With `scope_files` only those files
+        were re-parsed, so what other files declare is kept as it is.
+
+        A route that vanished while a new one (same framework) appeared on
+        the very line of the same file it was declared on was edited, not
+        removed: the endpoint is renamed in place, so it keeps its id and its
+        tests for healing to repair. Only unambiguous pairs are matched (one
+        route leaving and one arriving on that line).
+
+        Returns:
+        - "vanished": endpoint ids no file declares anymore
+        - "renames": endpoint rows (with their id) whose method or path changed
+        - "upserts": endpoint rows to insert or update (with their primary file)
+        - "unlink": (endpoint id, file) links to delete
+        - "link": (method, path, file) links to add
+        - "history": EndpointHistory rows; ADDED ones have no endpoint id yet
+        """
+        current: Dict[Tuple[str, str], Dict] = {}
+        for ep_id, method, path, framework, primary_file, primary_line, linked_file in existing:
+            route = current.setdefault((method, path), {
+                "id": ep_id, "framework": framework, "primary": primary_file, "line": primary_line, "linked": set()
+            })
+            if linked_file:
+                route["linked"].add(linked_file)
+
+        plan = {"vanished": [], "renames": [], "upserts": [], "unlink": [], "link": [], "history": []}
+        gone = []
+        for key, route in current.items():
+            declared = route["linked"] or ({route["primary"]} if route["primary"] else set())
+            if scope_files is None:
+                kept = set()
+            elif not declared:
+                continue # Declaring file unknown: an incremental scan can't tell if it vanished
+            else:
+                kept = declared - scope_files
+            files = kept | (fresh[key]["files"] if key in fresh else set())
+
+            if not files and key not in fresh:
+                gone.append((key, route))
+                continue
+            plan["unlink"].extend((route["id"], f) for f in sorted(route["linked"] - files))
+            plan["link"].extend((key[0], key[1], f) for f in sorted(files - route["linked"]))
+
+            # Keep the primary file while it still declares the route
+            primary = route["primary"] if route["primary"] in files else (min(files) if files else None)
+            if key in fresh and primary in fresh[key]["lines"]:
+                line = fresh[key]["lines"][primary]
+            else:
+                line = route["line"] if primary == route["primary"] else None
+            if key in fresh or primary != route["primary"]:
+                plan["upserts"].append({
+                    "method": key[0], "path": key[1],
+                    "framework": fresh[key]["framework"] if key in fresh else route["framework"],
+                    "source_file": primary,
+                    "source_line": line,
+                })
+
+        # Where each new route is declared: (file, line, framework) -> routes
+        arrived: Dict[Tuple, List[Tuple[str, str]]] = {}
+        for key, route in fresh.items():
+            if key not in current:
+                for source_file, line in route["lines"].items():
+                    arrived.setdefault((source_file, line, route["framework"]), []).append(key)
+        left: Dict[Tuple, int] = {}
+        for key, route in gone:
+            place = (route["primary"], route["line"], route["framework"])
+            left[place] = left.get(place, 0) + 1
+
+        renamed = set()
+        for key, route in gone:
+            place = (route["primary"], route["line"], route["framework"])
+            if route["line"] is not None and left[place] == 1 and len(arrived.get(place, [])) == 1:
+                new_key = arrived[place][0]
+                new_route = fresh[new_key]
+                renamed.add(new_key)
+                rename = {
+                    "method": new_key[0], "path": new_key[1], "framework": new_route["framework"],
+                    "source_file": route["primary"], "source_line": route["line"],
+                }
+                plan["renames"].append({"id": route["id"], **rename})
+                plan["unlink"].extend((route["id"], f) for f in sorted(route["linked"] - new_route["files"]))
+                plan["link"].extend((new_key[0], new_key[1], f) for f in sorted(new_route["files"] - route["linked"]))
+                plan["history"].append({
+                    "endpoint_id": route["id"], "change": "MODIFIED", **rename,
+                    "old_method": key[0], "old_path": key[1],
+                })
+                continue
+
+            plan["vanished"].append(route["id"])
+            plan["history"].append({
+                "endpoint_id": route["id"], "change": "REMOVED",
+                "method": key[0], "path": key[1], "framework": route["framework"],
+                "source_file": route["primary"], "source_line": route["line"],
+            })
+
+        for key, route in fresh.items():
+            if key in current or key in renamed:
+                continue
+            primary = min(route["files"]) if route["files"] else None
+            upsert = {
+                "method": route["method"], "path": route["path"], "framework": route["framework"],
+                "source_file": primary, "source_line": route["lines"].get(primary),
+            }
+            plan["upserts"].append(upsert)
+            plan["link"].extend((key[0], key[1], f) for f in sorted(route["files"]))
+            plan["history"].append({"endpoint_id": None, "change": "ADDED", **upsert})
+        return plan
+
+    @staticmethod
+    async def reconcile_endpoints(
+        db: AsyncSession,
+        project_id: UUID,
+        fresh: Dict[Tuple[str, str], Dict],
+        scope_files: Optional[Set[str]] = None,
+        scan_sha: Optional[str] = None,
+        changed_files: Optional[Set[str]] = None
+    ) -> Dict[str, List[UUID]]:
+        """
+        Makes the DB match `fresh` using a few set-based statements.
+        Returns the change set (see `change_set`): its "source_changed"
+        endpoints are the unrenamed ones declared in `changed_files`
+        (default `scope_files`; without either, nothing is known to have
+        changed).
+
+        1. One SELECT of the existing endpoints and the files declaring them.
+        2. One bulk DELETE for routes no file declares anymore (their tests go with them).
+        3. One bulk UPDATE by id for renamed routes (see `plan_reconcile`).
+        4. Batched INSERT ... ON CONFLICT (project_id, method, path) for the rest:
+           new routes are inserted, changed ones updated in place, unchanged
+           ones untouched. Existing endpoints keep their IDs and their tests.
+        5. Bulk changes to the endpoint -> file links.
+        6. Bulk INSERT of what changed into the endpoint history, tagged
+           with `scan_sha`.
+
+        With `scope_files`, only those files were re-parsed (incremental
+        scans): a route declared in several files survives as long as one
+        untouched file still declares it.
+        """
+        if scope_files is not None and not scope_files:
+            return ScannerService.change_set([])
+
+        existing_query = (
+            select(Endpoint.id, Endpoint.method, Endpoint.path, Endpoint.framework,
+                   Endpoint.source_file, Endpoint.source_line, EndpointSource.source_file)
+            .outerjoin(EndpointSource, EndpointSource.endpoint_id == Endpoint.id)
+            .where(Endpoint.project_id == project_id)
+        )
+        existing = (await db.execute(existing_query)).all()
+        plan = ScannerService.plan_reconcile(existing, fresh, scope_files)
+        batch_size = ScannerService.WRITE_BATCH
+
+        vanished_ids = plan["vanished"]
+        for i in range(0, len(vanished_ids), batch_size):
+            await db.execute(delete(Endpoint).where(Endpoint.id.in_(vanished_ids[i:i + batch_size])))
+
+        now = datetime.utcnow()
+        renames = plan["renames"]
+        for i in range(0, len(renames), batch_size):
+            await db.execute(update(Endpoint), [
+                {**rename, "last_scanned": now} for rename in renames[i:i + batch_size]
+            ])
+
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "project_id": project_id,
+                **upsert,
+                "status": "Scanned",
+                "last_scanned": now,
+                "created_at": now,
+            }
+            for upsert in plan["upserts"]
+        ]
+        for i in range(0, len(rows), batch_size):
+            stmt = pg_insert(Endpoint).values(rows[i:i + batch_size])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["project_id", "method", "path"],
+                set_={
+                    "framework": stmt.excluded.framework,
+                    "source_file": stmt.excluded.source_file,
+                    "source_line": stmt.excluded.source_line,
+                    "last_scanned": stmt.excluded.last_scanned,
+                },
+                # Skip the write entirely when nothing changed
+                where=or_(
+                    Endpoint.framework != stmt.excluded.framework,
+                    Endpoint.source_file.is_distinct_from(stmt.excluded.source_file),
+                    Endpoint.source_line.is_distinct_from(stmt.excluded.source_line)
+                )
+            )
+            await db.execute(stmt)
+
+        unlink = plan["unlink"]
+        for i in range(0, len(unlink), batch_size):
+            await db.execute(delete(EndpointSource).where(
+                tuple_(EndpointSource.endpoint_id, EndpointSource.source_file).in_(unlink[i:i + batch_size])
+            ))
+
+        # New links and history rows need endpoint ids, including ids of rows inserted just now
+        link = plan["link"]
+        ids = {(method, path): ep_id for ep_id, method, path, _, _, _, _ in existing}
+        ids.update({(rename["method"], rename["path"]): rename["id"] for rename in renames})
+        wanted = {(method, path) for method, path, _ in link}
+        wanted.update((entry["method"], entry["path"]) for entry in plan["history"] if entry["endpoint_id"] is None)
+        missing = list(wanted - ids.keys())
+        for i in range(0, len(missing), batch_size):
+            result = await db.execute(
+                select(Endpoint.id, Endpoint.method, Endpoint.path)
+                .where(Endpoint.project_id == project_id)
+                .where(tuple_(Endpoint.method, Endpoint.path).in_(missing[i:i + batch_size]))
+            )
+            ids.update({(method, path): ep_id for ep_id, method, path in result.all()})
+
+        link_rows = [
+            {"endpoint_id": ids[(method, path)], "source_file": source_file, "project_id": project_id}
+            for method, path, source_file in link
+            if (method, path) in ids
+        ]
+        for i in range(0, len(link_rows), batch_size):
+            stmt = pg_insert(EndpointSource).values(link_rows[i:i + batch_size]).on_conflict_do_nothing()
+            await db.execute(stmt)
+
+        history_rows = [
+            {
+                **entry,
+                "id": uuid.uuid4(),
+                "endpoint_id": entry["endpoint_id"] or ids[(entry["method"], entry["path"])],
+                "project_id": project_id,
+                "scan_sha": scan_sha,
+                "signature_hash": EndpointHistory.signature(entry["method"], entry["path"]),
+                "created_at": now,
+            }
+            for entry in plan["history"]
+            if entry["endpoint_id"] or (entry["method"], entry["path"]) in ids
+        ]
+        for i in range(0, len(history_rows), batch_size):
+            await db.execute(insert(EndpointHistory), history_rows[i:i + batch_size])
+
+        changed_files = changed_files if changed_files is not None else scope_files
+        in_history = {row["endpoint_id"] for row in history_rows}
+        source_changed = [
+            ids[key] for key, route in fresh.items()
+            if changed_files and route["files"] & changed_files and key in ids and ids[key] not in in_history
+        ]
+
+        log.info(
+            f"Reconciled endpoints for project {project_id}: {len(rows)} upserted, {len(renames)} renamed, "
+            f"{len(vanished_ids)} removed, {len(link_rows)} file links added, {len(unlink)} dropped, "
+            f"{len(history_rows)} history rows, {len(source_changed)} endpoints with changed sources."
+        )
+        return ScannerService.change_set(history_rows, source_changed)
+
+    @staticmethod
+    def change_set(history: List[Dict], source_changed: Optional[List[UUID]] = None) -> Dict[str, List[UUID]]:
+        """
+        What a scan changed, compact enough to pass between tasks:
+        {"added": [...], "removed": [...], "modified": [...],
+        "source_changed": [...]} endpoint ids. The first three come from the
+        endpoint history rows it wrote: "modified" are endpoints whose
+        method or path changed, their tests need healing. "source_changed"
+        kept their signature but are declared in a file the commit changed:
+        their tests only need to run again.
+        """
+        change_set = {"added": [], "removed": [], "modified": [], "source_changed": list(source_changed or [])}
+        for entry in history:
+            change_set[entry["change"].lower()].append(entry["endpoint_id"])
+        return change_set
+
+    @staticmethod
+    def scan_fingerprint(partial: bool, ignore_patterns: Optional[str]) -> str:
+        """
+        Hash of everything besides the commit that decides what a scan finds:
+        parser version, supported extensions, size limit, the project's ignore
+        patterns and clone mode. If it differs from the one stored with the
+        last scan, results for untouched files can't be reused.
+        """
+        payload = json.dumps([
+            RouteParsers.VERSION,
+            list(RouteParsers.SUPPORTED_EXTENSIONS),
+            settings.SCAN_MAX_FILE_KB,
+            ignore_patterns or "",
+            bool(partial),
+        ])
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    async def project_scan_options(db: AsyncSession, project_id: UUID) -> Dict:
+        """The per-project knobs a scan (or a scan shard) needs."""
+        project = await db.get(Project, project_id)
+        partial = settings.REPO_PARTIAL_CLONE
+        if project and project.partial_clone is not None:
+            partial = project.partial_clone
+        ignore_patterns = project.scan_ignore if project else None
+        fingerprint = ScannerService.scan_fingerprint(partial, ignore_patterns)
+        last_sha = project.last_scanned_sha if project else None
+        return {
+            "partial": partial,
+            "ignore_patterns": ignore_patterns,
+            "last_scanned_sha": last_sha,
+            "fingerprint": fingerprint,
+            # Nothing scanned yet, or scanned with other rules: parse everything
+            "full_scan_needed": not last_sha or project.scan_fingerprint != fingerprint,
+        }
+
+    @staticmethod
+    def plan_shards(git_url: str, partial: bool, shard_count: int, min_files: int) -> Optional[Tuple[str, List[List[str]]]]:
+        """
+        Splits a big repository into `shard_count` groups of top-level folders
+        with similar numbers of source files ("" = files in the root).
+
+        Returns (commit SHA, shards), or None when the repo is too small for
+        sharding to pay off (or can't be listed). File counts come from
+        `git ls-tree` on the mirror, so nothing is checked out, walked or parsed.
+        """
+        try:
+            head_sha, paths = RepoManager.list_files(git_url, partial=partial)
+        except Exception as e:
+            log.warning(f"Could not list files of {git_url} for sharding ({e}), scanning in one worker.")
+            return None
+
+        counts: Dict[str, int] = {}
+        for file_path in paths:
+            if not file_path.endswith(RouteParsers.SUPPORTED_EXTENSIONS):
+                continue
+            top = file_path.split("/", 1)[0] if "/" in file_path else ""
+            counts[top] = counts.get(top, 0) + 1
+
+        total = sum(counts.values())
+        if total < min_files or len(counts) < 2:
+            return None
+
+        # Greedy bin packing: biggest folders first, into the lightest shard
+        shards: List[List[str]] = [[] for _ in range(min(shard_count, len(counts)))]
+        loads = [0] * len(shards)
+        for top, count in sorted(counts.items(), key=lambda item: -item[1]):
+            lightest = loads.index(min(loads))
+            shards[lightest].append(top)
+            loads[lightest] += count
+
+        log.info(f"Sharded {total} source files into {len(shards)} shards: {loads}")
+        return head_sha, shards
+
+    @staticmethod
+    def scan_shard(git_url: str, sha: str, subtrees: List[str], partial: bool, ignore_patterns: Optional[str]) -> List[List[str]]:
+        """
+        Parses one shard at a pinned commit. Only the shard's own folders are
+        checked out. Returns compact rows [method, path, framework, source_file,
+        line] so the Celery result stays small.
+        """
+        repo_path = RepoManager.checkout_repo(git_url, partial=partial, sha=sha, subtrees=subtrees)
+        try:
+            file_paths = ScannerService.collect_source_files(repo_path, ignore_patterns, subtrees=subtrees)
+            return [
+                [ep['method'], ep['path'], ep['framework'], ep['source_file'], ep.get('line')]
+                for ep in ScannerService.parse_files(repo_path, file_paths)
+            ]
+        finally:
+            RepoManager.release_repo(repo_path)
+
+    @staticmethod
+    async def merge_shards(
+        db: AsyncSession,
+        project_id: UUID,
+        sha: str,
+        fingerprint: str,
+        shard_results: List[List[list]]
+    ) -> Tuple[int, Dict[str, List[UUID]]]:
+        """
+        Chord callback side: merges every shard's rows and reconciles the
+        project's endpoints in one go, then records the scanned commit.
+        Returns the number of endpoints and the change set.
+        """
+        try:
+            discovered_endpoints = [
+                # Rows from shards of an older worker have no line
+                {"method": row[0], "path": row[1], "framework": row[2], "source_file": row[3],
+                 "line": row[4] if len(row) > 4 else None}
+                for rows in shard_results
+                for row in rows
+            ]
+            fresh = ScannerService.group_routes(discovered_endpoints)
+            change_set = await ScannerService.reconcile_endpoints(db, project_id, fresh, scan_sha=sha)
+
+            project = await db.get(Project, project_id)
+            if project:
+                project.last_scanned_sha = sha
+                project.scan_fingerprint = fingerprint
+            await db.commit()
+            log.info(f"Sharded scan complete for project {project_id} at {sha}. {len(fresh)} unique endpoints.")
+            return len(fresh), change_set
+        except Exception as e:
+            log.error(f"Error merging scan shards: {e}")
+            await db.rollback()
+            raise
+
+    @staticmethod
+    async def count_endpoints(db: AsyncSession, project_id: UUID) -> int:
+        query = select(func.count(Endpoint.id)).where(Endpoint.project_id == project_id)
+        return (await db.execute(query)).scalar() or 0
@@ -1,71 +1,322 @@
+import asyncio
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, exists, func, or_
 from uuid import UUID
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException, status
 
 from app.domain.models.test_case import TestCase
 from app.domain.models.endpoint import Endpoint
-from app.ai.llm_client import get_llm
-from app.ai.healing_prompts import HEALING_PROMPT
+from app.domain.models.endpoint_history import EndpointHistory
+from app.services.endpoint_history_service import EndpointHistoryService
+from app.ai.llm_runner import LLMRunner
+from app.ai.ast_healer import ASTHealer, Ambiguous
+from app.ai.telemetry import LLMTelemetry
+from app.ai.healing_prompts import HEALING_PROMPT, HEALING_PROMPT_VERSION, BATCH_HEALING_PROMPT, BATCH_HEALING_PROMPT_VERSION
 from app.ai.response_parser import AIResponseParser
+from app.config import settings
 from app.utils.logger import log
 
 class SelfHealingService:
     """
     Core Logic for Test Self-Healing.
-    
+
     1. Detects if a test is 'healable' (structure change vs bug).
-    2. Calls AI to patch the code.
+    2. Rewrites plain route changes locally, calls AI to patch the rest.
     3. Updates the DB with the healed version.
+
+    Batch healing (see `run_batch_healing`) groups the tests by endpoint
+    change (old -> new method and path): a rewrite learned from one test
+    is applied to the others, and the ones left to the AI share a prompt.
     """
-    
+    QUERY_BATCH = 1000 # Ids per IN (...) list
+
     @staticmethod
-    async def heal_test_case(db: AsyncSession, test_case_id: UUID) -> dict:
+    async def heal_test_case(db: AsyncSession, test_case_id: UUID, use_cache: bool = True) -> dict:
         """
         Analyzes and heals a specifically broken test case.
+
+        The same broken test against the same new signature gets the
+        cached patch, unless `use_cache` is False.
         """
         # 1. Fetch Test Case and its associated Endpoint
         query = select(TestCase, Endpoint).join(Endpoint).where(TestCase.id == test_case_id)
         result = await db.execute(query)
         data = result.first()
-        
+
         if not data:
             raise HTTPException(status_code=404, detail="Test case or endpoint not found.")
-            
+
         test_case, endpoint = data
-        
-        # 2. Heuristic: Is it healable?
-        # In a real app, we'd compare historical metadata. 
-        # For this phase, we assume the user called this because metadata shifted.
+
+        # 2. What the endpoint looked like before: the signatures scans
+        # renamed it from since the test was last written (endpoint history)
         log.info(f"Attempting to heal test case {test_case_id} for {endpoint.path}")
-        
-        # 3. Call AI to Patch
-        # We pass the OLD metadata (simulated here) and the NEW metadata from the DB.
-        # In a real scenario, we'd track 'endpoint_history'.
-        llm = get_llm()
-        prompt_text = HEALING_PROMPT.format(
-            framework=endpoint.framework,
-            old_method="UNKNOWN_OLD", # In a production system, this would be the previous DB version
-            old_path="UNKNOWN_OLD",
-            new_method=endpoint.method,
-            new_path=endpoint.path,
-            old_test_code=test_case.test_code
+        previous = await EndpointHistoryService.previous_signatures(
+            db, endpoint.id, since=test_case.healed_at or test_case.created_at
+        )
+
+        # 3. Plain route changes are rewritten locally (milliseconds, no
+        # tokens); the AI only gets the tests that can't be (see ASTHealer)
+        healed_by = "ast"
+        patch_data = SelfHealingService.heal_locally(
+            test_case.test_code, endpoint.method, endpoint.path, previous, endpoint.project_id, test_case_id
         )
-        
-        response = llm.invoke(prompt_text)
-        patch_data = AIResponseParser.parse_test_generation(response.content) # Reusing the parser logic
-        
+        if patch_data is None:
+            healed_by = "llm"
+            patch_data = await SelfHealingService.heal_with_llm(
+                test_case.test_code, endpoint.framework, endpoint.method, endpoint.path,
+                previous[0] if previous else None, endpoint.project_id, use_cache=use_cache
+            )
+
         # 4. Save to Database
-        test_case.test_code = patch_data.get("patched_test_code", test_case.test_code)
-        test_case.status = "HEALED"
-        test_case.description = f"[HEALED] {test_case.description}\nReason: {patch_data.get('reason')}"
-        
+        for field, value in SelfHealingService.healed_values(test_case.test_code, test_case.description, patch_data).items():
+            setattr(test_case, field, value)
+
         await db.commit()
         await db.refresh(test_case)
-        
+
         log.info(f"Test case {test_case_id} successfully healed.")
         return {
             "test_case_id": test_case_id,
             "status": "HEALED",
-            "reason": patch_data.get("reason")
+            "reason": patch_data.get("reason"),
+            "healed_by": healed_by
         }
+
+    @staticmethod
+    def heal_locally(
+        test_code: str,
+        method: str,
+        path: str,
+        previous: List[Tuple[str, str]],
+        project_id: Optional[UUID] = None,
+        test_case_id: Optional[UUID] = None
+    ) -> Optional[Dict]:
+        """
+        The AST pass: tries each known old signature, then lets ASTHealer
+        infer it from the test. None when the AI has to do it.
+        """
+        if not settings.HEALING_AST_ENABLED:
+            return None
+        for old_method, old_path in list(previous) + [(None, None)]:
+            try:
+                patch_data = ASTHealer.heal(test_code, method, path, old_method=old_method, old_path=old_path)
+            except Ambiguous as e:
+                log.info(f"No local fix for test case {test_case_id} from {old_method} {old_path} ({e}).")
+                continue
+            except Exception as e:
+                log.warning(f"Local healing of test case {test_case_id} crashed ({e}), asking the AI.")
+                return None
+            # Counted with the LLM heals (free, no latency) in AI efficiency analytics
+            LLMTelemetry.record("healing", "ast", "OK", results=1, project_id=project_id)
+            return patch_data
+        return None
+
+    @staticmethod
+    async def heal_with_llm(
+        test_code: str,
+        framework: str,
+        method: str,
+        path: str,
+        old: Optional[Tuple[str, str]],
+        project_id: Optional[UUID] = None,
+        use_cache: bool = True
+    ) -> Dict:
+        # Without history (endpoint renamed before it was recorded) the
+        # AI works the old route out from the test code
+        old_method, old_path = old or ("UNKNOWN", "(not recorded, see the test code)")
+        prompt_text = HEALING_PROMPT.format(
+            framework=framework,
+            old_method=old_method,
+            old_path=old_path,
+            new_method=method,
+            new_path=path,
+            old_test_code=test_code
+        )
+        return await LLMRunner.complete(
+            "healing", prompt_text, HEALING_PROMPT_VERSION,
+            AIResponseParser.parse_healing, use_cache=use_cache, project_id=project_id,
+            validate=AIResponseParser.validate_test
+        )
+
+    @staticmethod
+    async def heal_batch_with_llm(
+        tests: List[Dict],
+        old: Optional[Tuple[str, str]],
+        project_id: Optional[UUID] = None,
+        use_cache: bool = True
+    ) -> Dict:
+        """
+        Heals tests facing the same change (one group of `group_targets`)
+        with a single AI call. Returns {test id: patch data} for the tests
+        the AI answered properly; the caller heals the others one by one.
+        """
+        change = tests[0]
+        old_method, old_path = old or ("UNKNOWN", "(not recorded, see the test code)")
+        # Labels, not ids, in the prompt (see TestGeneratorService.batch_labels)
+        labels = {f"T{position + 1}": test["id"] for position, test in enumerate(tests)}
+        prompt_text = BATCH_HEALING_PROMPT.format(
+            framework=change["framework"],
+            old_method=old_method,
+            old_path=old_path,
+            new_method=change["method"],
+            new_path=change["path"],
+            old_tests="\n\n".join(f"--- {label} ---\n{test['test_code']}" for label, test in zip(labels, tests))
+        )
+        results = await LLMRunner.complete(
+            "healing", prompt_text, BATCH_HEALING_PROMPT_VERSION,
+            lambda raw: AIResponseParser.parse_batch_healing(raw, list(labels)),
+            use_cache=use_cache, project_id=project_id, count_results=len,
+            expected_answer_tokens=settings.LLM_EXPECTED_ANSWER_TOKENS * len(tests),
+            validate=AIResponseParser.validate_batch
+        )
+        return {labels[label]: patch_data for label, patch_data in results.items()}
+
+    @staticmethod
+    def healed_values(test_code: str, description: str, patch_data: Dict) -> Dict:
+        """The TestCase columns a heal changes."""
+        return {
+            "test_code": patch_data.get("patched_test_code", test_code),
+            "status": "HEALED",
+            "description": f"[HEALED] {description}\nReason: {patch_data.get('reason')}",
+            "healed_at": datetime.utcnow(),
+        }
+
+    @staticmethod
+    async def load_targets(db: AsyncSession, project_id: UUID, test_case_ids: Optional[List[UUID]] = None) -> List[Dict]:
+        """
+        Tests a batch heal works on, each with its endpoint's current
+        signature and the old ones it was renamed from since the test was
+        last written.
+
+        Without `test_case_ids`: every BROKEN test of the project, and every
+        test whose endpoint was renamed after it was written or healed.
+        """
+        base = (
+            select(TestCase.id, TestCase.test_code, TestCase.description, TestCase.created_at, TestCase.healed_at,
+                   Endpoint.id, Endpoint.method, Endpoint.path, Endpoint.framework)
+            .join(Endpoint, TestCase.endpoint_id == Endpoint.id)
+            .where(Endpoint.project_id == project_id)
+        )
+        if test_case_ids is None:
+            renamed_since = exists().where(
+                EndpointHistory.endpoint_id == TestCase.endpoint_id,
+                EndpointHistory.change == "MODIFIED",
+                EndpointHistory.created_at >= func.coalesce(TestCase.healed_at, TestCase.created_at)
+            )
+            rows = (await db.execute(base.where(or_(TestCase.status == "BROKEN", renamed_since)))).all()
+        else:
+            rows = []
+            batch_size = SelfHealingService.QUERY_BATCH
+            for i in range(0, len(test_case_ids), batch_size):
+                rows.extend((await db.execute(base.where(TestCase.id.in_(test_case_ids[i:i + batch_size])))).all())
+
+        renames = await EndpointHistoryService.renames(db, list({row[5] for row in rows}))
+        return [
+            {
+                "id": test_id,
+                "test_code": test_code,
+                "description": description,
+                "endpoint_id": endpoint_id,
+                "method": method,
+                "path": path,
+                "framework": framework,
+                "previous": EndpointHistoryService.signatures_since(renames.get(endpoint_id, []), healed_at or created_at),
+            }
+            for test_id, test_code, description, created_at, healed_at, endpoint_id, method, path, framework in rows
+        ]
+
+    @staticmethod
+    def group_targets(targets: List[Dict]) -> List[List[Dict]]:
+        """
+        Groups tests that face the same change: renamed from the same old
+        signatures to the same new one.
+        """
+        groups: Dict[Tuple, List[Dict]] = {}
+        for target in targets:
+            change = (tuple(target["previous"]), target["method"], target["path"], target["framework"])
+            groups.setdefault(change, []).append(target)
+        return list(groups.values())
+
+    @staticmethod
+    async def heal_group(
+        tests: List[Dict],
+        semaphore: asyncio.Semaphore,
+        project_id: Optional[UUID] = None,
+        use_cache: bool = True
+    ) -> List[Tuple[Dict, Optional[Dict], Optional[str], Optional[Exception]]]:
+        """
+        Heals one group from `group_targets`. Returns (test, patch data,
+        "ast" or "llm", error) per test.
+
+        Every old signature the AST pass works out from one test (when the
+        history doesn't know it) is tried on the rest of the group, so the
+        same rewrite is applied to every test it fits. What is left goes to
+        the AI, HEALING_BATCH_MAX tests per prompt (tests the answer misses
+        get a call of their own), at most `semaphore` calls in flight
+        (shared by all groups of a job).
+        """
+        change = tests[0]
+        known = list(change["previous"])
+        results = []
+        pending = tests
+        learned = True
+        while pending and learned:
+            learned = False
+            unhealed = []
+            for test in pending:
+                patch_data = SelfHealingService.heal_locally(
+                    test["test_code"], change["method"], change["path"], known, project_id, test["id"]
+                )
+                if patch_data is None:
+                    unhealed.append(test)
+                    continue
+                results.append((test, patch_data, "ast", None))
+                old = (patch_data.get("old_method"), patch_data.get("old_path"))
+                if old[1] is not None and old not in known:
+                    known.append(old)
+                    learned = True
+            pending = unhealed
+        old = known[0] if known else None
+
+        async def heal_one(test: Dict):
+            async with semaphore:
+                try:
+                    patch_data = await SelfHealingService.heal_with_llm(
+                        test["test_code"], change["framework"], change["method"], change["path"],
+                        old, project_id, use_cache=use_cache
+                    )
+                    return test, patch_data, "llm", None
+                except Exception as e:
+                    return test, None, None, e
+
+        async def heal_batch(batch: List[Dict]):
+            if len(batch) == 1:
+                return [await heal_one(batch[0])]
+            async with semaphore:
+                try:
+                    patches = await SelfHealingService.heal_batch_with_llm(batch, old, project_id, use_cache=use_cache)
+                except Exception as e:
+                    log.warning(f"Batched heal of {len(batch)} tests failed ({e}), healing them one by one.")
+                    patches = {}
+            healed = [(test, patches[test["id"]], "llm", None) for test in batch if test["id"] in patches]
+            return healed + list(await asyncio.gather(*[heal_one(test) for test in batch if test["id"] not in patches]))
+
+        batch_size = max(1, settings.HEALING_BATCH_MAX)
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        for healed in await asyncio.gather(*[heal_batch(batch) for batch in batches]):
+            results.extend(healed)
+        return results
+
+    @staticmethod
+    async def save_healed(db: AsyncSession, healed: List[Tuple[Dict, Dict]]):
+        """Writes (test, patch data) pairs with one bulk UPDATE by id."""
+        if not healed:
+            return
+        await db.execute(update(TestCase), [
+            {"id": test["id"], **SelfHealingService.healed_values(test["test_code"], test["description"], patch_data)}
+            for test, patch_data in healed
+        ])
+        await db.commit()
@@ -0,0 +1,121 @@
+import time
+import asyncio
+from typing import Callable, Dict, Optional
+from uuid import UUID
+
+from app.config import settings
+from app.db.session import async_session_maker
+from app.services.generation_job_service import GenerationJobService
+from app.utils.logger import log
+
+class BufferedTestCaseWriter:
+    """
+    Collects the results of a generation job and writes them in bulk.
+
+    Why this?
+    Saving each finished batch in its own transaction meant one commit
+    (and one pooled connection checkout) per handful of tests: a 10k test
+    job paid thousands of round trips and kept workers competing for
+    connections while the AI answers kept coming in. Results are now
+    buffered and written by GenerationJobService.record in multi-row
+    statements once `max_rows` are waiting or the oldest has waited
+    `max_seconds`. A session is only opened for the flush itself.
+
+    Results still in the buffer when the process dies are not lost for
+    good: their items aren't DONE, so the retried job generates them again
+    (normally straight from the LLM response cache).
+    """
+
+    def __init__(
+        self,
+        job_id: UUID,
+        session_maker: Optional[Callable] = None,
+        max_rows: Optional[int] = None,
+        max_seconds: Optional[float] = None,
+    ):
+        self.job_id = job_id
+        self.session_maker = session_maker or async_session_maker
+        self.max_rows = max(1, max_rows or settings.GENERATION_WRITE_BATCH)
+        self.max_seconds = max_seconds if max_seconds is not None else settings.GENERATION_WRITE_SECONDS
+        self.saved = 0 # Tests written so far
+        self.flushes = 0
+        self._generated: Dict[str, dict] = {}
+        self._failed: Dict[str, str] = {}
+        self._oldest: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._generated) + len(self._failed)
+
+    def _raise_timer_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    async def add(self, generated: Dict[str, dict], failed: Dict[str, str]):
+        """
+        Buffers results (endpoint id as submitted -> test data / error) and
+        flushes when the buffer is full. A failed time-based flush is
+        raised here, on the next call.
+        """
+        self._raise_timer_error()
+        self._generated.update(generated)
+        self._failed.update(failed)
+        if self.pending and self._oldest is None:
+            self._oldest = time.monotonic()
+
+        if self.pending >= self.max_rows:
+            await self.flush()
+        elif self.pending and self._timer is None:
+            self._timer = asyncio.create_task(self._flush_when_due())
+
+    async def _flush_when_due(self):
+        try:
+            while self.pending:
+                wait = self._oldest + self.max_seconds - time.monotonic() if self._oldest else self.max_seconds
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                await self.flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error(f"Timed flush of generation job {self.job_id} failed: {e}")
+            self._error = e
+        finally:
+            self._timer = None
+
+    async def flush(self) -> int:
+        """Writes everything buffered so far. Returns the tests written."""
+        async with self._lock:
+            if not self.pending:
+                return 0
+            generated, failed = self._generated, self._failed
+            self._generated, self._failed, self._oldest = {}, {}, None
+            try:
+                async with self.session_maker() as db:
+                    count = await GenerationJobService.record(db, self.job_id, generated, failed)
+            except BaseException:
+                # Put them back (newer results win) so a later flush can retry
+                self._generated = {**generated, **self._generated}
+                self._failed = {**failed, **self._failed}
+                self._oldest = time.monotonic()
+                raise
+            self.saved += count
+            self.flushes += 1
+            return count
+
+    async def close(self) -> int:
+        """Stops the timer and writes what's left. Returns the total saved."""
+        if self._timer is not None:
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+        self._raise_timer_error()
+        await self.flush()
+        return self.saved
@@ -1,12 +1,18 @@
+import hashlib
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from uuid import UUID
+from typing import Callable, Dict, List, Optional
 from fastapi import HTTPException, status
 
 from app.domain.models.endpoint import Endpoint
 from app.domain.models.project import Project
-from app.ai.llm_client import get_llm
-from app.ai.prompt_templates import TEST_GEN_PROMPT
+from app.ai.llm_runner import LLMRunner
+from app.ai.prompt_templates import (
+    TEST_GEN_PROMPT, TEST_GEN_PROMPT_VERSION, BATCH_TEST_GEN_PROMPT, BATCH_TEST_GEN_PROMPT_VERSION
+)
+from app.ai.token_counter import TokenCounter
+from app.config import settings
 from app.ai.response_parser import AIResponseParser
 from app.utils.logger import log
 
@@ -18,10 +24,167 @@ class TestGeneratorService:
     1. Orchestrating the AI call for a single endpoint.
     2. Merging project context with endpoint data.
     3. Returning clean, structured test data.
+
+    The AI call is async (`ainvoke`), so many generations can be in
+    flight at once without blocking the event loop. Answers go through
+    the LLM response cache (see LLMRunner), so regenerating an unchanged
+    endpoint is free unless the caller bypasses the cache.
     """
+
+    @staticmethod
+    async def load_contexts(db: AsyncSession, endpoint_ids: List[UUID]) -> Dict[UUID, dict]:
+        """
+        Fetches the prompt inputs for many endpoints in ONE query, so batch
+        jobs don't hold a DB session while waiting on the AI.
+        """
+        query = select(Endpoint, Project).join(Project).where(Endpoint.id.in_(endpoint_ids))
+        result = await db.execute(query)
+        return {
+            endpoint.id: {
+                "project_id": project.id,
+                "project_name": project.name,
+                "framework": endpoint.framework,
+                "method": endpoint.method,
+                "path": endpoint.path,
+            }
+            for endpoint, project in result.all()
+        }
+
+    @staticmethod
+    async def generate_from_context(
+        context: dict,
+        use_cache: bool = True,
+        on_partial: Optional[Callable[[Optional[str], str], None]] = None,
+    ) -> dict:
+        """
+        Calls the AI for one endpoint context (see `load_contexts`).
+        With `on_partial`, the answer is streamed and the test code is
+        passed to it as it's written (see LLMRunner.complete).
+        """
+        prompt_text = TEST_GEN_PROMPT.format(**context)
+
+        log.info(f"Calling AI for endpoint: {context['method']} {context['path']}")
+        return await LLMRunner.complete(
+            "generation", prompt_text, TEST_GEN_PROMPT_VERSION,
+            AIResponseParser.parse_test_generation, use_cache=use_cache,
+            expected_answer_tokens=settings.GENERATION_TOKENS_PER_TEST,
+            on_partial=on_partial, project_id=context.get("project_id"),
+            validate=AIResponseParser.validate_test
+        )
     
     @staticmethod
-    async def generate_single_test(db: AsyncSession, endpoint_id: UUID) -> dict:
+    def _endpoint_line(label: str, context: dict) -> str:
+        return f"{label} | {context['framework']} | {context['method']} | {context['path']}"
+
+    @staticmethod
+    def batch_labels(endpoint_ids: List[UUID]) -> Dict[str, UUID]:
+        """
+        The keys a batched prompt names its endpoints by (E1, E2, ... in
+        batch order), mapped to the endpoint ids. Ids never go into the
+        prompt: the same routes always give the same prompt, even after a
+        rescan recreated their rows.
+        """
+        return {f"E{position + 1}": endpoint_id for position, endpoint_id in enumerate(endpoint_ids)}
+
+    @staticmethod
+    def _ends_batch(context: dict, max_size: int) -> bool:
+        """
+        Content-defined batch boundary: about one route in `max_size` ends
+        a batch, chosen by a hash of its method and path. Adding or removing
+        a route only changes the batch it falls in, the others keep their
+        exact prompts (and their response cache entries).
+        """
+        digest = hashlib.sha1(f"{context['method']} {context['path']}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "big") % max_size == 0
+
+    @staticmethod
+    def plan_batches(contexts: Dict[UUID, dict]) -> List[List[UUID]]:
+        """
+        Packs endpoints into batched prompts.
+
+        Why this?
+        For short CRUD routes the fixed instructions of TEST_GEN_PROMPT cost
+        more than the endpoint itself. Batching sends them once for up to
+        GENERATION_BATCH_MAX endpoints of the same project.
+
+        A batch also stops growing once the prompt plus the expected answers
+        (GENERATION_TOKENS_PER_TEST each) would exceed
+        GENERATION_BATCH_TOKEN_BUDGET, so long answers don't get cut off.
+        Endpoints are sorted by path, and batches end on routes picked by
+        their content (see `_ends_batch`) rather than every N endpoints, so
+        one route more or less doesn't reshuffle every later batch.
+        """
+        by_project: Dict[str, List[UUID]] = {}
+        for endpoint_id, context in contexts.items():
+            by_project.setdefault(context["project_name"], []).append(endpoint_id)
+
+        max_size = max(1, settings.GENERATION_BATCH_MAX)
+        batches = []
+        for project_name, endpoint_ids in sorted(by_project.items()):
+            endpoint_ids.sort(key=lambda i: (contexts[i]["path"], contexts[i]["method"], str(i)))
+            base_tokens = TokenCounter.count(
+                BATCH_TEST_GEN_PROMPT.format(project_name=project_name, endpoint_lines="")
+            )
+
+            batch, tokens = [], base_tokens
+            for endpoint_id in endpoint_ids:
+                cost = (
+                    TokenCounter.count(TestGeneratorService._endpoint_line(endpoint_id, contexts[endpoint_id]))
+                    + settings.GENERATION_TOKENS_PER_TEST
+                )
+                if batch and (len(batch) >= max_size or tokens + cost > settings.GENERATION_BATCH_TOKEN_BUDGET):
+                    batches.append(batch)
+                    batch, tokens = [], base_tokens
+                batch.append(endpoint_id)
+                tokens += cost
+                if max_size > 1 and TestGeneratorService._ends_batch(contexts[endpoint_id], max_size):
+                    batches.append(batch)
+                    batch, tokens = [], base_tokens
+            if batch:
+                batches.append(batch)
+        return batches
+
+    @staticmethod
+    async def generate_batch(
+        contexts: Dict[UUID, dict],
+        use_cache: bool = True,
+        on_partial: Optional[Callable[[Optional[str], str], None]] = None,
+    ) -> Dict[UUID, dict]:
+        """
+        Generates tests for several endpoints (one batch of `plan_batches`)
+        with a single AI call. When streaming, `on_partial` gets the label
+        (see `batch_labels`) of the item being written with its code.
+
+        Returns the endpoints the AI answered properly; the caller retries
+        the missing ones with `generate_from_context`.
+        """
+        endpoint_ids = list(contexts)
+        if len(endpoint_ids) == 1:
+            endpoint_id = endpoint_ids[0]
+            return {endpoint_id: await TestGeneratorService.generate_from_context(contexts[endpoint_id], use_cache, on_partial)}
+
+        labels = TestGeneratorService.batch_labels(endpoint_ids)
+        prompt_text = BATCH_TEST_GEN_PROMPT.format(
+            project_name=contexts[endpoint_ids[0]]["project_name"],
+            endpoint_lines="\n".join(
+                TestGeneratorService._endpoint_line(label, contexts[endpoint_id]) for label, endpoint_id in labels.items()
+            )
+        )
+
+        log.info(f"Calling AI for a batch of {len(endpoint_ids)} endpoints.")
+        results = await LLMRunner.complete(
+            "generation", prompt_text, BATCH_TEST_GEN_PROMPT_VERSION,
+            # Parsed (and cached) by label, mapped to this batch's ids below
+            lambda raw: AIResponseParser.parse_batch_generation(raw, list(labels)),
+            use_cache=use_cache,
+            expected_answer_tokens=settings.GENERATION_TOKENS_PER_TEST * len(endpoint_ids),
+            on_partial=on_partial, project_id=contexts[endpoint_ids[0]].get("project_id"), count_results=len,
+            validate=AIResponseParser.validate_batch
+        )
+        return {labels[label]: data for label, data in results.items()}
+
+    @staticmethod
+    async def generate_single_test(db: AsyncSession, endpoint_id: UUID, use_cache: bool = True) -> dict:
         """
         Generates test data for one specific endpoint.
         """
@@ -34,19 +197,12 @@ class TestGeneratorService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Endpoint not found.")
             
         endpoint, project = data
-        
-        # 2. Prepare AI Prompt
-        llm = get_llm()
-        prompt_text = TEST_GEN_PROMPT.format(
-            project_name=project.name,
-            framework=endpoint.framework,
-            method=endpoint.method,
-            path=endpoint.path
-        )
-        
-        # 3. Call AI
-        log.info(f"Calling AI for endpoint: {endpoint.method} {endpoint.path}")
-        response = llm.invoke(prompt_text)
-        
-        # 4. Parse and Return
-        return AIResponseParser.parse_test_generation(response.content)
+
+        # 2. Call AI with the merged context
+        return await TestGeneratorService.generate_from_context({
+            "project_id": project.id,
+            "project_name": project.name,
+            "framework": endpoint.framework,
+            "method": endpoint.method,
+            "path": endpoint.path,
+        }, use_cache=use_cache)
@@ -0,0 +1,176 @@
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, insert
+from uuid import UUID
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+
+from app.domain.models.test_run import TestRun
+from app.domain.models.test_result import TestResult
+from app.domain.models.test_case import TestCase
+from app.domain.models.endpoint import Endpoint
+from app.domain.models.project import Project
+from app.config import settings
+
+class TestRunService:
+    """
+    Bookkeeping for test runs: which tests a run covers, their results
+    and the run's counters.
+
+    Why this?
+    A run of 10k tests is split into chunks executed by different workers
+    (see `run_tests`). Each chunk writes its results and bumps the run's
+    counters in one transaction, so the counters always match the rows and
+    a run can be followed (and its pass rate read) while it's going.
+    """
+    QUERY_BATCH = 1000 # Ids per IN (...) list
+    # TestResult status -> TestRun counter
+    COUNTERS = {"PASSED": "passed", "FAILED": "failed", "ERROR": "errors", "TIMEOUT": "errors", "SKIPPED": "skipped"}
+
+    @staticmethod
+    async def create_run(db: AsyncSession, project_id: UUID, test_case_ids: Optional[List[UUID]] = None) -> Tuple[TestRun, List[str]]:
+        """
+        Starts a run of `test_case_ids` (without them: every test of the
+        project). Ids of other projects' tests are dropped. Returns the run
+        and the ids of the tests it covers.
+        """
+        base = (
+            select(TestCase.id)
+            .join(Endpoint, TestCase.endpoint_id == Endpoint.id)
+            .where(Endpoint.project_id == project_id)
+        )
+        if test_case_ids is None:
+            ids = list((await db.execute(base.order_by(TestCase.created_at))).scalars().all())
+        else:
+            requested = list(dict.fromkeys(test_case_ids))
+            found = set()
+            batch_size = TestRunService.QUERY_BATCH
+            for i in range(0, len(requested), batch_size):
+                found.update((await db.execute(base.where(TestCase.id.in_(requested[i:i + batch_size])))).scalars().all())
+            ids = [test_id for test_id in requested if test_id in found]
+
+        if not ids:
+            raise HTTPException(status_code=404, detail="No test cases to run in this project.")
+
+        run = TestRun(project_id=project_id, status="RUNNING", total_count=len(ids))
+        db.add(run)
+        await db.commit()
+        await db.refresh(run)
+        return run, [str(test_id) for test_id in ids]
+
+    @staticmethod
+    async def load_chunk(db: AsyncSession, run_id: UUID, test_case_ids: List[UUID]) -> Tuple[List[Tuple[str, str]], Optional[str]]:
+        """
+        The (id, test code) pairs of a chunk, in one query, and the
+        project's `api_base_url` the tests are pointed at. Tests deleted
+        since the run started are left out.
+        """
+        base_url = (await db.execute(
+            select(Project.api_base_url).join(TestRun, TestRun.project_id == Project.id).where(TestRun.id == run_id)
+        )).scalar()
+        cases = []
+        batch_size = TestRunService.QUERY_BATCH
+        for i in range(0, len(test_case_ids), batch_size):
+            query = select(TestCase.id, TestCase.test_code).where(TestCase.id.in_(test_case_ids[i:i + batch_size]))
+            cases.extend((str(test_id), test_code) for test_id, test_code in (await db.execute(query)).all())
+        return cases, base_url
+
+    @staticmethod
+    def count(results: List[Dict]) -> Dict[str, int]:
+        """Results per TestRun counter (ERROR and TIMEOUT are both errors)."""
+        counts = {"passed": 0, "failed": 0, "errors": 0, "skipped": 0}
+        for result in results:
+            counts[TestRunService.COUNTERS[result["status"]]] += 1
+        return counts
+
+    @staticmethod
+    async def save_results(db: AsyncSession, run_id: UUID, results: List[Dict], missing: int = 0) -> Dict[str, int]:
+        """
+        Writes a chunk's results (one INSERT per TEST_RUN_WRITE_BATCH rows)
+        and adds them to the run's counters, in one transaction. `missing`
+        tests (deleted before they ran) count as skipped.
+        """
+        rows = [
+            {
+                "run_id": run_id,
+                "test_case_id": UUID(result["test_case_id"]),
+                "status": result["status"],
+                "duration_ms": result["duration_ms"],
+                "error": result["error"],
+            }
+            for result in results
+        ]
+        batch_size = max(1, settings.TEST_RUN_WRITE_BATCH)
+        for i in range(0, len(rows), batch_size):
+            await db.execute(insert(TestResult), rows[i:i + batch_size])
+
+        counts = TestRunService.count(results)
+        counts["skipped"] += missing
+        await db.execute(
+            update(TestRun).where(TestRun.id == run_id).values(
+                passed_count=TestRun.passed_count + counts["passed"],
+                failed_count=TestRun.failed_count + counts["failed"],
+                error_count=TestRun.error_count + counts["errors"],
+                skipped_count=TestRun.skipped_count + counts["skipped"],
+            )
+        )
+        await db.commit()
+        return counts
+
+    @staticmethod
+    def pass_rate(passed: int, failed: int, errors: int) -> Optional[float]:
+        """Passed tests per hundred that ran (skipped ones don't count). None if none ran."""
+        executed = passed + failed + errors
+        return round(passed / executed * 100, 1) if executed else None
+
+    @staticmethod
+    async def finish_run(db: AsyncSession, run_id: UUID, error: Optional[str] = None) -> TestRun:
+        """
+        Closes the run: SUCCESS if every test that ran passed, FAILED if
+        not, ERROR if the run itself broke (`error`, e.g. a chunk that kept
+        failing to save). The pass rate covers the results saved so far.
+        """
+        run = await db.get(TestRun, run_id)
+        if run is None:
+            raise HTTPException(status_code=404, detail="Test run not found.")
+        if error is not None:
+            run.status = "ERROR"
+        else:
+            run.status = "SUCCESS" if run.failed_count + run.error_count == 0 else "FAILED"
+        run.pass_rate = TestRunService.pass_rate(run.passed_count, run.failed_count, run.error_count)
+        run.finished_at = datetime.utcnow()
+        await db.commit()
+        await db.refresh(run)
+        return run
+
+    @staticmethod
+    async def list_runs(db: AsyncSession, project_id: UUID, limit: int = 20) -> List[TestRun]:
+        query = (
+            select(TestRun)
+            .where(TestRun.project_id == project_id)
+            .order_by(TestRun.started_at.desc())
+            .limit(limit)
+        )
+        return list((await db.execute(query)).scalars().all())
+
+    @staticmethod
+    async def get_run(
+        db: AsyncSession,
+        project_id: UUID,
+        run_id: UUID,
+        status: Optional[str] = None,
+        limit: int = 1000,
+        offset: int = 0
+    ) -> Tuple[TestRun, List[TestResult]]:
+        """A run and a page of its results, only those with `status` if given."""
+        run = (await db.execute(
+            select(TestRun).where(TestRun.id == run_id, TestRun.project_id == project_id)
+        )).scalar_one_or_none()
+        if run is None:
+            raise HTTPException(status_code=404, detail="Test run not found.")
+
+        query = select(TestResult).where(TestResult.run_id == run_id)
+        if status is not None:
+            query = query.where(TestResult.status == status.upper())
+        query = query.order_by(TestResult.created_at, TestResult.id).offset(offset).limit(limit)
+        return run, list((await db.execute(query)).scalars().all())
@@ -0,0 +1,262 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.utils.logger import log
+
+class IgnoreRules:
+    """
+    A small .gitignore matcher (no extra dependency).
+
+    Supports comments, `!` negation, trailing `/` (directories only),
+    leading or inner `/` (anchored to the file's folder), `*`, `?`, `[...]`
+    and `**`. Rules from a nested .gitignore only apply below its folder.
+    """
+
+    def __init__(self):
+        # (base folder, compiled regex, negate, directories only)
+        self.rules: List[Tuple[str, re.Pattern, bool, bool]] = []
+
+    @staticmethod
+    def _translate(pattern: str) -> str:
+        regex = ""
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith("**/", i):
+                regex += "(?:.*/)?"
+                i += 3
+            elif pattern.startswith("**", i):
+                regex += ".*"
+                i += 2
+            elif pattern[i] == "*":
+                regex += "[^/]*"
+                i += 1
+            elif pattern[i] == "?":
+                regex += "[^/]"
+                i += 1
+            elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+                end = pattern.index("]", i + 1)
+                regex += "[" + pattern[i + 1:end].replace("\\", "\\\\") + "]"
+                i = end + 1
+            else:
+                regex += re.escape(pattern[i])
+                i += 1
+        return regex
+
+    def add_lines(self, lines: Iterable[str], base: str = ""):
+        """Adds gitignore-style patterns that apply to files under `base`."""
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if not line:
+                continue
+
+            prefix = "^" if anchored else "^(?:.*/)?"
+            regex = re.compile(prefix + self._translate(line) + "$")
+            self.rules.append((base, regex, negate, dir_only))
+
+    def add_file(self, file_path: str, base: str = ""):
+        try:
+            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                self.add_lines(f, base)
+        except OSError:
+            pass
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """`rel_path` uses forward slashes and is relative to the repo root."""
+        ignored = False
+        for base, regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                sub_path = rel_path[len(base) + 1:]
+            else:
+                sub_path = rel_path
+            if regex.match(sub_path):
+                ignored = not negate
+        return ignored
+
+
+class FileWalker:
+    """
+    Walks a repository and returns the files worth parsing.
+
+    Why this?
+    Filtering after `os.walk` still descends into every `node_modules`
+    and `.git` folder. This walker prunes those directories before entering
+    them, respects `.gitignore` / `.testgenignore` files and the project's own
+    ignore patterns, and skips binaries and oversized files (e.g. minified
+    bundles). It reports what it skipped so we can see the savings.
+    """
+    ALWAYS_SKIP_DIRS = {
+        '.git', 'node_modules', '__pycache__', 'venv', '.venv',
+        '.tox', '.mypy_cache', '.pytest_cache'
+    }
+    IGNORE_FILES = ('.gitignore', '.testgenignore')
+    BINARY_EXTENSIONS = {
+        '.png', '.jpg', '.jpeg', '.gif', '.ico', '.pdf', '.zip', '.gz', '.tar',
+        '.jar', '.so', '.dll', '.exe', '.pyc', '.woff', '.woff2', '.ttf', '.mp4', '.bin'
+    }
+
+    @staticmethod
+    def new_stats() -> Dict[str, int]:
+        return {"files": 0, "skipped_files": 0, "skipped_bytes": 0, "pruned_dirs": 0}
+
+    @staticmethod
+    def build_rules(root: str, extra_patterns: Optional[str] = None) -> IgnoreRules:
+        """Rules from the root ignore files plus the project's own patterns."""
+        rules = IgnoreRules()
+        for name in FileWalker.IGNORE_FILES:
+            rules.add_file(os.path.join(root, name))
+        if extra_patterns:
+            rules.add_lines(extra_patterns.splitlines())
+        return rules
+
+    @staticmethod
+    def _skip_reason(name: str, size: int, extensions: Optional[Tuple[str, ...]], max_file_bytes: Optional[int]) -> Optional[str]:
+        if os.path.splitext(name)[1].lower() in FileWalker.BINARY_EXTENSIONS:
+            return "binary"
+        if extensions and not name.endswith(extensions):
+            return "extension"
+        if max_file_bytes and size > max_file_bytes:
+            return "too_large"
+        return None
+
+    @staticmethod
+    def walk(
+        root: str,
+        extensions: Optional[Tuple[str, ...]] = None,
+        extra_patterns: Optional[str] = None,
+        max_file_bytes: Optional[int] = None,
+        subtrees: Optional[List[str]] = None
+    ) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Returns (absolute file paths, stats). Directories that are always
+        skipped or ignored are never entered.
+
+        `subtrees` limits the walk to some top-level folders (used by scan
+        shards); "" in that list means the files directly in the root.
+        """
+        rules = FileWalker.build_rules(root, extra_patterns)
+        stats = FileWalker.new_stats()
+        found = []
+
+        if subtrees is None:
+            stack = [""]
+        else:
+            stack = [
+                d for d in subtrees
+                if d == "" or (d not in FileWalker.ALWAYS_SKIP_DIRS and not rules.is_ignored(d, True))
+            ]
+        root_files_only = subtrees is not None
+
+        while stack:
+            rel_dir = stack.pop()
+            abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+
+            try:
+                entries = list(os.scandir(abs_dir))
+            except OSError:
+                continue
+
+            # Nested ignore files apply to everything below their folder
+            if rel_dir:
+                for entry in entries:
+                    if entry.name in FileWalker.IGNORE_FILES:
+                        rules.add_file(entry.path, rel_dir)
+
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+
+                if entry.is_dir(follow_symlinks=False):
+                    if root_files_only and not rel_dir:
+                        continue # Top-level folders are walked by their own shard
+                    if entry.name in FileWalker.ALWAYS_SKIP_DIRS or rules.is_ignored(rel_path, True):
+                        stats["pruned_dirs"] += 1
+                    else:
+                        stack.append(rel_path)
+                    continue
+
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+
+                # Files we'd never parse are not counted, nor stat'ed
+                if extensions and not entry.name.endswith(extensions) and \
+                        os.path.splitext(entry.name)[1].lower() not in FileWalker.BINARY_EXTENSIONS:
+                    continue
+
+                size = entry.stat().st_size
+                if rules.is_ignored(rel_path, False) or \
+                        FileWalker._skip_reason(entry.name, size, extensions, max_file_bytes):
+                    stats["skipped_files"] += 1
+                    stats["skipped_bytes"] += size
+                    continue
+
+                stats["files"] += 1
+                found.append(entry.path)
+
+        log.info(
+            f"Walked {root}: {stats['files']} files kept, {stats['skipped_files']} skipped "
+            f"({stats['skipped_bytes'] // 1024} KB), {stats['pruned_dirs']} directories pruned."
+        )
+        return found, stats
+
+    @staticmethod
+    def filter_paths(
+        root: str,
+        rel_paths: Iterable[str],
+        extensions: Optional[Tuple[str, ...]] = None,
+        extra_patterns: Optional[str] = None,
+        max_file_bytes: Optional[int] = None
+    ) -> List[str]:
+        """
+        Applies the same rules to an explicit list of repo-relative paths
+        (e.g. from `git diff`) without walking the tree.
+        Returns the absolute paths that should be parsed.
+        """
+        rules = FileWalker.build_rules(root, extra_patterns)
+        loaded_dirs = {""}
+        kept = []
+
+        for rel_path in rel_paths:
+            parts = rel_path.split("/")
+            if any(part in FileWalker.ALWAYS_SKIP_DIRS for part in parts[:-1]):
+                continue
+
+            # Load nested ignore files along the way and check each ancestor folder
+            ignored = False
+            for depth in range(1, len(parts)):
+                rel_dir = "/".join(parts[:depth])
+                if rules.is_ignored(rel_dir, True):
+                    ignored = True
+                    break
+                if rel_dir not in loaded_dirs:
+                    for name in FileWalker.IGNORE_FILES:
+                        rules.add_file(os.path.join(root, rel_dir, name), rel_dir)
+                    loaded_dirs.add(rel_dir)
+            if ignored or rules.is_ignored(rel_path, False):
+                continue
+
+            abs_path = os.path.join(root, rel_path)
+            try:
+                size = os.path.getsize(abs_path)
+            except OSError:
+                continue
+            if FileWalker._skip_reason(parts[-1], size, extensions, max_file_bytes):
+                continue
+            kept.append(abs_path)
+        return kept
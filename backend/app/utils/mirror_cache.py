@@ -0,0 +1,413 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from git import Repo
+from git.exc import GitCommandError, InvalidGitRepositoryError, NoSuchPathError
+
+try:
+    import fcntl
+except ImportError: # Windows: locks become no-ops (single worker only)
+    fcntl = None
+
+from app.config import settings
+from app.utils.logger import log
+
+class MirrorCache:
+    """
+    Keeps one bare mirror per git URL on local disk.
+
+    Why this?
+    Re-scanning the same projects every hour would otherwise download the
+    whole repository every time. With a mirror we only `fetch` what is new
+    and hand each scan a cheap `git worktree` that shares the mirror's objects.
+
+    Locking (per git URL, across worker processes on the same machine):
+    - an exclusive lock guards fetch and worktree bookkeeping
+    - a shared "lease" is held while a worktree is in use, so LRU
+      eviction never deletes a mirror that someone is scanning
+    - each worktree has its own exclusive lock, held by the process using
+      it. The OS drops it if that process dies, which is how maintenance
+      spots worktrees left behind by killed workers.
+
+    Mirror sizes are recorded after every fetch (`git count-objects`), so
+    eviction and stats never have to walk the cache.
+    """
+    METRICS_KEY = "ai_testgen:mirror_cache"
+
+    # worktree path -> (url key, lease file descriptor, worktree lock descriptor)
+    _leases: Dict[str, tuple] = {}
+    _local_metrics: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "stale_worktrees": 0}
+
+    @staticmethod
+    def url_key(git_url: str) -> str:
+        return hashlib.sha1(git_url.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _dir(name: str) -> str:
+        path = os.path.join(settings.REPO_CACHE_DIR, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def mirror_path(key: str) -> str:
+        return os.path.join(MirrorCache._dir("mirrors"), f"{key}.git")
+
+    @staticmethod
+    def _open_lock_file(key: str, kind: str) -> int:
+        lock_path = os.path.join(MirrorCache._dir("locks"), f"{key}.{kind}")
+        return os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    @staticmethod
+    def _flock(fd: int, operation: int) -> bool:
+        """Applies a flock, returning False if a non-blocking attempt failed."""
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(fd, operation)
+            return True
+        except BlockingIOError:
+            return False
+
+    @staticmethod
+    @contextmanager
+    def locked(key: str):
+        """Exclusive per-URL lock for anything that writes to a mirror."""
+        fd = MirrorCache._open_lock_file(key, "lock")
+        try:
+            MirrorCache._flock(fd, fcntl.LOCK_EX if fcntl else 0)
+            yield
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _record(metric: str):
+        """Counts a hit/miss/eviction locally and (best effort) in Redis."""
+        MirrorCache._local_metrics[metric] += 1
+        try:
+            import redis as sync_redis
+            r = sync_redis.from_url(settings.REDIS_URL)
+            r.hincrby(MirrorCache.METRICS_KEY, metric, 1)
+            r.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _update_mirror(git_url: str, mirror: str, partial: bool = False) -> Repo:
+        """
+        Fetches into an existing mirror, or creates it. Caller holds the lock.
+
+        Only a corrupt mirror is thrown away. If the fetch fails (remote down,
+        network blip) the mirror is kept and scanned as it is: deleting it
+        would force a full re-download, and other workers may still have
+        worktrees that use its objects.
+        """
+        if os.path.isdir(mirror):
+            try:
+                repo = Repo(mirror)
+            except (InvalidGitRepositoryError, NoSuchPathError) as e:
+                log.warning(f"Mirror at {mirror} is corrupt ({e}), re-creating it...")
+                shutil.rmtree(mirror, ignore_errors=True)
+            else:
+                try:
+                    log.info(f"Mirror cache hit for {git_url}, fetching new objects...")
+                    repo.git.fetch("--prune", "origin")
+                    MirrorCache._record("hits")
+                except GitCommandError as e:
+                    log.warning(f"Fetch failed for {git_url} ({e}), using the cached mirror as it is.")
+                    MirrorCache._record("stale")
+                return repo
+
+        log.info(f"Mirror cache miss for {git_url}, cloning into {mirror}...")
+        if partial:
+            # Blobless: commits and trees only, file contents are fetched on checkout
+            repo = Repo.clone_from(git_url, mirror, bare=True, filter="blob:none")
+            if not repo.git.config("--get", "remote.origin.promisor", with_exceptions=False):
+                log.info(f"{git_url} does not support partial clone, mirror holds full history.")
+            repo.git.config("core.sparseCheckout", "true")
+        else:
+            repo = Repo.clone_from(git_url, mirror, bare=True)
+        # Only branches: refs/pull/* and friends would bloat the mirror
+        repo.git.config("remote.origin.fetch", "+refs/heads/*:refs/heads/*")
+        MirrorCache._record("misses")
+        return repo
+
+    @staticmethod
+    def _add_worktree(repo: Repo, worktree: str, sha: str, sparse_patterns: Optional[List[str]]):
+        """
+        Adds a detached worktree. With `sparse_patterns`, only matching files
+        are checked out, so a blobless mirror downloads just those blobs.
+        """
+        if not sparse_patterns:
+            repo.git.worktree("add", "--detach", worktree, sha)
+            return
+
+        repo.git.worktree("add", "--no-checkout", "--detach", worktree, sha)
+        wt_repo = Repo(worktree)
+        sparse_file = wt_repo.git.rev_parse("--git-path", "info/sparse-checkout")
+        if not os.path.isabs(sparse_file):
+            sparse_file = os.path.join(worktree, sparse_file)
+        os.makedirs(os.path.dirname(sparse_file), exist_ok=True)
+        with open(sparse_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(sparse_patterns) + "\n")
+        # Enabled per command, so full mirrors can hand out sparse worktrees too
+        wt_repo.git.execute(["git", "-c", "core.sparseCheckout=true", "reset", "--hard", sha])
+
+    @staticmethod
+    def _size_file(key: str) -> str:
+        return os.path.join(MirrorCache._dir("sizes"), key)
+
+    @staticmethod
+    def _record_size(key: str, repo: Repo) -> int:
+        """Stores the mirror's object size. `count-objects` reads pack sizes, no walk."""
+        size_kb = 0
+        try:
+            for line in repo.git.count_objects("-v").splitlines():
+                name, _, value = line.partition(":")
+                if name in ("size", "size-pack", "size-garbage"):
+                    size_kb += int(value)
+        except Exception as e:
+            log.warning(f"Could not measure mirror {key}: {e}")
+            return 0
+        with open(MirrorCache._size_file(key), "w") as f:
+            f.write(str(size_kb * 1024))
+        return size_kb * 1024
+
+    @staticmethod
+    def _mirror_size(key: str) -> int:
+        try:
+            with open(MirrorCache._size_file(key)) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            # Mirror from before sizes were recorded: measure it once
+            mirror = MirrorCache.mirror_path(key)
+            try:
+                return MirrorCache._record_size(key, Repo(mirror))
+            except Exception:
+                return 0
+
+    @staticmethod
+    def mirror_key(git_url: str, partial: bool) -> str:
+        """Partial and full mirrors of the same URL are cached separately."""
+        return MirrorCache.url_key(git_url + ("#partial" if partial else ""))
+
+    @staticmethod
+    def checkout(
+        git_url: str,
+        sparse_patterns: Optional[List[str]] = None,
+        sha: Optional[str] = None,
+        partial: Optional[bool] = None
+    ) -> str:
+        """
+        Returns the path of a fresh worktree at the remote's latest commit
+        (or at `sha`, e.g. so every shard of a scan sees the same commit).
+        Call `release()` with that path once the scan is done.
+
+        With `sparse_patterns` the worktree only contains matching files.
+        `partial` (default: whether patterns were given) makes the mirror a
+        blobless partial clone, so only those files are ever downloaded.
+        """
+        if partial is None:
+            partial = bool(sparse_patterns)
+        key = MirrorCache.mirror_key(git_url, partial)
+        mirror = MirrorCache.mirror_path(key)
+        worktree = os.path.join(MirrorCache._dir("worktrees"), f"{key}-{uuid.uuid4().hex[:8]}")
+
+        # Take the lease first so eviction can't remove the mirror under us,
+        # and lock the worktree before it exists so maintenance leaves it alone
+        lease_fd = MirrorCache._open_lock_file(key, "lease")
+        MirrorCache._flock(lease_fd, fcntl.LOCK_SH if fcntl else 0)
+        wt_fd = MirrorCache._open_lock_file(os.path.basename(worktree), "worktree")
+        MirrorCache._flock(wt_fd, fcntl.LOCK_EX if fcntl else 0)
+        try:
+            with MirrorCache.locked(key):
+                repo = MirrorCache._update_mirror(git_url, mirror, partial=partial)
+                MirrorCache._record_size(key, repo)
+                repo.git.worktree("prune")
+                head_sha = sha or repo.git.rev_parse("HEAD")
+
+                try:
+                    MirrorCache._add_worktree(repo, worktree, head_sha, sparse_patterns)
+                except Exception:
+                    shutil.rmtree(worktree, ignore_errors=True)
+                    repo.git.worktree("prune")
+                    raise
+                os.utime(mirror) # Marks the mirror as recently used for LRU
+        except Exception:
+            os.close(lease_fd)
+            MirrorCache._drop_worktree_lock(os.path.basename(worktree), wt_fd)
+            raise
+
+        MirrorCache._leases[worktree] = (key, lease_fd, wt_fd)
+        MirrorCache.maintain()
+        return worktree
+
+    @staticmethod
+    def list_files(git_url: str, partial: bool = False) -> Tuple[str, List[str]]:
+        """
+        Returns (HEAD commit, every file path in it) straight from the mirror
+        with `git ls-tree`: no worktree, no file contents (a blobless mirror
+        already has all the trees it needs).
+        """
+        key = MirrorCache.mirror_key(git_url, partial)
+        mirror = MirrorCache.mirror_path(key)
+
+        lease_fd = MirrorCache._open_lock_file(key, "lease")
+        MirrorCache._flock(lease_fd, fcntl.LOCK_SH if fcntl else 0)
+        try:
+            with MirrorCache.locked(key):
+                repo = MirrorCache._update_mirror(git_url, mirror, partial=partial)
+                MirrorCache._record_size(key, repo)
+                os.utime(mirror)
+            head_sha = repo.git.rev_parse("HEAD")
+            output = repo.git.ls_tree("-r", "--name-only", "-z", head_sha)
+        finally:
+            os.close(lease_fd)
+        return head_sha, [path for path in output.split("\0") if path]
+
+    @staticmethod
+    def owns(path: str) -> bool:
+        return path in MirrorCache._leases
+
+    @staticmethod
+    def release(worktree: str):
+        """Removes a worktree and gives up its lease on the mirror."""
+        key, lease_fd, wt_fd = MirrorCache._leases.pop(worktree)
+        try:
+            MirrorCache._remove_worktree(key, worktree)
+        finally:
+            os.close(lease_fd)
+            MirrorCache._drop_worktree_lock(os.path.basename(worktree), wt_fd)
+
+    @staticmethod
+    def _remove_worktree(key: str, worktree: str):
+        try:
+            shutil.rmtree(worktree, ignore_errors=True)
+            with MirrorCache.locked(key):
+                mirror = MirrorCache.mirror_path(key)
+                if os.path.isdir(mirror):
+                    Repo(mirror).git.worktree("prune")
+        except Exception as e:
+            log.warning(f"Failed to prune worktree {worktree}: {e}")
+
+    @staticmethod
+    def _drop_worktree_lock(name: str, fd: int):
+        try:
+            os.unlink(os.path.join(MirrorCache._dir("locks"), f"{name}.worktree"))
+        except OSError:
+            pass
+        os.close(fd)
+
+    @staticmethod
+    def sweep_worktrees() -> int:
+        """
+        Deletes worktrees whose owner process is gone (OOM kill, time limit).
+        A live owner holds the worktree's lock, so if we can take it, nobody
+        is using the worktree. Returns how many were removed.
+        """
+        if fcntl is None:
+            return 0 # No locks to tell live worktrees from dead ones
+
+        removed = 0
+        worktrees_dir = MirrorCache._dir("worktrees")
+        for name in os.listdir(worktrees_dir):
+            fd = MirrorCache._open_lock_file(name, "worktree")
+            if not MirrorCache._flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB):
+                os.close(fd)
+                continue # In use
+            key = name.rsplit("-", 1)[0]
+            MirrorCache._remove_worktree(key, os.path.join(worktrees_dir, name))
+            MirrorCache._drop_worktree_lock(name, fd)
+            removed += 1
+            MirrorCache._record("stale_worktrees")
+            log.info(f"Removed stale worktree {name} left behind by a dead worker.")
+        return removed
+
+    @staticmethod
+    def maintain(force: bool = False):
+        """
+        Sweeps stale worktrees and evicts mirrors, at most once every
+        REPO_CACHE_MAINTENANCE_SECONDS per machine (unless `force`).
+        """
+        marker = os.path.join(settings.REPO_CACHE_DIR, "last_maintenance")
+        try:
+            if not force and time.time() - os.path.getmtime(marker) < settings.REPO_CACHE_MAINTENANCE_SECONDS:
+                return
+        except OSError:
+            pass # Never ran
+        with open(marker, "a"):
+            os.utime(marker)
+
+        try:
+            MirrorCache.sweep_worktrees()
+            MirrorCache.evict()
+        except Exception as e:
+            log.warning(f"Repo cache maintenance failed: {e}")
+
+    @staticmethod
+    def evict(max_bytes: Optional[int] = None) -> int:
+        """
+        Deletes least recently used mirrors until the cache fits in `max_bytes`.
+        Mirrors that currently have a worktree leased out are skipped.
+        Returns how many mirrors were removed.
+        """
+        if max_bytes is None:
+            max_bytes = settings.REPO_CACHE_MAX_MB * 1024 * 1024
+
+        mirrors_dir = MirrorCache._dir("mirrors")
+        entries = []
+        for name in os.listdir(mirrors_dir):
+            path = os.path.join(mirrors_dir, name)
+            entries.append((os.path.getmtime(path), MirrorCache._mirror_size(name[:-len(".git")]), name, path))
+
+        total = sum(size for _, size, _, _ in entries)
+        evicted = 0
+        for _, size, name, path in sorted(entries): # oldest first
+            if total <= max_bytes:
+                break
+            key = name[:-len(".git")]
+            lease_fd = MirrorCache._open_lock_file(key, "lease")
+            try:
+                if not MirrorCache._flock(lease_fd, (fcntl.LOCK_EX | fcntl.LOCK_NB) if fcntl else 0):
+                    continue # In use by a running scan
+                with MirrorCache.locked(key):
+                    shutil.rmtree(path, ignore_errors=True)
+                    try:
+                        os.unlink(MirrorCache._size_file(key))
+                    except OSError:
+                        pass
+                total -= size
+                evicted += 1
+                MirrorCache._record("evictions")
+                log.info(f"Evicted mirror {name} ({size // 1024} KB) from the repo cache.")
+            finally:
+                os.close(lease_fd)
+        return evicted
+
+    @staticmethod
+    def stats() -> dict:
+        """Hit/miss/eviction counters (fleet-wide via Redis when available) and disk usage."""
+        counters = dict(MirrorCache._local_metrics)
+        try:
+            import redis as sync_redis
+            r = sync_redis.from_url(settings.REDIS_URL)
+            shared = r.hgetall(MirrorCache.METRICS_KEY)
+            r.close()
+            counters = {k: int(shared.get(k.encode(), 0)) for k in counters}
+        except Exception:
+            pass
+
+        mirrors = os.listdir(MirrorCache._dir("mirrors"))
+        size = sum(MirrorCache._mirror_size(name[:-len(".git")]) for name in mirrors)
+        lookups = counters["hits"] + counters["misses"] + counters["stale"]
+        return {
+            **counters,
+            "hit_rate": round((counters["hits"] + counters["stale"]) / lookups * 100, 1) if lookups else 0.0,
+            "mirrors": len(mirrors),
+            "worktrees": len(os.listdir(MirrorCache._dir("worktrees"))),
+            "size_mb": round(size / (1024 * 1024), 1),
+            "max_size_mb": settings.REPO_CACHE_MAX_MB,
+        }
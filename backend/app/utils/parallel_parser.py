@@ -0,0 +1,103 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterable, Iterator, List
+
+from app.utils.route_parsers import RouteParsers
+from app.utils.logger import log
+
+
+def parse_chunk(file_paths: List[str]) -> List[Dict[str, str]]:
+    """
+    Parses a chunk of files and returns every endpoint found,
+    tagged with the file it came from.
+    Lives at module level so the process pool can pickle it.
+    """
+    endpoints = []
+    for file_path in file_paths:
+        for endpoint in RouteParsers.detect_endpoints(file_path):
+            endpoint["source_file"] = file_path
+            endpoints.append(endpoint)
+    return endpoints
+
+
+class ParallelParser:
+    """
+    Spreads route detection over a pool of worker processes.
+
+    Why this?
+    Reading and regex-parsing files is CPU bound, so threads would just
+    fight over the GIL. A process pool lets one scan use every core of
+    the worker machine, which matters for monorepos with 40k+ files.
+    """
+
+    @staticmethod
+    def resolve_workers(workers: int) -> int:
+        """Turns the SCAN_WORKERS setting into a real process count (0 = all cores)."""
+        if workers <= 0:
+            return os.cpu_count() or 1
+        return workers
+
+    @staticmethod
+    def chunk_paths(file_paths: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+        """Groups file paths so each pool task does a meaningful amount of work."""
+        chunk = []
+        for file_path in file_paths:
+            chunk.append(file_path)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def iter_serial(file_paths: Iterable[str], chunk_size: int) -> Iterator[List[Dict[str, str]]]:
+        """The original one-file-at-a-time loop, batched the same way as the parallel mode."""
+        for chunk in ParallelParser.chunk_paths(file_paths, chunk_size):
+            yield parse_chunk(chunk)
+
+    @staticmethod
+    def iter_parallel(file_paths: Iterable[str], workers: int, chunk_size: int) -> Iterator[List[Dict[str, str]]]:
+        """
+        Yields endpoint batches as soon as each chunk finishes parsing.
+
+        Only `workers * 2` chunks are in flight at once, so memory stays
+        bounded no matter how many files the repository has.
+        """
+        max_in_flight = workers * 2
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for chunk in ParallelParser.chunk_paths(file_paths, chunk_size):
+                pending.add(pool.submit(parse_chunk, chunk))
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    @staticmethod
+    def iter_endpoint_batches(
+        file_paths: List[str],
+        workers: int = 0,
+        chunk_size: int = 256,
+        min_files: int = 0
+    ) -> Iterator[List[Dict[str, str]]]:
+        """
+        Picks serial or parallel parsing and streams endpoint batches back.
+        Falls back to serial if the platform refuses to start a process pool.
+        """
+        workers = ParallelParser.resolve_workers(workers)
+        if workers <= 1 or len(file_paths) < max(min_files, chunk_size):
+            yield from ParallelParser.iter_serial(file_paths, chunk_size)
+            return
+
+        log.info(f"Parsing {len(file_paths)} files with {workers} processes...")
+        try:
+            yield from ParallelParser.iter_parallel(file_paths, workers, chunk_size)
+        except (OSError, AssertionError) as e:
+            # e.g. "daemonic processes are not allowed to have children"
+            log.warning(f"Process pool unavailable ({e}), falling back to serial parsing.")
+            yield from ParallelParser.iter_serial(file_paths, chunk_size)
@@ -0,0 +1,118 @@
+import os
+import json
+import sqlite3
+from typing import Dict, Iterable, List
+
+from app.config import settings
+from app.utils.route_parsers import RouteParsers
+from app.utils.logger import log
+
+class ParseCache:
+    """
+    Remembers which endpoints were found in a file, keyed by its git blob SHA.
+
+    Why this?
+    A blob SHA is a hash of the file's content, so an unchanged file (or the
+    same vendored file in another project) always has the same key. We can
+    return its endpoints without even opening the file.
+
+    The parser version and the format of the stored entries are part of the
+    key: bumping RouteParsers.VERSION or FORMAT makes every old entry a
+    miss, and old-version rows are purged on first use.
+
+    Storage is a local SQLite file (WAL mode), shared by all worker
+    processes on the same machine.
+    """
+    _initialized_for: set = set()
+    metrics: Dict[str, int] = {"hits": 0, "misses": 0}
+
+    # SQLite has a limit on bound parameters per statement
+    QUERY_BATCH = 500
+    FORMAT = "2" # Of the stored endpoints: 2 = [method, path, framework, line]
+
+    @staticmethod
+    def version() -> str:
+        return f"{RouteParsers.VERSION}.{ParseCache.FORMAT}"
+
+    @staticmethod
+    def _connect() -> sqlite3.Connection:
+        path = settings.PARSE_CACHE_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30)
+
+        if path not in ParseCache._initialized_for:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS parse_cache ("
+                " blob_sha TEXT NOT NULL,"
+                " parser_version TEXT NOT NULL,"
+                " endpoints TEXT NOT NULL,"
+                " PRIMARY KEY (blob_sha, parser_version))"
+            )
+            purged = conn.execute(
+                "DELETE FROM parse_cache WHERE parser_version != ?", (ParseCache.version(),)
+            ).rowcount
+            conn.commit()
+            if purged:
+                log.info(f"Purged {purged} parse cache entries from older parser versions.")
+            ParseCache._initialized_for.add(path)
+        return conn
+
+    @staticmethod
+    def get_many(blob_shas: Iterable[str]) -> Dict[str, List[Dict]]:
+        """
+        Looks up many blobs at once. Returns {blob_sha: endpoints} for hits only.
+        """
+        shas = list(set(blob_shas))
+        found = {}
+        if not shas:
+            return found
+
+        conn = ParseCache._connect()
+        try:
+            for i in range(0, len(shas), ParseCache.QUERY_BATCH):
+                batch = shas[i:i + ParseCache.QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT blob_sha, endpoints FROM parse_cache "
+                    f"WHERE parser_version = ? AND blob_sha IN ({placeholders})",
+                    (ParseCache.version(), *batch)
+                ).fetchall()
+                for blob_sha, endpoints in rows:
+                    found[blob_sha] = [
+                        {"method": method, "path": path, "framework": framework, "line": line}
+                        for method, path, framework, line in json.loads(endpoints)
+                    ]
+        finally:
+            conn.close()
+
+        ParseCache.metrics["hits"] += len(found)
+        ParseCache.metrics["misses"] += len(shas) - len(found)
+        return found
+
+    @staticmethod
+    def put_many(results: Dict[str, List[Dict]]):
+        """
+        Stores {blob_sha: endpoints}. Empty lists are stored too, so files
+        without routes are never parsed twice either.
+        """
+        if not results:
+            return
+
+        rows = [
+            (
+                blob_sha,
+                ParseCache.version(),
+                json.dumps([[ep["method"], ep["path"], ep["framework"], ep.get("line")] for ep in endpoints])
+            )
+            for blob_sha, endpoints in results.items()
+        ]
+        conn = ParseCache._connect()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO parse_cache (blob_sha, parser_version, endpoints) VALUES (?, ?, ?)",
+                rows
+            )
+            conn.commit()
+        finally:
+            conn.close()
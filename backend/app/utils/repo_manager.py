@@ -1,8 +1,12 @@
 import os
 import shutil
 import tempfile
-from git import Repo
+from git import Repo, Git
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from app.utils.mirror_cache import MirrorCache
+from app.utils.route_parsers import RouteParsers
+from app.utils.file_walker import FileWalker
 from app.utils.logger import log
 
 class RepoManager:
@@ -42,3 +46,161 @@ class RepoManager:
             # We use ignore_errors=True because sometimes git files 
             # are tricky to delete on Windows.
             shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def _escape_pattern(name: str) -> str:
+        """Escapes a folder name for use in a gitignore-style sparse pattern."""
+        escaped = "".join("\\" + c if c in "*?[\\" else c for c in name)
+        return "\\" + escaped if escaped[:1] in ("!", "#") else escaped
+
+    @staticmethod
+    def sparse_patterns(subtrees: Optional[List[str]] = None) -> List[str]:
+        """
+        Sparse checkout patterns for the files the scanner actually reads:
+        every extension the parsers understand, plus ignore files.
+
+        With `subtrees` (scan shards), only files under those top-level
+        folders are matched ("" = files directly in the root). Root ignore
+        files are always included, the walker applies them everywhere.
+        """
+        files = [f"*{ext}" for ext in RouteParsers.SUPPORTED_EXTENSIONS] + list(FileWalker.IGNORE_FILES)
+        if subtrees is None:
+            return files
+
+        patterns = [f"/{name}" for name in FileWalker.IGNORE_FILES]
+        for subtree in subtrees:
+            if subtree:
+                folder = RepoManager._escape_pattern(subtree)
+                patterns += [f"/{folder}/**/{name}" for name in files]
+            else:
+                patterns += [f"/*{ext}" for ext in RouteParsers.SUPPORTED_EXTENSIONS]
+        return patterns
+
+    @staticmethod
+    def checkout_repo(
+        git_url: str,
+        partial: bool = False,
+        sha: Optional[str] = None,
+        subtrees: Optional[List[str]] = None
+    ) -> str:
+        """
+        Returns a working copy of the repository's latest commit (or of `sha`).
+
+        Normally this is a worktree backed by the on-disk MirrorCache, so only
+        new objects are downloaded. With `partial`, the mirror is a blobless
+        clone and only source files are checked out (and downloaded).
+        With `subtrees`, only source files under those top-level folders are
+        checked out (in either mode).
+        Falls back to a full mirror, then to a plain temporary clone.
+        Either way, hand the path to `release_repo()`.
+        """
+        if partial:
+            try:
+                return MirrorCache.checkout(git_url, sparse_patterns=RepoManager.sparse_patterns(subtrees), sha=sha, partial=True)
+            except Exception as e:
+                log.warning(f"Partial clone failed for {git_url} ({e}), retrying with a full mirror.")
+
+        try:
+            sparse = RepoManager.sparse_patterns(subtrees) if subtrees is not None else None
+            return MirrorCache.checkout(git_url, sparse_patterns=sparse, sha=sha, partial=False)
+        except Exception as e:
+            log.warning(f"Mirror cache unavailable for {git_url} ({e}), using a temporary clone.")
+            temp_dir = RepoManager.clone_repo(git_url)
+            if sha and RepoManager.head_sha(temp_dir) != sha:
+                try:
+                    repo = Repo(temp_dir)
+                    repo.git.fetch("--depth=1", "origin", sha)
+                    repo.git.checkout("--detach", sha)
+                except Exception:
+                    RepoManager.cleanup_repo(temp_dir)
+                    raise
+            return temp_dir
+
+    @staticmethod
+    def list_files(git_url: str, partial: bool = False) -> Tuple[str, List[str]]:
+        """
+        Returns (latest commit, every file path in it) without checking
+        anything out. Falls back to a full mirror like `checkout_repo()`.
+        """
+        if partial:
+            try:
+                return MirrorCache.list_files(git_url, partial=True)
+            except Exception as e:
+                log.warning(f"Partial clone failed for {git_url} ({e}), retrying with a full mirror.")
+        return MirrorCache.list_files(git_url, partial=False)
+
+    @staticmethod
+    def release_repo(path: str):
+        """
+        Gives back a working copy obtained from `checkout_repo()`.
+        """
+        if MirrorCache.owns(path):
+            MirrorCache.release(path)
+        else:
+            RepoManager.cleanup_repo(path)
+
+    @staticmethod
+    def remote_head_sha(git_url: str) -> Optional[str]:
+        """
+        Asks the remote which commit its default branch (HEAD) points to.
+        One `git ls-remote` round trip: no clone, no objects downloaded.
+        """
+        output = Git().ls_remote(git_url, "HEAD")
+        for line in output.splitlines():
+            sha, ref = line.split("\t", 1)
+            if ref == "HEAD":
+                return sha
+        return None
+
+    @staticmethod
+    def head_sha(path: str) -> str:
+        """Returns the commit SHA currently checked out at `path`."""
+        return Repo(path).head.commit.hexsha
+
+    @staticmethod
+    def blob_shas(path: str) -> Dict[str, str]:
+        """
+        Maps every tracked file (repo-relative path) to its git blob SHA.
+        One `git ls-files -s` call, no file is opened.
+        """
+        output = Repo(path).git.ls_files("-s", "-z")
+        shas = {}
+        for entry in output.split("\0"):
+            if not entry:
+                continue
+            meta, file_path = entry.split("\t", 1)
+            shas[file_path] = meta.split()[1]
+        return shas
+
+    @staticmethod
+    def changed_files(path: str, old_sha: str, new_sha: str) -> Optional[Dict[str, List[str]]]:
+        """
+        Lists files touched between two commits using `git diff --name-status`.
+
+        Returns {"added": [...], "modified": [...], "deleted": [...]} with
+        repo-relative paths (a rename shows up as delete + add), or None when
+        the old commit is not in the mirror (e.g. force-pushed away or a
+        temporary clone was used) and a full scan is needed.
+        """
+        repo = Repo(path)
+        try:
+            repo.git.cat_file("-e", f"{old_sha}^{{commit}}")
+        except Exception:
+            log.info(f"Commit {old_sha} not available locally, falling back to a full scan.")
+            return None
+
+        # --no-renames: rename detection would download blobs in partial clones
+        # -z: paths come out raw instead of C-quoted (non-ASCII, tabs, quotes)
+        output = repo.git.diff("--name-status", "--no-renames", "-z", old_sha, new_sha)
+        changes = {"added": [], "modified": [], "deleted": []}
+        fields = output.split("\0")
+        for status, file_path in zip(fields[0::2], fields[1::2]):
+            status = status.strip()[:1]
+            if status == "A":
+                changes["added"].append(file_path)
+            elif status == "D":
+                changes["deleted"].append(file_path)
+            elif status:
+                # M (modified), T (type change) and anything else: re-parse it
+                changes["modified"].append(file_path)
+        return changes
@@ -0,0 +1,339 @@
+import os
+import math
+import shutil
+import atexit
+import time
+import signal
+import asyncio
+import inspect
+import tempfile
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
+
+from app.utils.logger import log
+
+# (test case id, test code) pairs, as handed to the pool
+Case = Tuple[str, str]
+
+# Where the tests' HTTP calls go (None = wherever the test says)
+_BASE_URL: Optional[httpx.URL] = None
+_PATCHED = False
+
+
+# Environment variables test processes keep: everything else (DATABASE_URL,
+# API keys, ...) belongs to the worker, not to the tests it runs
+_KEPT_ENV = ("PATH", "HOME", "LANG", "LC_ALL", "TZ", "TMPDIR", "TEMP", "TMP", "SYSTEMROOT",
+             "SSL_CERT_FILE", "SSL_CERT_DIR", "HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY",
+             "http_proxy", "https_proxy", "no_proxy")
+
+
+class TestTimeout(Exception):
+    """Raised inside a test that ran past its time limit."""
+
+
+class ExecutorUnavailable(RuntimeError):
+    """No test process could be started: tests are never run in the caller's process."""
+
+
+def _redirect(request: httpx.Request):
+    """Points an absolute request URL at the project's API (keeping its base path)."""
+    base = _BASE_URL
+    if base is None:
+        return
+    prefix = base.raw_path.rstrip(b"/")
+    request.url = request.url.copy_with(
+        scheme=base.scheme, host=base.host, port=base.port, raw_path=prefix + request.url.raw_path
+    )
+    request.headers["Host"] = base.netloc.decode("ascii")
+
+
+def _reuse_ssl_contexts():
+    """
+    Generated tests open a new client per call (`httpx.get(...)`), and
+    each client builds an SSL context from the CA bundle: ~40ms, far more
+    than the request itself against a local API. Contexts are immutable
+    once built, so clients with the same settings can share one.
+    """
+    from httpx._transports import default
+    create_ssl_context = getattr(default, "create_ssl_context", None)
+    if create_ssl_context is None:
+        return # Not this httpx version's layout: every client builds its own
+    contexts = {}
+
+    def cached_ssl_context(cert=None, verify=True, trust_env=True, http2=False):
+        key = (cert, verify, trust_env, http2, os.environ.get("SSL_CERT_FILE"), os.environ.get("SSL_CERT_DIR"))
+        try:
+            context = contexts.get(key)
+        except TypeError: # Unhashable settings
+            return create_ssl_context(cert=cert, verify=verify, trust_env=trust_env, http2=http2)
+        if context is None:
+            context = contexts[key] = create_ssl_context(cert=cert, verify=verify, trust_env=trust_env, http2=http2)
+        return context
+
+    default.create_ssl_context = cached_ssl_context
+
+
+def _patch_httpx():
+    """
+    Generated tests hardcode a host (usually localhost:8000). Every request
+    they send, with any client, goes through an httpx transport: rewriting
+    the URL there sends it to the project's `api_base_url` instead.
+    """
+    global _PATCHED
+    if _PATCHED:
+        return
+    _reuse_ssl_contexts()
+    handle_request = httpx.HTTPTransport.handle_request
+    handle_async_request = httpx.AsyncHTTPTransport.handle_async_request
+
+    def patched_request(self, request):
+        _redirect(request)
+        return handle_request(self, request)
+
+    async def patched_async_request(self, request):
+        _redirect(request)
+        return await handle_async_request(self, request)
+
+    httpx.HTTPTransport.handle_request = patched_request
+    httpx.AsyncHTTPTransport.handle_async_request = patched_async_request
+    _PATCHED = True
+
+
+def _isolate():
+    """
+    Initializer of every test process: drops the worker's environment
+    variables and moves to an empty directory (no `.env`, no source tree
+    to import settings from). The filesystem and network are not
+    sandboxed: run the execution workers in a container for that.
+    """
+    for name in list(os.environ):
+        if name not in _KEPT_ENV:
+            del os.environ[name]
+    workdir = tempfile.mkdtemp(prefix="ai_testgen_run_")
+    atexit.register(shutil.rmtree, workdir, True)
+    os.chdir(workdir)
+
+
+def _raise_timeout(signum, frame):
+    raise TestTimeout()
+
+
+def _collect(namespace: Dict) -> List:
+    """pytest-style discovery: `test_*` functions and `Test*` classes' `test_*` methods."""
+    tests = []
+    for name, value in list(namespace.items()):
+        if name.startswith("test") and inspect.isfunction(value):
+            tests.append(value)
+        elif name.startswith("Test") and inspect.isclass(value):
+            instance = value()
+            tests.extend(
+                getattr(instance, attr) for attr in dir(value)
+                if attr.startswith("test") and callable(getattr(instance, attr))
+            )
+    return tests
+
+
+def _call(test):
+    missing = [
+        name for name, param in inspect.signature(test).parameters.items()
+        if param.default is inspect.Parameter.empty and param.kind not in (param.VAR_POSITIONAL, param.VAR_KEYWORD)
+    ]
+    if missing:
+        raise TypeError(f"{test.__name__} needs pytest fixtures ({', '.join(missing)}), which the runner doesn't provide")
+    result = test()
+    if inspect.iscoroutine(result):
+        asyncio.run(result)
+
+
+def run_case(test_code: str, timeout: float, max_error_chars: int = 2000) -> Dict:
+    """
+    Runs one test case: compiles the code in a fresh namespace and calls
+    every test it defines. Returns {"status", "duration_ms", "error"}:
+    PASSED, FAILED (an assertion failed), SKIPPED (pytest.skip), TIMEOUT
+    or ERROR (anything else, including code that doesn't compile).
+
+    The time limit is a SIGALRM, so it only applies on a main thread.
+    """
+    use_alarm = timeout > 0 and threading.current_thread() is threading.main_thread() and hasattr(signal, "setitimer")
+    status, error = "PASSED", None
+    start = time.perf_counter()
+    previous = signal.signal(signal.SIGALRM, _raise_timeout) if use_alarm else None
+    try:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        namespace = {"__name__": "generated_test"}
+        exec(compile(test_code, "<test case>", "exec"), namespace)
+        tests = _collect(namespace)
+        if not tests:
+            raise LookupError("no test_* function found in the test code")
+        for test in tests:
+            _call(test)
+    except TestTimeout:
+        status, error = "TIMEOUT", f"Still running after {timeout:g}s"
+    except AssertionError:
+        status, error = "FAILED", traceback.format_exc()
+    except BaseException as e:
+        # pytest.skip() raises a BaseException named Skipped
+        if type(e).__name__ == "Skipped":
+            status, error = "SKIPPED", str(e) or None
+        elif isinstance(e, KeyboardInterrupt):
+            raise
+        else:
+            status, error = "ERROR", traceback.format_exc()
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    if error and len(error) > max_error_chars:
+        error = "..." + error[-max_error_chars:] # The end of a traceback is what matters
+    return {"status": status, "duration_ms": int((time.perf_counter() - start) * 1000), "error": error}
+
+
+def run_chunk(cases: List[Case], base_url: Optional[str], timeout: float, max_error_chars: int = 2000) -> List[Dict]:
+    """
+    Runs a chunk of test cases in this (test) process, one after the
+    other. Lives at module level so the process pool can pickle it.
+    """
+    global _BASE_URL
+    _patch_httpx()
+    _BASE_URL = httpx.URL(base_url) if base_url else None
+    results = []
+    try:
+        for test_case_id, test_code in cases:
+            try:
+                result = run_case(test_code, timeout, max_error_chars)
+            except TestTimeout:
+                # The alarm went off just as the test finished
+                result = {"status": "TIMEOUT", "duration_ms": int(timeout * 1000), "error": f"Still running after {timeout:g}s"}
+            results.append({"test_case_id": test_case_id, **result})
+    finally:
+        _BASE_URL = None
+    return results
+
+
+class TestExecutor:
+    """
+    Runs generated tests in a pool of worker processes.
+
+    Why this?
+    Test code is untrusted and can hang, crash or leave state behind
+    (globals, env vars, monkeypatches). It never runs in the caller's
+    process: always in spawned test processes without the worker's
+    environment (see `_isolate`), even a single one for a small run. Each
+    process runs one chunk at a time, each test in a fresh namespace with
+    its own time limit, and is replaced after `max_tasks_per_child` chunks
+    so leaked state doesn't pile up. Tests mostly wait on HTTP, so a pool
+    keeps many in flight even on few cores.
+
+    Celery's prefork children are daemonic and can't start processes: run
+    the execution workers with `--pool threads` or `--pool solo` (the pool
+    inside does the parallelism). Otherwise runs fail with
+    ExecutorUnavailable.
+    """
+
+    @staticmethod
+    def chunk_cases(cases: Iterable[Case], chunk_size: int) -> Iterator[List[Case]]:
+        chunk = []
+        for case in cases:
+            chunk.append(case)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def crashed(chunk: List[Case]) -> List[Dict]:
+        error = "The worker process running this chunk died (crash, os._exit or out of memory)"
+        return [{"test_case_id": test_case_id, "status": "ERROR", "duration_ms": 0, "error": error} for test_case_id, _ in chunk]
+
+    @staticmethod
+    def iter_parallel(
+        cases: List[Case],
+        base_url: Optional[str],
+        timeout: float,
+        workers: int,
+        chunk_size: int,
+        max_tasks_per_child: int,
+        max_error_chars: int = 2000
+    ) -> Iterator[List[Dict]]:
+        """
+        Yields result batches as chunks finish, with at most `workers * 2`
+        chunks in flight. A process that dies breaks its whole pool: the
+        chunks in flight are reported as ERROR and a new pool takes the rest.
+        """
+        max_in_flight = workers * 2
+        chunks = TestExecutor.chunk_cases(cases, chunk_size)
+        chunk = next(chunks, None)
+        while chunk is not None:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                # Fresh interpreters: nothing inherited from the worker's state
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_isolate,
+                max_tasks_per_child=max_tasks_per_child or None,
+            )
+            with pool:
+                pending = {}
+                broken = False
+                while not broken and (chunk is not None or pending):
+                    if chunk is not None and len(pending) < max_in_flight:
+                        try:
+                            pending[pool.submit(run_chunk, chunk, base_url, timeout, max_error_chars)] = chunk
+                            chunk = next(chunks, None)
+                            continue
+                        except BrokenProcessPool:
+                            broken = True
+                            break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            batch = future.result()
+                        except BrokenProcessPool:
+                            broken = True
+                            batch = TestExecutor.crashed(pending[future])
+                        del pending[future]
+                        yield batch
+                for future, lost in pending.items():
+                    yield TestExecutor.crashed(lost)
+            if broken:
+                log.warning("A test process died, starting a new pool for the remaining tests.")
+
+    @staticmethod
+    def iter_results(
+        cases: List[Case],
+        base_url: Optional[str],
+        timeout: float,
+        workers: int = 0,
+        chunk_size: int = 10,
+        max_tasks_per_child: int = 50,
+        max_error_chars: int = 2000
+    ) -> Iterator[List[Dict]]:
+        """
+        Runs `cases` in test processes and streams back batches of results,
+        each one {"test_case_id", "status", "duration_ms", "error"}.
+
+        Raises ExecutorUnavailable when no test process can be started:
+        running the tests here instead would hand them the worker.
+        """
+        if not cases:
+            return
+        workers = workers if workers > 0 else (os.cpu_count() or 1)
+        workers = min(workers, math.ceil(len(cases) / chunk_size))
+
+        log.info(f"Running {len(cases)} tests with {workers} processes...")
+        try:
+            yield from TestExecutor.iter_parallel(
+                cases, base_url, timeout, workers, chunk_size, max_tasks_per_child, max_error_chars
+            )
+        except (OSError, AssertionError) as e:
+            # e.g. "daemonic processes are not allowed to have children"
+            raise ExecutorUnavailable(
+                f"Could not start test processes ({e}). Run the worker with --pool threads or --pool solo."
+            ) from e
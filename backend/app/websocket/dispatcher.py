@@ -1,5 +1,6 @@
 import json
 import asyncio
+from typing import Dict, Optional, Tuple
 import redis.asyncio as redis
 from app.config import settings
 from app.websocket.manager import manager
@@ -51,6 +52,78 @@ class EventDispatcher:
             await pubsub.unsubscribe(EventDispatcher.CHANNEL)
             await r.close()
 
+class PreviewPublisher:
+    """
+    Publishes live previews from inside a job's event loop without
+    blocking it.
+
+    Why this?
+    `emit_event` opens a Redis connection and publishes synchronously.
+    That's fine for progress events, but previews arrive several times a
+    second per stream, and every blocking publish stalls all the AI calls
+    sharing the loop. Previews are sent by a background task over one
+    async Redis client instead, and only the latest preview of each key
+    (endpoint) waits: when Redis is slower than the streams, older
+    previews are dropped instead of queued.
+    """
+
+    def __init__(self, channel: str = EventDispatcher.CHANNEL):
+        self.channel = channel
+        self.sent = 0
+        self.dropped = 0
+        self._client = None
+        self._pending: Dict[str, Tuple[str, dict]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def offer(self, project_id: str, key: str, event_data: dict):
+        """
+        Queues a preview and returns right away. Must be called from the
+        running event loop. Replaces the preview of `key` not sent yet.
+        """
+        if key in self._pending:
+            self.dropped += 1
+        elif len(self._pending) >= max(1, settings.STREAM_PREVIEW_MAX_PENDING):
+            self.dropped += 1
+            return
+        self._pending[key] = (project_id, event_data)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self):
+        while self._pending:
+            key = next(iter(self._pending))
+            project_id, event_data = self._pending.pop(key)
+            try:
+                if self._client is None:
+                    self._client = redis.from_url(
+                        settings.REDIS_URL,
+                        socket_timeout=settings.STREAM_PREVIEW_PUBLISH_TIMEOUT,
+                        socket_connect_timeout=settings.STREAM_PREVIEW_PUBLISH_TIMEOUT
+                    )
+                await self._client.publish(self.channel, json.dumps({"project_id": project_id, "data": event_data}))
+                self.sent += 1
+            except Exception as e:
+                # Previews are best effort: don't retry what's waiting either
+                self.dropped += 1 + len(self._pending)
+                self._pending.clear()
+                log.debug(f"Dropped generation previews: {e}")
+
+    async def close(self):
+        """Drops the previews not sent yet and closes the Redis client."""
+        self._pending.clear()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._client is not None:
+            try:
+                await self._client.close()
+            except Exception as e:
+                log.debug(f"Could not close the preview Redis client: {e}")
+            self._client = None
+
 # Global sync-compatible publisher for Celery
 def emit_event(project_id: str, event_data: dict):
     """
@@ -12,7 +12,7 @@ celery_app = Celery(
     "ai_testgen_workers",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
-    include=["app.workers.scan_job", "app.workers.generation_job", "app.workers.healing_job"] # List of files where tasks live
+    include=["app.workers.scan_job", "app.workers.generation_job", "app.workers.healing_job", "app.workers.test_run_job"] # List of files where tasks live
 )
 
 # Optional configuration: how long to keep results, etc.
@@ -24,3 +24,7 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
 )
+
+# Workers never import the API routes, so every model is loaded here:
+# SQLAlchemy needs all of them to resolve relationships (Project.owner -> User).
+from app.domain.models import user, api_key, project, endpoint, endpoint_source, test_case, test_run, test_result, generation_job, llm_call, endpoint_history # noqa: F401
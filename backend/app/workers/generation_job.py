@@ -1,69 +1,207 @@
 import asyncio
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
+from app.ai.telemetry import LLMTelemetry
+from app.config import settings
 from app.workers.celery_app import celery_app
 from app.services.test_generator_service import TestGeneratorService
 from app.db.session import async_session_maker
-from app.domain.models.test_case import TestCase
+from app.services.generation_job_service import GenerationJobService
+from app.services.test_case_writer import BufferedTestCaseWriter
 from app.utils.logger import log
-from app.websocket.dispatcher import emit_event
+from app.websocket.dispatcher import emit_event, PreviewPublisher
 
 @celery_app.task(bind=True, name="app.workers.generation_job.batch_generate_tests")
-def batch_generate_tests(self, project_id: str, endpoint_ids: List[str]):
-    log.info(f"Starting background generation for {len(endpoint_ids)} endpoints.")
+def batch_generate_tests(
+    self,
+    project_id: str,
+    endpoint_ids: List[str],
+    use_cache: bool = True,
+    stream_preview: bool = False,
+    job_id: Optional[str] = None,
+):
+    """
+    Generates tests for a GenerationJob (see GenerationJobService).
+
+    The job id is also this task's id. Every run, including Celery
+    retries and redeliveries, only works on the endpoints not DONE yet,
+    so nothing is generated (or billed) twice.
+    """
+    job_uuid = UUID(job_id or self.request.id)
+    log.info(f"Starting background generation job {job_uuid} for {len(endpoint_ids)} endpoints.")
     
     # Emit Start Event
     emit_event(project_id, {"event": "GENERATION_PROGRESS", "percentage": 0, "message": "Initializing AI brain..."})
     
     async def execute():
-        success_count = 0
-        total = len(endpoint_ids)
-        
+        # 0. Pick up where the previous attempt stopped
         async with async_session_maker() as db:
-            for index, ep_id_str in enumerate(endpoint_ids):
+            if job_id is None:
+                await GenerationJobService.ensure(db, job_uuid, UUID(project_id), endpoint_ids)
+            pending, already_done, total = await GenerationJobService.start(db, job_uuid)
+        if already_done:
+            log.info(f"Job {job_uuid}: {already_done}/{total} endpoints already done, skipping them.")
+
+        valid_ids = []
+        for ep_id_str in pending:
+            try:
+                valid_ids.append(UUID(ep_id_str))
+            except (ValueError, TypeError, AttributeError):
+                pass # Reported per item below
+
+        # 1. Load every endpoint's context up front, then let the session go:
+        # no connection is held while we wait on the AI.
+        async with async_session_maker() as db:
+            contexts = await TestGeneratorService.load_contexts(db, valid_ids) if valid_ids else {}
+
+        # 2. Pack endpoints into batched prompts (GENERATION_BATCH_MAX per call)
+        # and run the calls concurrently, at most GENERATION_CONCURRENCY in flight
+        semaphore = asyncio.Semaphore(max(1, settings.GENERATION_CONCURRENCY))
+        publisher = PreviewPublisher() if stream_preview else None
+
+        def previewer(batch: List[UUID]):
+            """
+            Live preview: pushes the test code to the project's WebSocket as
+            the AI writes it (throttled by LLMRunner, published without
+            blocking the loop by PreviewPublisher). Single-endpoint answers
+            have no key, batched ones name each item by its label in the prompt.
+            """
+            if publisher is None:
+                return None
+            labels = TestGeneratorService.batch_labels(batch)
+
+            def on_partial(key, test_code):
+                if len(batch) == 1:
+                    endpoint_id = str(batch[0])
+                elif key in labels:
+                    endpoint_id = str(labels[key])
+                else:
+                    return
+                publisher.offer(project_id, endpoint_id, {"event": "GENERATION_PREVIEW", "endpoint_id": endpoint_id, "test_code": test_code})
+            return on_partial
+
+        async def generate_one(ep_id: UUID):
+            async with semaphore:
+                try:
+                    return str(ep_id), await TestGeneratorService.generate_from_context(
+                        contexts[ep_id], use_cache=use_cache, on_partial=previewer([ep_id])
+                    ), None
+                except Exception as e:
+                    return str(ep_id), None, e
+
+        async def generate_batch(batch: List[UUID]):
+            if len(batch) == 1:
+                return [await generate_one(batch[0])]
+
+            async with semaphore:
                 try:
-                    ep_id = UUID(ep_id_str)
-                    
-                    # Update Progress
-                    percent = int(((index) / total) * 100)
-                    emit_event(project_id, {
-                        "event": "GENERATION_PROGRESS", 
-                        "percentage": percent, 
-                        "message": f"Generating test {index + 1}/{total}..."
-                    })
-                    
-                    # 1. Generate text via AI
-                    ai_data = await TestGeneratorService.generate_single_test(db, ep_id)
-                    
-                    # 2. Save to database
-                    test_case = TestCase(
-                        endpoint_id=ep_id,
-                        description=ai_data["description"],
-                        priority=ai_data["priority"],
-                        test_code=ai_data["test_code"],
-                        status="DRAFT"
+                    results = await TestGeneratorService.generate_batch(
+                        {ep_id: contexts[ep_id] for ep_id in batch}, use_cache=use_cache, on_partial=previewer(batch)
                     )
-                    db.add(test_case)
-                    await db.commit()
-                    success_count += 1
-                    
                 except Exception as e:
-                    log.error(f"Failed to generate test for {ep_id_str}: {e}")
+                    log.warning(f"Batched generation of {len(batch)} endpoints failed, retrying them one by one: {e}")
+                    results = {}
+
+            # Only the endpoints the batch didn't answer are retried, each on its own
+            retried = await asyncio.gather(*[generate_one(ep_id) for ep_id in batch if ep_id not in results])
+            return [(str(ep_id), data, None) for ep_id, data in results.items()] + list(retried)
+
+        tasks = [
+            asyncio.create_task(generate_batch(batch))
+            for batch in TestGeneratorService.plan_batches(contexts)
+        ]
+
+        # Endpoints that can't be generated at all are reported right away
+        unknown = []
+        for ep_id_str in pending:
+            try:
+                if UUID(ep_id_str) in contexts:
                     continue
-                    
+            except (ValueError, TypeError, AttributeError):
+                pass
+            unknown.append((ep_id_str, None, ValueError("Endpoint not found.")))
+
+        # Items are stored under the id as it was submitted
+        submitted = {}
+        for ep_id_str in pending:
+            try:
+                submitted.setdefault(str(UUID(ep_id_str)), ep_id_str)
+            except (ValueError, TypeError, AttributeError):
+                pass
+
+        # 3. Hand each batch to the buffered writer as soon as its calls
+        # finish: tests are written in bulk, each together with its item's
+        # DONE mark (see BufferedTestCaseWriter).
+        writer = BufferedTestCaseWriter(job_uuid)
+        done = already_done
+
+        async def save_and_report(items):
+            nonlocal done
+            generated = {submitted.get(ep_id_str, ep_id_str): ai_data for ep_id_str, ai_data, error in items if error is None}
+            failed = {submitted.get(ep_id_str, ep_id_str): str(error) for ep_id_str, _, error in items if error is not None}
+            for ep_id_str, error in failed.items():
+                log.error(f"Failed to generate test for {ep_id_str}: {error}")
+
+            await writer.add(generated, failed)
+
+            done += len(items)
+            emit_event(project_id, {
+                "event": "GENERATION_PROGRESS",
+                "percentage": int(done / total * 100),
+                "message": f"Generated {done}/{total} tests..."
+            })
+
+        try:
+            if unknown:
+                await save_and_report(unknown)
+            for next_done in asyncio.as_completed(tasks):
+                await save_and_report(await next_done)
+            success_count = await writer.close()
+        except BaseException:
+            # Keep what was already generated before failing; whatever can't
+            # be written is generated again by the retry
+            try:
+                await writer.close()
+            except Exception as flush_error:
+                log.error(f"Could not save buffered tests of job {job_uuid}: {flush_error}")
+            raise
+        finally:
+            # Don't leave AI calls running if saving failed
+            for task in tasks:
+                task.cancel()
+            if publisher is not None:
+                await publisher.close()
+                log.debug(f"Job {job_uuid}: {publisher.sent} previews sent, {publisher.dropped} dropped.")
+
+        async with async_session_maker() as db:
+            await GenerationJobService.finish(db, job_uuid, "COMPLETED")
         return success_count
 
+    async def mark_failed(error: str):
+        async with async_session_maker() as db:
+            await GenerationJobService.finish(db, job_uuid, "FAILED", error)
+
+    loop = asyncio.get_event_loop()
     try:
-        loop = asyncio.get_event_loop()
         count = loop.run_until_complete(execute())
         
         emit_event(project_id, {"event": "GENERATION_PROGRESS", "percentage": 100, "message": "Generation complete!"})
-        emit_event(project_id, {"event": "JOB_COMPLETED", "job_type": "generation", "count": count})
+        emit_event(project_id, {"event": "JOB_COMPLETED", "job_type": "generation", "job_id": str(job_uuid), "count": count})
         
         log.info(f"Batch generation finished! Created {count} tests.")
-        return {"status": "SUCCESS", "tests_generated": count}
+        return {"status": "SUCCESS", "job_id": str(job_uuid), "tests_generated": count}
     except Exception as e:
         emit_event(project_id, {"event": "GENERATION_PROGRESS", "percentage": 0, "message": f"Generation failed: {str(e)}"})
         log.error(f"Batch generation failed: {e}")
+        if self.request.retries >= self.max_retries:
+            try:
+                loop.run_until_complete(mark_failed(str(e)))
+            except Exception as mark_error:
+                log.error(f"Could not mark generation job {job_uuid} as failed: {mark_error}")
+            raise
+        # The retry resumes: items already DONE are skipped
         raise self.retry(exc=e, countdown=30)
+    finally:
+        # Write this job's LLM call records now rather than with the next job's
+        loop.run_until_complete(LLMTelemetry.flush())
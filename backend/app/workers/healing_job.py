@@ -1,5 +1,8 @@
 import asyncio
+from typing import List, Optional
 from uuid import UUID
+from app.ai.telemetry import LLMTelemetry
+from app.config import settings
 from app.workers.celery_app import celery_app
 from app.services.self_healing_service import SelfHealingService
 from app.db.session import async_session_maker
@@ -7,7 +10,7 @@ from app.utils.logger import log
 from app.websocket.dispatcher import emit_event
 
 @celery_app.task(bind=True, name="app.workers.healing_job.run_self_healing")
-def run_self_healing(self, project_id: str, test_case_id: str):
+def run_self_healing(self, project_id: str, test_case_id: str, use_cache: bool = True):
     log.info(f"Self-healing worker triggered for test: {test_case_id}")
     
     # Emit Start Event
@@ -15,11 +18,11 @@ def run_self_healing(self, project_id: str, test_case_id: str):
     
     async def execute():
         async with async_session_maker() as db:
-            result = await SelfHealingService.heal_test_case(db, UUID(test_case_id))
+            result = await SelfHealingService.heal_test_case(db, UUID(test_case_id), use_cache=use_cache)
             return result
 
+    loop = asyncio.get_event_loop()
     try:
-        loop = asyncio.get_event_loop()
         result = loop.run_until_complete(execute())
         
         # Emit Success Event
@@ -35,3 +38,80 @@ def run_self_healing(self, project_id: str, test_case_id: str):
         log.error(f"Self-healing job failed: {e}")
         emit_event(project_id, {"event": "HEALING_STATUS", "test_id": test_case_id, "status": "FAILED", "message": f"Healing failed: {str(e)}"})
         return {"status": "FAILED", "error": str(e)}
+    finally:
+        loop.run_until_complete(LLMTelemetry.flush())
+
+@celery_app.task(bind=True, name="app.workers.healing_job.run_batch_healing")
+def run_batch_healing(self, project_id: str, test_case_ids: Optional[List[str]] = None, use_cache: bool = True):
+    """
+    Heals many tests in one job: the given ones, or every test of the
+    project that is BROKEN or whose endpoint was renamed since it was
+    written (see SelfHealingService.load_targets).
+
+    Tests are grouped by endpoint change and healed locally where possible,
+    the rest by the AI in one prompt per group (HEALING_BATCH_MAX tests at
+    most) with at most HEALING_CONCURRENCY calls in flight.
+    Each group is saved in one statement, then its HEALING_STATUS events
+    are sent (one per test, tagged with this job's id).
+    """
+    job_id = self.request.id
+    log.info(f"Batch self-healing job {job_id} triggered for project {project_id}.")
+
+    async def execute():
+        async with async_session_maker() as db:
+            ids = [UUID(test_id) for test_id in test_case_ids] if test_case_ids is not None else None
+            targets = await SelfHealingService.load_targets(db, UUID(project_id), ids)
+        groups = SelfHealingService.group_targets(targets)
+        summary = {"job_id": job_id, "total": len(targets), "groups": len(groups), "healed": 0, "healed_by_ast": 0, "failed": 0}
+        emit_event(project_id, {
+            "event": "HEALING_STATUS", "job_id": job_id, "status": "STARTED",
+            "total": summary["total"], "message": f"Healing {len(targets)} tests ({len(groups)} endpoint changes)..."
+        })
+
+        semaphore = asyncio.Semaphore(max(1, settings.HEALING_CONCURRENCY))
+
+        async def heal(group):
+            results = await SelfHealingService.heal_group(group, semaphore, UUID(project_id), use_cache=use_cache)
+            healed = [(test, patch_data) for test, patch_data, _, error in results if error is None]
+            try:
+                async with async_session_maker() as db:
+                    await SelfHealingService.save_healed(db, healed)
+            except Exception as e:
+                log.error(f"Batch healing {job_id}: could not save {len(healed)} healed tests: {e}")
+                results = [(test, None, None, e) for test, _, _, _ in results]
+
+            for test, patch_data, healed_by, error in results:
+                if error is None:
+                    summary["healed"] += 1
+                    summary["healed_by_ast"] += healed_by == "ast"
+                    event = {"status": "HEALED", "healed_by": healed_by, "message": f"Test healed! {patch_data.get('reason', '')}"}
+                else:
+                    summary["failed"] += 1
+                    event = {"status": "FAILED", "message": f"Healing failed: {error}"}
+                try:
+                    emit_event(project_id, {
+                        "event": "HEALING_STATUS", "job_id": job_id, "test_id": str(test["id"]),
+                        "done": summary["healed"] + summary["failed"], "total": summary["total"], **event
+                    })
+                except Exception as e:
+                    # Progress is best effort: the heals are saved either way
+                    log.debug(f"Dropped a healing status event: {e}")
+
+        await asyncio.gather(*[heal(group) for group in groups])
+        return summary
+
+    loop = asyncio.get_event_loop()
+    try:
+        summary = loop.run_until_complete(execute())
+        log.info(f"Batch self-healing job {job_id} done: {summary}")
+        emit_event(project_id, {
+            "event": "HEALING_STATUS", "job_id": job_id, "status": "COMPLETED", **summary,
+            "message": f"Healed {summary['healed']}/{summary['total']} tests ({summary['healed_by_ast']} without the AI)."
+        })
+        return summary
+    except Exception as e:
+        log.error(f"Batch self-healing job {job_id} failed: {e}")
+        emit_event(project_id, {"event": "HEALING_STATUS", "job_id": job_id, "status": "FAILED", "message": f"Healing failed: {str(e)}"})
+        return {"status": "FAILED", "error": str(e)}
+    finally:
+        loop.run_until_complete(LLMTelemetry.flush())
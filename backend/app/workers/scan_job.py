@@ -1,6 +1,13 @@
 import asyncio
+from typing import Dict, List, Optional
+from celery import chord, group
+from app.config import settings
 from app.workers.celery_app import celery_app
 from app.services.scanner_service import ScannerService
+from app.services.impact_service import ImpactService
+from app.services.test_run_service import TestRunService
+from app.workers.healing_job import run_batch_healing
+from app.workers.test_run_job import run_tests
 from app.db.session import async_session_maker
 from app.utils.logger import log
 from app.websocket.dispatcher import emit_event
@@ -12,8 +19,19 @@ def run_scan(self, project_id: str, git_url: str):
     p_id = UUID(project_id)
     
     # Emit Start Event
-    emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 10, "message": "Cloning repository..."})
-    
+    emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 5, "message": "Checking for new commits..."})
+
+    async def precheck():
+        # Read-only: if the remote HEAD is what we scanned last time, stop here
+        async with async_session_maker() as db:
+            if await ScannerService.remote_unchanged(db, p_id, git_url):
+                return await ScannerService.count_endpoints(db, p_id)
+            return None
+
+    async def load_options():
+        async with async_session_maker() as db:
+            return await ScannerService.project_scan_options(db, p_id)
+
     async def execute():
         async with async_session_maker() as db:
             # We add a progress callback if the service supports it (future proofing)
@@ -22,18 +40,187 @@ def run_scan(self, project_id: str, git_url: str):
             return result
 
     try:
-        emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 30, "message": "Analyzing codebase..."})
-        
         loop = asyncio.get_event_loop()
-        count = loop.run_until_complete(execute())
-        
-        emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 100, "message": "Scan complete!"})
-        emit_event(project_id, {"event": "JOB_COMPLETED", "job_type": "scan", "count": count})
-        
-        log.info(f"Background job finished! Found {count} endpoints.")
-        return {"status": "SUCCESS", "endpoints_found": count}
-        
+        unchanged_count = loop.run_until_complete(precheck())
+        if unchanged_count is not None:
+            emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 100, "message": "No changes since last scan."})
+            emit_event(project_id, {"event": "JOB_COMPLETED", "job_type": "scan", "count": unchanged_count, "changed": False})
+            log.info(f"Project {project_id} unchanged since last scan, skipped clone and parse.")
+            return {"status": "SUCCESS", "endpoints_found": unchanged_count, "changed": False}
+
+        emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 10, "message": "Cloning repository..."})
+
+        # Big repos that need a full scan are fanned out across workers.
+        # Incremental scans only touch a few files, so they stay in-process.
+        sharded_scan = None
+        if settings.SCAN_SHARDS > 1:
+            options = loop.run_until_complete(load_options())
+            if options["full_scan_needed"]:
+                plan = ScannerService.plan_shards(git_url, options["partial"], settings.SCAN_SHARDS, settings.SCAN_SHARD_MIN_FILES)
+                if plan:
+                    sharded_scan = build_sharded_scan(project_id, git_url, plan, options)
+
+        if sharded_scan is None:
+            emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 30, "message": "Analyzing codebase..."})
+
+            count, change_set = loop.run_until_complete(execute())
+
+            emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 100, "message": "Scan complete!"})
+            impact = dispatch_change_set(loop, project_id, change_set)
+            emit_event(project_id, {"event": "JOB_COMPLETED", "job_type": "scan", "count": count, "changed": True})
+
+            log.info(f"Background job finished! Found {count} endpoints.")
+            return {"status": "SUCCESS", "endpoints_found": count, "changed": True, **impact}
+
     except Exception as e:
         emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 0, "message": f"Scan failed: {str(e)}"})
         log.error(f"Background job failed: {e}")
         raise self.retry(exc=e, countdown=10)
+
+    # Outside the try: replace() ends this task by raising Ignore, which must
+    # not be retried. The chord inherits this task's id, so the scan's result
+    # (GET /projects/scan/status/{scanId}) is the merged result.
+    raise self.replace(sharded_scan)
+
+
+def dispatch_change_set(loop, project_id: str, change_set: Dict[str, List[UUID]]) -> Dict:
+    """
+    Acts on what a (committed) scan changed (see ImpactService): enqueues
+    one batch heal for the tests of the modified endpoints and one test
+    run for the tests of the endpoints whose source changed, then sends a
+    SCAN_CHANGES event with the counts.
+
+    Returns the change set (endpoint ids), the healing job and the test
+    run for the task result. Never raises: the scan is saved, so a failure
+    here must not retry it.
+    """
+    impact = {
+        "changes": {kind: [str(ep_id) for ep_id in ids] for kind, ids in change_set.items()},
+        "impacted_tests": 0,
+        "rerun_tests": 0,
+        "healing_job_id": None,
+        "test_run_id": None,
+    }
+    try:
+        async def lookup():
+            async with async_session_maker() as db:
+                heal = await ImpactService.tests_to_heal(db, change_set) if change_set["modified"] else []
+                rerun = await ImpactService.tests_to_run(db, change_set) if change_set["source_changed"] else []
+                run = None
+                if rerun and settings.RUN_TESTS_ON_SCAN:
+                    run, rerun = await TestRunService.create_run(db, UUID(project_id), rerun)
+                return heal, rerun, run
+
+        async def fail_run(run_id: UUID, error: str):
+            async with async_session_maker() as db:
+                await TestRunService.finish_run(db, run_id, error=error)
+
+        tests, rerun, run = [], [], None
+        if change_set["modified"] or change_set["source_changed"]:
+            tests, rerun, run = loop.run_until_complete(lookup())
+        impact["impacted_tests"] = len(tests)
+        impact["rerun_tests"] = len(rerun)
+        if tests and settings.HEALING_ON_SCAN:
+            impact["healing_job_id"] = run_batch_healing.delay(project_id, [str(test_id) for test_id in tests]).id
+        if run is not None:
+            try:
+                # The task id is the run id
+                run_tests.apply_async(args=[project_id, str(run.id), rerun], task_id=str(run.id))
+                impact["test_run_id"] = str(run.id)
+            except Exception as e:
+                log.error(f"Could not enqueue the test run of project {project_id}: {e}")
+                loop.run_until_complete(fail_run(run.id, f"Could not enqueue: {e}"))
+
+        log.info(
+            f"Scan of project {project_id} changed endpoints: {len(change_set['added'])} added, "
+            f"{len(change_set['removed'])} removed, {len(change_set['modified'])} modified, "
+            f"{len(change_set['source_changed'])} with changed sources; {len(tests)} tests to heal "
+            f"(healing job: {impact['healing_job_id']}), {len(rerun)} to run again (test run: {impact['test_run_id']})."
+        )
+        emit_event(project_id, {
+            "event": "SCAN_CHANGES",
+            **{kind: len(ids) for kind, ids in change_set.items()},
+            "impacted_tests": impact["impacted_tests"],
+            "rerun_tests": impact["rerun_tests"],
+            "healing_job_id": impact["healing_job_id"],
+            "test_run_id": impact["test_run_id"],
+        })
+    except Exception as e:
+        log.error(f"Change impact analysis failed for project {project_id}: {e}")
+    return impact
+
+SHARD_PROGRESS_KEY = "ai_testgen:scan_shards:{project_id}:{sha}"
+
+def build_sharded_scan(project_id: str, git_url: str, plan: tuple, options: dict):
+    """
+    Builds the Celery chord for a sharded scan: one `scan_shard` per group
+    of top-level folders, then `merge_scan_shards` reconciles the DB once.
+    """
+    sha, shards = plan
+    import redis as sync_redis
+    r = sync_redis.from_url(settings.REDIS_URL)
+    r.delete(SHARD_PROGRESS_KEY.format(project_id=project_id, sha=sha))
+    r.close()
+
+    header = group(
+        scan_shard.s(project_id, git_url, sha, subtrees, len(shards), options["partial"], options["ignore_patterns"])
+        for subtrees in shards
+    )
+
+    emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 30, "message": f"Analyzing codebase across {len(shards)} workers..."})
+    log.info(f"Sharded scan for project {project_id} started: {len(shards)} shards at {sha}.")
+    return chord(header, merge_scan_shards.s(project_id, sha, options["fingerprint"]))
+
+@celery_app.task(bind=True, name="app.workers.scan_job.scan_shard", max_retries=3)
+def scan_shard(
+    self,
+    project_id: str,
+    git_url: str,
+    sha: str,
+    subtrees: List[str],
+    shard_count: int,
+    partial: bool,
+    ignore_patterns: Optional[str]
+):
+    """Parses one shard and reports progress aggregated over all shards."""
+    try:
+        rows = ScannerService.scan_shard(git_url, sha, subtrees, partial, ignore_patterns)
+    except Exception as e:
+        log.error(f"Scan shard {subtrees} failed: {e}")
+        if self.request.retries >= self.max_retries:
+            emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 0, "message": f"Scan failed: {str(e)}"})
+        raise self.retry(exc=e, countdown=10)
+
+    import redis as sync_redis
+    r = sync_redis.from_url(settings.REDIS_URL)
+    key = SHARD_PROGRESS_KEY.format(project_id=project_id, sha=sha)
+    done = r.incr(key)
+    r.expire(key, 3600)
+    r.close()
+
+    emit_event(project_id, {
+        "event": "SCAN_PROGRESS",
+        "percentage": 30 + int(60 * done / shard_count),
+        "message": f"Analyzed {done}/{shard_count} shards..."
+    })
+    return rows
+
+@celery_app.task(bind=True, name="app.workers.scan_job.merge_scan_shards")
+def merge_scan_shards(self, shard_results: List[list], project_id: str, sha: str, fingerprint: str):
+    """Chord callback: one bulk reconcile for the whole repository."""
+    async def execute():
+        async with async_session_maker() as db:
+            return await ScannerService.merge_shards(db, UUID(project_id), sha, fingerprint, shard_results)
+
+    try:
+        loop = asyncio.get_event_loop()
+        count, change_set = loop.run_until_complete(execute())
+
+        emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 100, "message": "Scan complete!"})
+        impact = dispatch_change_set(loop, project_id, change_set)
+        emit_event(project_id, {"event": "JOB_COMPLETED", "job_type": "scan", "count": count, "changed": True})
+        return {"status": "SUCCESS", "endpoints_found": count, "changed": True, **impact}
+    except Exception as e:
+        emit_event(project_id, {"event": "SCAN_PROGRESS", "percentage": 0, "message": f"Scan failed: {str(e)}"})
+        log.error(f"Merging scan shards failed: {e}")
+        raise self.retry(exc=e, countdown=10)
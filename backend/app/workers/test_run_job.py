@@ -0,0 +1,121 @@
+import asyncio
+from typing import Dict, List
+from uuid import UUID
+from celery import chord, group
+from app.config import settings
+from app.workers.celery_app import celery_app
+from app.services.test_run_service import TestRunService
+from app.utils.test_executor import TestExecutor, ExecutorUnavailable
+from app.db.session import async_session_maker
+from app.utils.logger import log
+from app.websocket.dispatcher import emit_event
+
+@celery_app.task(bind=True, name="app.workers.test_run_job.run_tests")
+def run_tests(self, project_id: str, run_id: str, test_case_ids: List[str]):
+    """
+    Runs the tests of a TestRun: one `run_test_chunk` per
+    TEST_RUN_CHUNK_SIZE tests, spread over every worker listening on the
+    queue, then `finish_test_run` closes the run.
+
+    The chord replaces this task, so it inherits the task id (the run id)
+    and the run's task result is `finish_test_run`'s.
+    """
+    chunk_size = max(1, settings.TEST_RUN_CHUNK_SIZE)
+    chunks = [test_case_ids[i:i + chunk_size] for i in range(0, len(test_case_ids), chunk_size)]
+    emit_event(project_id, {
+        "event": "TEST_RUN_PROGRESS", "run_id": run_id, "done": 0, "total": len(test_case_ids),
+        "message": f"Running {len(test_case_ids)} tests in {len(chunks)} chunks..."
+    })
+    log.info(f"Test run {run_id} of project {project_id} started: {len(test_case_ids)} tests, {len(chunks)} chunks.")
+
+    header = group(run_test_chunk.s(project_id, run_id, chunk) for chunk in chunks)
+    body = finish_test_run.s(project_id, run_id).on_error(fail_test_run.s(project_id, run_id))
+    raise self.replace(chord(header, body))
+
+@celery_app.task(bind=True, name="app.workers.test_run_job.run_test_chunk", max_retries=3)
+def run_test_chunk(self, project_id: str, run_id: str, test_case_ids: List[str]) -> Dict[str, int]:
+    """
+    Runs one chunk of a run in a pool of test processes (see TestExecutor)
+    and saves its results and counters in one transaction.
+
+    The tests run in spawned test processes, never in this worker, and
+    outside the event loop. A failed save retries the chunk, tests
+    included; a worker that can't start test processes fails the run.
+    """
+    async def load():
+        async with async_session_maker() as db:
+            return await TestRunService.load_chunk(db, UUID(run_id), [UUID(test_id) for test_id in test_case_ids])
+
+    async def save(results: List[Dict], missing: int):
+        async with async_session_maker() as db:
+            return await TestRunService.save_results(db, UUID(run_id), results, missing)
+
+    loop = asyncio.get_event_loop()
+    try:
+        cases, base_url = loop.run_until_complete(load())
+        results = []
+        for batch in TestExecutor.iter_results(
+            cases, base_url, settings.TEST_TIMEOUT_SECONDS,
+            workers=settings.TEST_RUN_WORKERS,
+            chunk_size=settings.TEST_RUN_POOL_CHUNK,
+            max_tasks_per_child=settings.TEST_RUN_MAX_TASKS_PER_CHILD,
+            max_error_chars=settings.TEST_RUN_MAX_ERROR_CHARS
+        ):
+            results.extend(batch)
+        counts = loop.run_until_complete(save(results, len(test_case_ids) - len(cases)))
+    except ExecutorUnavailable as e:
+        # Retrying on the same worker can't help: the run fails (see fail_test_run)
+        log.error(f"Test run {run_id}: {e}")
+        raise
+    except Exception as e:
+        log.error(f"Test run {run_id}: chunk of {len(test_case_ids)} tests failed: {e}")
+        raise self.retry(exc=e, countdown=10)
+
+    try:
+        emit_event(project_id, {"event": "TEST_RUN_PROGRESS", "run_id": run_id, "chunk": counts, "chunk_size": len(test_case_ids)})
+    except Exception as e:
+        # Progress is best effort: the results are saved either way
+        log.debug(f"Dropped a test run progress event: {e}")
+    return counts
+
+@celery_app.task(bind=True, name="app.workers.test_run_job.finish_test_run")
+def finish_test_run(self, chunk_counts: List[Dict[str, int]], project_id: str, run_id: str):
+    """Chord callback: closes the run and reports its totals."""
+    async def execute():
+        async with async_session_maker() as db:
+            return await TestRunService.finish_run(db, UUID(run_id))
+
+    loop = asyncio.get_event_loop()
+    run = loop.run_until_complete(execute())
+    summary = {
+        "status": run.status,
+        "run_id": run_id,
+        "total": run.total_count,
+        "passed": run.passed_count,
+        "failed": run.failed_count,
+        "errors": run.error_count,
+        "skipped": run.skipped_count,
+        "pass_rate": run.pass_rate,
+    }
+    log.info(f"Test run {run_id} finished: {summary}")
+    emit_event(project_id, {"event": "JOB_COMPLETED", "job_type": "run", **summary})
+    return summary
+
+@celery_app.task(name="app.workers.test_run_job.fail_test_run")
+def fail_test_run(request, exc, traceback, project_id: str, run_id: str):
+    """
+    Error callback of the chord (a chunk that failed all its retries):
+    closes the run as ERROR with the results saved so far, instead of
+    leaving it RUNNING forever.
+    """
+    async def execute():
+        async with async_session_maker() as db:
+            return await TestRunService.finish_run(db, UUID(run_id), error=str(exc))
+
+    log.error(f"Test run {run_id} failed: {exc}")
+    loop = asyncio.get_event_loop()
+    run = loop.run_until_complete(execute())
+    emit_event(project_id, {
+        "event": "JOB_COMPLETED", "job_type": "run", "status": run.status, "run_id": run_id,
+        "pass_rate": run.pass_rate, "message": f"Test run failed: {exc}"
+    })
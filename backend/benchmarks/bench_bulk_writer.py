@@ -0,0 +1,114 @@
+"""
+Benchmark: commit-per-test vs BufferedTestCaseWriter
+----------------------------------------------------
+Creates a throwaway user, project, endpoints and generation job in the
+configured database, then saves the same fake tests twice per size:
+
+  * per test   - GenerationJobService.record with one test per session and
+                 commit (what the job did before the buffered writer)
+  * buffered   - BufferedTestCaseWriter with the default thresholds
+
+Everything it created is deleted afterwards.
+
+Run from the backend folder, against a Postgres you can write to:
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_bulk_writer
+
+Results so far: none recorded. The sandbox this was written in has no
+Postgres, so the 1k / 10k numbers still have to be measured.
+"""
+
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import delete, select
+
+from app.config import settings
+from app.db.base import Base
+from app.db.session import async_session_maker, engine
+from app.domain.models import user, api_key, project, endpoint, endpoint_source, test_case, test_run, generation_job # noqa: F401 (mappers)
+from app.domain.models.endpoint import Endpoint
+from app.domain.models.generation_job import GenerationJob, GenerationJobItem
+from app.domain.models.project import Project
+from app.domain.models.test_case import TestCase
+from app.domain.models.user import User
+from app.services.generation_job_service import GenerationJobService
+from app.services.test_case_writer import BufferedTestCaseWriter
+
+SIZES = (1_000, 10_000)
+TEST_CODE = "import httpx\n\ndef test_endpoint():\n    r = httpx.get('http://localhost/items')\n    assert r.status_code == 200\n" * 3
+
+
+async def create_job(project_id: uuid.UUID, size: int):
+    endpoint_ids = [uuid.uuid4() for _ in range(size)]
+    async with async_session_maker() as db:
+        db.add_all([
+            Endpoint(id=ep_id, project_id=project_id, method="GET", path=f"/items/{n}", framework="FastAPI")
+            for n, ep_id in enumerate(endpoint_ids)
+        ])
+        await db.commit()
+        job, _ = await GenerationJobService.submit(db, project_id, [str(ep_id) for ep_id in endpoint_ids])
+        return job.id, [str(ep_id) for ep_id in endpoint_ids]
+
+
+def fake_test(n: int) -> dict:
+    return {"description": f"Checks item {n}", "priority": "MEDIUM", "test_code": TEST_CODE}
+
+
+async def save_per_test(job_id, endpoint_ids) -> float:
+    start = time.perf_counter()
+    for n, ep_id in enumerate(endpoint_ids):
+        async with async_session_maker() as db:
+            await GenerationJobService.record(db, job_id, {ep_id: fake_test(n)}, {})
+    return time.perf_counter() - start
+
+
+async def save_buffered(job_id, endpoint_ids) -> float:
+    start = time.perf_counter()
+    writer = BufferedTestCaseWriter(job_id)
+    # Results arrive a GENERATION_BATCH_MAX batch at a time, like in the job
+    step = max(1, settings.GENERATION_BATCH_MAX)
+    for i in range(0, len(endpoint_ids), step):
+        await writer.add({ep_id: fake_test(i) for ep_id in endpoint_ids[i:i + step]}, {})
+    await writer.close()
+    return time.perf_counter() - start
+
+
+async def main():
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    except Exception as e:
+        print(f"No usable database at DATABASE_URL ({e.__class__.__name__}: {e}).")
+        print("Point DATABASE_URL at a Postgres you can write to and run again.")
+        return
+
+    user_id, project_id = uuid.uuid4(), uuid.uuid4()
+    async with async_session_maker() as db:
+        db.add(User(id=user_id, email=f"bench-{user_id}@example.com", hashed_password="-"))
+        db.add(Project(id=project_id, owner_id=user_id, name="bench_bulk_writer", git_url="-"))
+        await db.commit()
+
+    try:
+        print(f"Write batch {settings.GENERATION_WRITE_BATCH} rows / {settings.GENERATION_WRITE_SECONDS}s\n")
+        for size in SIZES:
+            per_test = await save_per_test(*await create_job(project_id, size))
+            buffered = await save_buffered(*await create_job(project_id, size))
+            print(f"{size:>6} tests  per test {per_test:8.2f}s ({size / per_test:7.0f}/s)"
+                  f"  buffered {buffered:8.2f}s ({size / buffered:7.0f}/s)  x{per_test / buffered:.1f}")
+    finally:
+        async with async_session_maker() as db:
+            bench_endpoints = select(Endpoint.id).where(Endpoint.project_id == project_id)
+            bench_jobs = select(GenerationJob.id).where(GenerationJob.project_id == project_id)
+            await db.execute(delete(TestCase).where(TestCase.endpoint_id.in_(bench_endpoints)))
+            await db.execute(delete(GenerationJobItem).where(GenerationJobItem.job_id.in_(bench_jobs)))
+            await db.execute(delete(GenerationJob).where(GenerationJob.project_id == project_id))
+            await db.execute(delete(Endpoint).where(Endpoint.project_id == project_id))
+            await db.execute(delete(Project).where(Project.id == project_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
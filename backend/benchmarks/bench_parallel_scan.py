@@ -0,0 +1,99 @@
+"""
+Benchmark: serial vs multi-process route parsing
+-------------------------------------------------
+Builds a synthetic repository (a mix of FastAPI and Express files padded
+with filler code) and times the original serial loop against the process
+pool used by ScannerService.
+
+Run from the backend folder:
+    python -m benchmarks.bench_parallel_scan
+
+Results so far: the only run on record was on a single-core sandbox, where
+the pool measured x0.93 (parity minus pool overhead). No speedup has been
+demonstrated yet; run this on a multi-core host to measure one.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from app.utils.parallel_parser import ParallelParser
+
+FILE_COUNT = 6000
+FILLER_LINES = 400
+
+PY_TEMPLATE = '''from fastapi import APIRouter
+router = APIRouter()
+
+@router.get("/items/{n}")
+async def read_item_{n}():
+    return {{}}
+
+@router.post("/items/{n}/children")
+async def create_child_{n}():
+    return {{}}
+'''
+
+JS_TEMPLATE = '''const express = require('express');
+const router = express.Router();
+
+router.get('/orders/{n}', (req, res) => res.json({{}}));
+router.delete('/orders/{n}', (req, res) => res.sendStatus(204));
+'''
+
+
+def build_synthetic_repo(root: str):
+    """Writes FILE_COUNT source files spread over nested package folders."""
+    for n in range(FILE_COUNT):
+        folder = os.path.join(root, f"pkg_{n % 50}", f"module_{n % 7}")
+        os.makedirs(folder, exist_ok=True)
+        if n % 2 == 0:
+            body = PY_TEMPLATE.format(n=n) + "\n".join(f"value_{i} = {i} * 2" for i in range(FILLER_LINES))
+            name = f"routes_{n}.py"
+        else:
+            body = JS_TEMPLATE.format(n=n) + "\n".join(f"const value_{i} = {i} * 2;" for i in range(FILLER_LINES))
+            name = f"routes_{n}.js"
+        with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+            f.write(body)
+
+
+def collect(root: str):
+    paths = []
+    for dirpath, _, files in os.walk(root):
+        paths.extend(os.path.join(dirpath, f) for f in files)
+    return paths
+
+
+def timed(label: str, batches) -> float:
+    start = time.perf_counter()
+    found = sum(len(batch) for batch in batches)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed:8.3f}s  {found} endpoints")
+    return elapsed
+
+
+def main():
+    root = tempfile.mkdtemp(prefix="bench_scan_")
+    try:
+        build_synthetic_repo(root)
+        paths = collect(root)
+        print(f"Synthetic repo: {len(paths)} files, {os.cpu_count()} CPU cores\n")
+        if (os.cpu_count() or 1) < 2:
+            print("WARNING: single CPU core, a process pool cannot beat serial parsing here.\n")
+
+        serial = timed("serial", ParallelParser.iter_serial(paths, chunk_size=256))
+        for workers in sorted({2, 4, os.cpu_count() or 1}):
+            if workers < 2:
+                continue
+            elapsed = timed(
+                f"parallel ({workers} procs)",
+                ParallelParser.iter_parallel(paths, workers=workers, chunk_size=256)
+            )
+            print(f"{'':<22} speedup x{serial / elapsed:.2f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import re
+import sys
+import sysconfig
+import time
+
+from app.utils.route_parsers import RouteParsers
+
+"""
+Microbenchmark: route detection throughput (MB/s)
+--------------------------------------------------
+Compares the original per-file `str` regex (kept below as `legacy_detect`)
+with RouteParsers' prefiltered, single-pass bytes matcher on real code.
+
+Corpora:
+- Python: the interpreter's standard library (always available)
+- JS/TS:  any folders passed on the command line, e.g. a project's
+          node_modules or a frontend build output
+
+Run from the backend folder:
+    python -m benchmarks.bench_route_parsers [js_dir ...]
+"""
+
+LEGACY_FASTAPI = re.compile(RouteParsers.FASTAPI_REGEX, re.IGNORECASE)
+LEGACY_EXPRESS = re.compile(RouteParsers.EXPRESS_REGEX, re.IGNORECASE)
+
+
+def legacy_detect(file_path: str):
+    """The parser as it was before the combined matcher."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except Exception:
+        return []
+    regex = LEGACY_FASTAPI if file_path.endswith('.py') else LEGACY_EXPRESS
+    return regex.findall(content)
+
+
+def collect(roots, extensions):
+    paths = []
+    for root in roots:
+        for dirpath, _, files in os.walk(root):
+            paths.extend(os.path.join(dirpath, f) for f in files if f.endswith(extensions))
+    return paths
+
+
+def run(label: str, paths, detect) -> float:
+    total_bytes = sum(os.path.getsize(p) for p in paths)
+    start = time.perf_counter()
+    found = sum(len(detect(p)) for p in paths)
+    elapsed = time.perf_counter() - start
+    mb_per_sec = total_bytes / (1024 * 1024) / elapsed if elapsed else float("inf")
+    print(f"  {label:<10} {elapsed:7.3f}s  {mb_per_sec:8.1f} MB/s  {found} routes")
+    return mb_per_sec
+
+
+def bench(name: str, paths):
+    if not paths:
+        print(f"{name}: no files, skipped\n")
+        return
+    size_mb = sum(os.path.getsize(p) for p in paths) / (1024 * 1024)
+    print(f"{name}: {len(paths)} files, {size_mb:.1f} MB")
+    # Warm the OS page cache so both runs read from memory
+    for p in paths:
+        with open(p, 'rb') as f:
+            f.read()
+    legacy = run("legacy", paths, legacy_detect)
+    combined = run("combined", paths, RouteParsers.detect_endpoints)
+    print(f"  speedup    x{combined / legacy:.2f}\n")
+
+
+def main():
+    stdlib = sysconfig.get_paths()["stdlib"]
+    bench("Python (stdlib)", collect([stdlib], ('.py',)))
+    bench("JS/TS", collect(sys.argv[1:], ('.js', '.ts')))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: test execution throughput, one test process vs a pool
+-----------------------------------------------------------------
+Runs 1k and 10k generated-style tests (an httpx GET + assertions, with
+some failing ones mixed in) against a local stub API that answers after
+API_LATENCY_MS, once with a single test process and once with a pool of
+WORKERS, and prints tests per second.
+
+Run from the backend folder:
+    python -m benchmarks.bench_test_runner
+
+Results so far (single-core sandbox, API_LATENCY_MS = 5, 4 pool workers):
+     1000 tests  1 process  10.0s (100/s)  pool  6.3s (158/s)  x1.59
+    10000 tests  1 process 105.6s ( 95/s)  pool 56.6s (177/s)  x1.87
+Before test processes reused SSL contexts (see `_reuse_ssl_contexts`),
+1000 tests took ~50s either way (20/s): building a client's SSL context
+cost more than the request. On one core the pool only overlaps the stub
+API's latency with other tests' CPU work, so the gain grows with cores
+and with the API's latency; run this on a multi-core host to measure it.
+Across nodes, a run scales with the number of `run_test_chunk` tasks in
+flight (TEST_RUN_CHUNK_SIZE tests each).
+"""
+
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.utils.test_executor import TestExecutor
+
+SIZES = (1000, 10000)
+API_LATENCY_MS = 5
+WORKERS = 4
+POOL_CHUNK = 10
+
+PASSING = '''import httpx
+
+def test_get_item_{n}():
+    response = httpx.get("http://localhost:8000/items/{n}")
+    assert response.status_code == 200
+    assert response.json()["id"] == "{n}"
+'''
+
+FAILING = '''import httpx
+
+def test_get_item_{n}():
+    response = httpx.get("http://localhost:8000/items/{n}")
+    assert response.status_code == 404
+'''
+
+
+class StubAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(API_LATENCY_MS / 1000)
+        body = ('{"id": "%s"}' % self.path.rsplit("/", 1)[-1]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_cases(count):
+    return [(str(n), (FAILING if n % 10 == 0 else PASSING).format(n=n)) for n in range(count)]
+
+
+def timed(cases, base_url, workers):
+    start = time.perf_counter()
+    results = [
+        result
+        for batch in TestExecutor.iter_results(cases, base_url, 30, workers=workers, chunk_size=POOL_CHUNK)
+        for result in batch
+    ]
+    elapsed = time.perf_counter() - start
+    statuses = {}
+    for result in results:
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    assert len(results) == len(cases), statuses
+    return elapsed, statuses
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPI)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    for size in sizes:
+        cases = make_cases(size)
+        single, single_statuses = timed(cases, base_url, 1)
+        pooled, pool_statuses = timed(cases, base_url, WORKERS)
+        assert single_statuses == pool_statuses, (single_statuses, pool_statuses)
+        print(
+            f"{size:>6} tests  1 process {single:6.2f}s ({size / single:6.0f}/s)  "
+            f"pool x{WORKERS} {pooled:6.2f}s ({size / pooled:6.0f}/s)  "
+            f"speedup x{single / pooled:.2f}  {single_statuses}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import asyncio
+from sqlalchemy import text
 from app.db.base import Base
 from app.db.session import engine
 
@@ -6,19 +7,108 @@ from app.db.session import engine
 from app.domain.models.user import User
 from app.domain.models.project import Project
 from app.domain.models.endpoint import Endpoint
+from app.domain.models.endpoint_source import EndpointSource
 from app.domain.models.test_case import TestCase
 from app.domain.models.test_run import TestRun
+from app.domain.models.test_result import TestResult
+from app.domain.models.generation_job import GenerationJob, GenerationJobItem
+from app.domain.models.llm_call import LLMCall
+from app.domain.models.endpoint_history import EndpointHistory
+
+# `create_all` only creates missing tables, it never changes existing ones.
+# These statements bring databases created by older versions up to date.
+# Each one is idempotent, so they are safe to run on every start.
+_DUPLICATE_ENDPOINTS = """
+    SELECT id, first_value(id) OVER (
+        PARTITION BY project_id, method, path ORDER BY created_at, id
+    ) AS keep_id
+    FROM endpoints
+"""
+
+SCHEMA_UPGRADES = [
+    # Scanner settings and state on projects
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS scan_ignore VARCHAR",
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS partial_clone BOOLEAN",
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS last_scanned_sha VARCHAR",
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS scan_fingerprint VARCHAR",
+
+    # Where each endpoint was found
+    "ALTER TABLE endpoints ADD COLUMN IF NOT EXISTS source_file VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_endpoints_source_file ON endpoints (source_file)",
+    "ALTER TABLE endpoints ADD COLUMN IF NOT EXISTS source_line INTEGER",
+
+    # One row per (project, method, path). Older scans could store duplicates:
+    # their tests move to the oldest row before the extra rows are removed.
+    f"""
+    UPDATE test_cases t SET endpoint_id = d.keep_id
+    FROM ({_DUPLICATE_ENDPOINTS}) d
+    WHERE t.endpoint_id = d.id AND d.id <> d.keep_id
+    """,
+    f"""
+    DELETE FROM endpoints e USING ({_DUPLICATE_ENDPOINTS}) d
+    WHERE e.id = d.id AND d.id <> d.keep_id
+    """,
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_endpoints_project_method_path') THEN
+            ALTER TABLE endpoints ADD CONSTRAINT uq_endpoints_project_method_path UNIQUE (project_id, method, path);
+        END IF;
+    END $$
+    """,
+
+    # Deleting an endpoint deletes its tests in the DB (the ORM relies on it)
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint WHERE conname = 'test_cases_endpoint_id_fkey' AND confdeltype = 'c'
+        ) THEN
+            ALTER TABLE test_cases DROP CONSTRAINT IF EXISTS test_cases_endpoint_id_fkey;
+            ALTER TABLE test_cases ADD CONSTRAINT test_cases_endpoint_id_fkey
+                FOREIGN KEY (endpoint_id) REFERENCES endpoints (id) ON DELETE CASCADE;
+        END IF;
+    END $$
+    """,
+
+    # When healing last rewrote a test (endpoint changes before it are handled)
+    "ALTER TABLE test_cases ADD COLUMN IF NOT EXISTS healed_at TIMESTAMP",
+
+    # Tests of an endpoint (scan change impact, cascading deletes) without a full scan
+    "CREATE INDEX IF NOT EXISTS ix_test_cases_endpoint_id ON test_cases (endpoint_id)",
+
+    # Test execution: per-run counters (results live in test_results)
+    "ALTER TABLE test_runs ADD COLUMN IF NOT EXISTS total_count INTEGER DEFAULT 0",
+    "ALTER TABLE test_runs ADD COLUMN IF NOT EXISTS passed_count INTEGER DEFAULT 0",
+    "ALTER TABLE test_runs ADD COLUMN IF NOT EXISTS failed_count INTEGER DEFAULT 0",
+    "ALTER TABLE test_runs ADD COLUMN IF NOT EXISTS error_count INTEGER DEFAULT 0",
+    "ALTER TABLE test_runs ADD COLUMN IF NOT EXISTS skipped_count INTEGER DEFAULT 0",
+    "ALTER TABLE test_runs ADD COLUMN IF NOT EXISTS pass_rate DOUBLE PRECISION",
+    "CREATE INDEX IF NOT EXISTS ix_test_runs_project_started ON test_runs (project_id, started_at)",
+
+    # LLM calls made for the same answer (escalations, hedges) share an attempt
+    "ALTER TABLE llm_calls ADD COLUMN IF NOT EXISTS attempt_id UUID",
+
+    # Link existing endpoints to the file they were found in
+    """
+    INSERT INTO endpoint_sources (endpoint_id, source_file, project_id)
+    SELECT e.id, e.source_file, e.project_id FROM endpoints e
+    WHERE e.source_file IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM endpoint_sources s WHERE s.endpoint_id = e.id)
+    """,
+]
 
 async def init_db():
     """
-    Creates all tables in the database.
-    
-    Warning: This is for development only! In production, 
+    Creates all tables in the database, then applies SCHEMA_UPGRADES.
+
+    Warning: This is for development only! In production,
     we use 'Alembic' for migrations.
     """
     async with engine.begin() as conn:
         print("Creating tables...")
         await conn.run_sync(Base.metadata.create_all)
+        print("Applying schema upgrades...")
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
         print("Tables created successfully!")
 
 if __name__ == "__main__":
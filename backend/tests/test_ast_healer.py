@@ -0,0 +1,71 @@
+import pytest
+
+from app.ai.ast_healer import ASTHealer, Ambiguous
+
+
+def heal(code, *signature):
+    return ASTHealer.heal(code, *signature)["patched_test_code"]
+
+
+def test_method_and_prefix_change_keeps_values_and_comments():
+    code = (
+        'BASE_URL = "http://localhost:8000"\n'
+        "def test_update():\n"
+        "    # rename the user\n"
+        '    r = httpx.put(f"{BASE_URL}/users/{42}", json={"name": "é"})\n'
+    )
+
+    patched = heal(code, "PATCH", "/v2/users/{id}")
+
+    assert 'httpx.patch(f"{BASE_URL}/v2/users/{42}", json={"name": "é"})' in patched
+    assert "# rename the user" in patched
+
+
+def test_known_old_route_only_touches_its_calls():
+    code = (
+        "def test_get():\n"
+        "    with httpx.Client(base_url=BASE) as client:\n"
+        '        created = client.post("/users", json={})\n'
+        "        r = client.get(f\"/users/{created.json()['id']}?full=1\")\n"
+    )
+
+    patched = heal(code, "GET", "/members/{user_id}", "GET", "/users/{id}")
+
+    assert 'client.post("/users", json={})' in patched
+    assert "client.get(f\"/members/{created.json()['id']}?full=1\")" in patched
+
+
+def test_request_form_and_express_params():
+    patched = heal('r = httpx.request("PUT", "http://h/items/3", json={})\n', "PATCH", "/items/:id")
+
+    assert patched == 'r = httpx.request("PATCH", "http://h/items/3", json={})\n'
+
+
+def test_removed_prefix_and_trailing_slash():
+    patched = heal('r = httpx.get("http://h/api/items/7/")\n', "GET", "/items/{id}")
+
+    assert patched == 'r = httpx.get("http://h/items/7/")\n'
+
+
+def test_renamed_segment_with_base_url_concatenation():
+    patched = heal('r = client.delete(BASE + "/users/7")\n', "DELETE", "/members/{id}")
+
+    assert patched == 'r = client.delete(BASE + "/members/7")\n'
+
+
+@pytest.mark.parametrize("code, signature", [
+    # Several endpoints called and no old route to tell which one changed
+    ('client.post("/users", json={})\nclient.get("/users/1")\n', ("GET", "/v2/users/{id}")),
+    # URL built somewhere else
+    ("r = httpx.get(url)\n", ("GET", "/items")),
+    # httpx.get() can't send the body
+    ('r = httpx.post("http://h/items", json={})\n', ("GET", "/items")),
+    # New parameter the test has no value for
+    ('r = httpx.get("http://h/items")\n', ("GET", "/items/{id}/children")),
+    # Nothing to change
+    ('r = httpx.get("http://h/items/1")\n', ("GET", "/items/{id}")),
+    ("def broken(:\n", ("GET", "/items")),
+])
+def test_ambiguous_cases_are_left_to_the_llm(code, signature):
+    with pytest.raises(Ambiguous):
+        ASTHealer.heal(code, *signature)
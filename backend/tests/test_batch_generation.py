@@ -0,0 +1,139 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from app.ai.llm_runner import LLMRunner
+from app.ai.response_parser import AIResponseParser
+from app.ai.token_counter import TokenCounter
+from app.config import settings
+from app.services.test_generator_service import TestGeneratorService
+
+
+def item(endpoint_id, **overrides):
+    data = {"endpoint_id": str(endpoint_id), "description": "d", "priority": "LOW", "test_code": "import httpx"}
+    data.update(overrides)
+    return data
+
+
+def context(path, project="shop", method="GET"):
+    return {"project_name": project, "framework": "FASTAPI", "method": method, "path": path}
+
+
+class TestParseBatchGeneration:
+    def test_splits_items_by_endpoint_id(self):
+        a, b = uuid.uuid4(), uuid.uuid4()
+        raw = "```json\n" + json.dumps([item(b, description="for b"), item(a)]) + "\n```"
+
+        results = AIResponseParser.parse_batch_generation(raw, [a, b])
+
+        assert set(results) == {str(a), str(b)}
+        assert results[str(b)]["description"] == "for b"
+        assert "endpoint_id" not in results[str(a)]
+
+    def test_leaves_out_incomplete_unknown_and_duplicate_items(self):
+        a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        raw = json.dumps([
+            item(a),
+            item(a, description="duplicate"),
+            item(b, test_code=""),
+            item(uuid.uuid4()),
+            "not an object",
+        ])
+
+        results = AIResponseParser.parse_batch_generation(raw, [a, b, c])
+
+        assert list(results) == [str(a)]
+        assert results[str(a)]["description"] == "d"
+
+    def test_accepts_an_array_wrapped_in_an_object(self):
+        a = uuid.uuid4()
+        raw = json.dumps({"tests": [item(a)]})
+
+        assert set(AIResponseParser.parse_batch_generation(raw, [a])) == {str(a)}
+
+    @pytest.mark.parametrize("raw", ["not json", json.dumps({"description": "d"}), json.dumps([])])
+    def test_raises_without_any_usable_item(self, raw):
+        with pytest.raises(ValueError):
+            AIResponseParser.parse_batch_generation(raw, [uuid.uuid4()])
+
+
+class TestPlanBatches:
+    @pytest.fixture(autouse=True)
+    def predictable_tokens(self, monkeypatch):
+        monkeypatch.setattr(TokenCounter, "count", staticmethod(lambda text: 0))
+        monkeypatch.setattr(settings, "GENERATION_TOKENS_PER_TEST", 100)
+        monkeypatch.setattr(settings, "GENERATION_BATCH_TOKEN_BUDGET", 100000)
+
+    @pytest.fixture
+    def no_content_boundaries(self, monkeypatch):
+        monkeypatch.setattr(TestGeneratorService, "_ends_batch", staticmethod(lambda context, max_size: False))
+
+    def test_batches_are_capped_at_the_max_size(self, monkeypatch, no_content_boundaries):
+        monkeypatch.setattr(settings, "GENERATION_BATCH_MAX", 3)
+        contexts = {uuid.uuid4(): context(f"/r{n}") for n in range(7)}
+
+        batches = TestGeneratorService.plan_batches(contexts)
+
+        assert [len(batch) for batch in batches] == [3, 3, 1]
+        assert sorted(ep for batch in batches for ep in batch) == sorted(contexts)
+
+    def test_batches_stop_at_the_token_budget(self, monkeypatch, no_content_boundaries):
+        monkeypatch.setattr(settings, "GENERATION_BATCH_MAX", 10)
+        monkeypatch.setattr(settings, "GENERATION_BATCH_TOKEN_BUDGET", 250)
+        contexts = {uuid.uuid4(): context(f"/r{n}") for n in range(5)}
+
+        assert [len(batch) for batch in TestGeneratorService.plan_batches(contexts)] == [2, 2, 1]
+
+    def test_an_endpoint_over_budget_still_gets_its_own_batch(self, monkeypatch):
+        monkeypatch.setattr(settings, "GENERATION_BATCH_TOKEN_BUDGET", 10)
+        contexts = {uuid.uuid4(): context(f"/r{n}") for n in range(2)}
+
+        assert [len(batch) for batch in TestGeneratorService.plan_batches(contexts)] == [1, 1]
+
+    def test_projects_are_never_mixed_and_order_is_stable(self, monkeypatch, no_content_boundaries):
+        monkeypatch.setattr(settings, "GENERATION_BATCH_MAX", 10)
+        shop_b, shop_a, blog = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        contexts = {shop_b: context("/b"), blog: context("/a", project="blog"), shop_a: context("/a")}
+
+        assert TestGeneratorService.plan_batches(contexts) == [[blog], [shop_a, shop_b]]
+
+    def test_one_new_route_leaves_the_other_batches_alone(self, monkeypatch):
+        monkeypatch.setattr(settings, "GENERATION_BATCH_MAX", 8)
+        contexts = {uuid.uuid4(): context(f"/r{n:03}") for n in range(200)}
+        before = TestGeneratorService.plan_batches(contexts)
+        contexts[uuid.uuid4()] = context("/r050a")
+        after = TestGeneratorService.plan_batches(contexts)
+
+        def signatures(batches):
+            return [tuple(contexts[ep]["path"] for ep in batch) for batch in batches]
+
+        # Only the run of routes between two content boundaries around the new
+        # one can change (more than one batch if size caps split that run);
+        # cutting every 8 routes would have changed all ~19 later batches
+        changed = set(signatures(after)) - set(signatures(before))
+        assert len(after) > 20
+        assert 1 <= len(changed) <= 3
+        assert any("/r050a" in batch for batch in changed)
+
+
+class TestBatchPrompt:
+    def test_prompt_names_routes_by_label_and_maps_answers_back(self, monkeypatch):
+        first, second = uuid.uuid4(), uuid.uuid4()
+        prompts = []
+
+        async def complete(profile, prompt, version, parse, **kwargs):
+            prompts.append(prompt)
+            return parse(json.dumps([item("E2", description="second"), item("E1")]))
+
+        monkeypatch.setattr(LLMRunner, "complete", complete)
+        contexts = {first: context("/a"), second: context("/b")}
+        results = asyncio.run(TestGeneratorService.generate_batch(contexts))
+
+        assert results[second]["description"] == "second" and set(results) == {first, second}
+        assert str(first) not in prompts[0] and "E1 | FASTAPI | GET | /a" in prompts[0]
+
+        # Same routes under new ids (rescan): the very same prompt, so a cache hit
+        asyncio.run(TestGeneratorService.generate_batch({uuid.uuid4(): context("/a"), uuid.uuid4(): context("/b")}))
+        assert prompts[1] == prompts[0]
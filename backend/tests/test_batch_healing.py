@@ -0,0 +1,139 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.ai.llm_runner import LLMRunner
+from app.config import settings
+from app.services.endpoint_history_service import EndpointHistoryService
+from app.services.self_healing_service import SelfHealingService
+
+
+def target(test_id, code, endpoint_id="ep", previous=()):
+    return {
+        "id": test_id, "test_code": code, "description": "d", "endpoint_id": endpoint_id,
+        "method": "GET", "path": "/members/{id}", "framework": "FASTAPI", "previous": list(previous),
+    }
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Records the AI calls: ("one", old) per test, ("batch", old, tests) per batched prompt."""
+    calls = []
+
+    async def heal_with_llm(test_code, framework, method, path, old, project_id=None, use_cache=True):
+        calls.append(("one", old))
+        if "boom" in test_code:
+            raise ValueError("no JSON")
+        return {"reason": "llm", "patched_test_code": test_code + "# healed\n"}
+
+    async def heal_batch_with_llm(tests, old, project_id=None, use_cache=True):
+        calls.append(("batch", old, len(tests)))
+        # The answer leaves out the tests it can't heal
+        return {
+            test["id"]: {"reason": "llm", "patched_test_code": test["test_code"] + "# healed\n"}
+            for test in tests if "boom" not in test["test_code"]
+        }
+
+    monkeypatch.setattr(SelfHealingService, "heal_with_llm", heal_with_llm)
+    monkeypatch.setattr(SelfHealingService, "heal_batch_with_llm", heal_batch_with_llm)
+    return calls
+
+
+def test_groups_by_signature_change():
+    renamed = [("GET", "/users/{id}")]
+    targets = [
+        target(1, "", "a", renamed),
+        target(2, "", "a", renamed),
+        target(3, "", "a"), # Written after the rename was recorded
+        target(4, "", "b", renamed), # Same change, recorded on another endpoint row
+        {**target(5, "", "a", renamed), "method": "PUT"}, # Same old route, another new one
+    ]
+
+    groups = SelfHealingService.group_targets(targets)
+
+    assert [[t["id"] for t in group] for group in groups] == [[1, 2, 4], [3], [5]]
+
+
+def test_signature_learned_from_one_test_heals_the_rest(llm):
+    group = [
+        # Calls several endpoints: can't be healed without knowing the old route
+        target(1, 'client.post("/users", json={})\nr = client.get(f"/users/{uid}")\n'),
+        # Single call: the old route is inferred, then reused for test 1
+        target(2, 'r = httpx.get(f"{BASE}/users/{7}")\n'),
+        # URL built elsewhere: only the AI can fix it
+        target(3, "r = httpx.get(url)\n"),
+    ]
+
+    results = asyncio.run(SelfHealingService.heal_group(group, asyncio.Semaphore(2)))
+
+    by_id = {test["id"]: (patch_data, healed_by, error) for test, patch_data, healed_by, error in results}
+    assert by_id[2][1] == "ast"
+    assert by_id[1][1] == "ast"
+    assert 'client.post("/users", json={})' in by_id[1][0]["patched_test_code"]
+    assert 'client.get(f"/members/{uid}")' in by_id[1][0]["patched_test_code"]
+    assert by_id[3][1] == "llm"
+    # The AI is told the old route the group learned
+    assert llm == [("one", ("GET", "/users/{7}"))]
+
+
+def test_failed_ai_heal_is_reported_per_test(llm):
+    renamed = [("GET", "/users/{id}")]
+    group = [target(1, "r = httpx.get(url)  # boom\n", previous=renamed), target(2, "r = httpx.get(url)\n", previous=renamed)]
+
+    results = asyncio.run(SelfHealingService.heal_group(group, asyncio.Semaphore(1)))
+
+    outcome = {test["id"]: (healed_by, type(error).__name__ if error else None) for test, _, healed_by, error in results}
+    assert outcome == {1: (None, "ValueError"), 2: ("llm", None)}
+    # Test 1, missing from the batched answer, got a call of its own
+    assert llm == [("batch", ("GET", "/users/{id}"), 2), ("one", ("GET", "/users/{id}"))]
+
+
+def test_one_ai_call_per_group_of_the_same_change(llm, monkeypatch):
+    monkeypatch.setattr(settings, "HEALING_BATCH_MAX", 8)
+    renamed = [("GET", "/users/{id}")]
+    targets = [target(i, f"r = httpx.get(url_{i})\n", f"ep{i % 2}", renamed) for i in range(20)]
+    targets += [{**target(100 + i, f"r = httpx.get(url_{i})\n", "ep2", renamed), "path": "/people/{id}"} for i in range(3)]
+
+    groups = SelfHealingService.group_targets(targets)
+    calls_per_group = []
+    for group in groups:
+        llm.clear()
+        results = asyncio.run(SelfHealingService.heal_group(group, asyncio.Semaphore(4)))
+        assert all(error is None and healed_by == "llm" for _, _, healed_by, error in results)
+        calls_per_group.append(sorted(llm))
+
+    # 20 tests -> /members/{id}: ceil(20 / 8) prompts; 3 tests -> /people/{id}: one
+    assert calls_per_group == [
+        [("batch", ("GET", "/users/{id}"), 4), ("batch", ("GET", "/users/{id}"), 8), ("batch", ("GET", "/users/{id}"), 8)],
+        [("batch", ("GET", "/users/{id}"), 3)],
+    ]
+
+
+def test_batched_heal_prompt_maps_labels_back(monkeypatch):
+    prompts = []
+
+    async def complete(profile, prompt, version, parse, **kwargs):
+        prompts.append(prompt)
+        answer = '[{"test_id": "T2", "reason": "r", "patched_test_code": "x = 2"}, {"test_id": "T9", "reason": "r", "patched_test_code": "x = 9"}]'
+        return kwargs["validate"](parse(answer))
+
+    monkeypatch.setattr(LLMRunner, "complete", complete)
+    tests = [target("id-a", "a = 1\n"), target("id-b", "b = 1\n")]
+
+    patches = asyncio.run(SelfHealingService.heal_batch_with_llm(tests, ("GET", "/users/{id}")))
+
+    assert patches == {"id-b": {"reason": "r", "patched_test_code": "x = 2"}}
+    assert "--- T1 ---\na = 1" in prompts[0] and "id-a" not in prompts[0]
+
+
+def test_only_renames_after_the_test_was_written_count():
+    renames = [
+        (datetime(2024, 3, 1), "GET", "/b"),
+        (datetime(2024, 2, 1), "GET", "/a"),
+        (datetime(2024, 1, 1), "GET", "/b"),
+    ]
+
+    assert EndpointHistoryService.signatures_since(renames, None) == [("GET", "/b"), ("GET", "/a")]
+    assert EndpointHistoryService.signatures_since(renames, datetime(2024, 1, 15)) == [("GET", "/b"), ("GET", "/a")]
+    assert EndpointHistoryService.signatures_since(renames, datetime(2024, 2, 15)) == [("GET", "/b")]
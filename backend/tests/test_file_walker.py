@@ -0,0 +1,151 @@
+import os
+
+from app.utils.file_walker import FileWalker, IgnoreRules
+
+
+def rules(*lines, base=""):
+    ignore = IgnoreRules()
+    ignore.add_lines(lines, base)
+    return ignore
+
+
+def write(root, rel_path, content="x"):
+    path = os.path.join(root, *rel_path.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def relative(root, paths):
+    return sorted(os.path.relpath(p, root).replace(os.sep, "/") for p in paths)
+
+
+class TestIgnoreRules:
+    def test_unanchored_pattern_matches_at_any_depth(self):
+        ignore = rules("*.min.js")
+        assert ignore.is_ignored("app.min.js", False)
+        assert ignore.is_ignored("static/js/app.min.js", False)
+        assert not ignore.is_ignored("static/js/app.js", False)
+
+    def test_leading_slash_anchors_to_root(self):
+        ignore = rules("/build")
+        assert ignore.is_ignored("build", True)
+        assert not ignore.is_ignored("src/build", True)
+
+    def test_inner_slash_anchors_too(self):
+        ignore = rules("docs/api")
+        assert ignore.is_ignored("docs/api", True)
+        assert not ignore.is_ignored("src/docs/api", True)
+
+    def test_trailing_slash_only_matches_directories(self):
+        ignore = rules("generated/")
+        assert ignore.is_ignored("src/generated", True)
+        assert not ignore.is_ignored("src/generated", False)
+
+    def test_double_star(self):
+        ignore = rules("src/**/fixtures", "logs/**")
+        assert ignore.is_ignored("src/fixtures", True)
+        assert ignore.is_ignored("src/a/b/fixtures", True)
+        assert not ignore.is_ignored("lib/fixtures", True)
+        assert ignore.is_ignored("logs/2024/app.py", False)
+
+    def test_single_star_and_question_mark_stop_at_slashes(self):
+        ignore = rules("/src/*.py", "v?.js")
+        assert ignore.is_ignored("src/a.py", False)
+        assert not ignore.is_ignored("src/pkg/a.py", False)
+        assert ignore.is_ignored("v1.js", False)
+        assert not ignore.is_ignored("v10.js", False)
+
+    def test_character_class(self):
+        ignore = rules("test_[ab].py")
+        assert ignore.is_ignored("test_a.py", False)
+        assert not ignore.is_ignored("test_c.py", False)
+
+    def test_negation_last_match_wins(self):
+        ignore = rules("*.py", "!keep.py")
+        assert ignore.is_ignored("drop.py", False)
+        assert not ignore.is_ignored("keep.py", False)
+
+        reignored = rules("*.py", "!keep.py", "keep.py")
+        assert reignored.is_ignored("keep.py", False)
+
+    def test_comments_blank_lines_and_escapes(self):
+        ignore = rules("# a comment", "", "   ", "\\#literal.py", "\\!bang.py")
+        assert ignore.is_ignored("#literal.py", False)
+        assert ignore.is_ignored("!bang.py", False)
+        assert not ignore.is_ignored("a comment", False)
+
+    def test_nested_rules_only_apply_below_their_base(self):
+        ignore = rules("*.js", "/local.py", base="web")
+        assert ignore.is_ignored("web/app.js", False)
+        assert ignore.is_ignored("web/deep/app.js", False)
+        assert not ignore.is_ignored("api/app.js", False)
+        assert ignore.is_ignored("web/local.py", False)
+        assert not ignore.is_ignored("web/sub/local.py", False)
+        # A folder that merely starts with the base name is not below it
+        assert not ignore.is_ignored("website/app.js", False)
+
+
+class TestFileWalker:
+    def test_walk_prunes_and_respects_ignore_files(self, tmp_path):
+        root = str(tmp_path)
+        write(root, ".gitignore", "dist/\n*.gen.py\n")
+        write(root, "app/main.py")
+        write(root, "app/models.gen.py")
+        write(root, "dist/bundle.js")
+        write(root, "node_modules/lib/index.js")
+        write(root, "web/.testgenignore", "legacy/\n!keep.gen.py\n")
+        write(root, "web/routes.js")
+        write(root, "web/legacy/old.js")
+        write(root, "web/keep.gen.py")
+        write(root, "README.md")
+        write(root, "logo.png")
+
+        paths, stats = FileWalker.walk(root, extensions=(".py", ".js"))
+
+        assert relative(root, paths) == ["app/main.py", "web/keep.gen.py", "web/routes.js"]
+        assert stats["files"] == 3
+        # dist, node_modules and web/legacy are never entered
+        assert stats["pruned_dirs"] == 3
+        # models.gen.py (ignored) and logo.png (binary); README.md isn't counted
+        assert stats["skipped_files"] == 2
+
+    def test_walk_applies_project_patterns_and_size_limit(self, tmp_path):
+        root = str(tmp_path)
+        write(root, "src/api.py")
+        write(root, "src/big.js", "x" * 2048)
+        write(root, "vendor/lib.py")
+
+        paths, stats = FileWalker.walk(root, extensions=(".py", ".js"), extra_patterns="vendor/", max_file_bytes=1024)
+
+        assert relative(root, paths) == ["src/api.py"]
+        assert stats["skipped_bytes"] == 2048
+
+    def test_walk_subtrees(self, tmp_path):
+        root = str(tmp_path)
+        write(root, "main.py")
+        write(root, "a/one.py")
+        write(root, "b/two.py")
+        write(root, "c/three.py")
+
+        assert relative(root, FileWalker.walk(root, (".py",), subtrees=["", "b"])[0]) == ["b/two.py", "main.py"]
+        assert relative(root, FileWalker.walk(root, (".py",), subtrees=["a"])[0]) == ["a/one.py"]
+
+    def test_filter_paths_matches_walk(self, tmp_path):
+        root = str(tmp_path)
+        write(root, ".gitignore", "build/\n")
+        write(root, "pkg/.gitignore", "*_test.py\n")
+        write(root, "pkg/api.py")
+        write(root, "pkg/api_test.py")
+        write(root, "build/out.py")
+        write(root, "node_modules/x/index.js")
+        write(root, "notes.txt")
+
+        kept = FileWalker.filter_paths(
+            root,
+            ["pkg/api.py", "pkg/api_test.py", "build/out.py", "node_modules/x/index.js", "notes.txt", "gone.py"],
+            extensions=(".py", ".js")
+        )
+
+        assert relative(root, kept) == ["pkg/api.py"]
+        assert relative(root, kept) == relative(root, FileWalker.walk(root, (".py", ".js"))[0])
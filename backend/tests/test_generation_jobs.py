@@ -0,0 +1,35 @@
+import uuid
+from datetime import datetime
+
+from app.domain.models import user, api_key, project, endpoint, endpoint_source, test_case, test_run # noqa: F401 (mappers)
+from app.domain.models.generation_job import GenerationJob, GenerationJobItem
+from app.dto.generation_job_dto import adapt_generation_job
+from app.services.generation_job_service import GenerationJobService
+
+
+def test_same_batch_gets_the_same_dedupe_key():
+    project_id = uuid.uuid4()
+    a, b = str(uuid.uuid4()), str(uuid.uuid4())
+
+    key = GenerationJobService.dedupe_key(project_id, [a, b])
+
+    assert key == GenerationJobService.dedupe_key(project_id, [b, a, b])
+    assert key != GenerationJobService.dedupe_key(project_id, [a])
+    assert key != GenerationJobService.dedupe_key(uuid.uuid4(), [a, b])
+
+
+def test_job_dto_counts_items_by_status():
+    job = GenerationJob(id=uuid.uuid4(), status="RUNNING", total=3, created_at=datetime(2024, 1, 1))
+    test_case_id = uuid.uuid4()
+    items = [
+        GenerationJobItem(endpoint_id="a", status="DONE", test_case_id=test_case_id, attempts=1),
+        GenerationJobItem(endpoint_id="b", status="FAILED", error="Endpoint not found.", attempts=2),
+        GenerationJobItem(endpoint_id="c", status="PENDING"),
+    ]
+
+    dto = adapt_generation_job(job, items)
+
+    assert (dto.completed, dto.failed, dto.pending) == (1, 1, 1)
+    assert dto.items[0].test_case_id == test_case_id
+    assert dto.items[2].attempts == 0
+    assert dto.model_dump(by_alias=True)["items"][1]["endpointId"] == "b"
@@ -0,0 +1,139 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.ai import llm_runner
+from app.ai.llm_runner import LLMRunner
+from app.ai.telemetry import LLMTelemetry
+from app.config import settings
+
+
+@pytest.fixture
+def telemetry(monkeypatch):
+    monkeypatch.setattr(LLMTelemetry, "_buffer", [])
+    monkeypatch.setattr(LLMTelemetry, "_oldest", None)
+    monkeypatch.setattr(settings, "LLM_TELEMETRY_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_TELEMETRY_BATCH", 1000)
+    monkeypatch.setattr(settings, "LLM_TELEMETRY_FLUSH_SECONDS", 3600)
+    return LLMTelemetry
+
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    def __init__(self, content):
+        self.content = content
+
+    async def ainvoke(self, prompt):
+        return FakeMessage(self.content)
+
+
+@pytest.fixture
+def fake_llm(monkeypatch, telemetry):
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://127.0.0.1:1/0")
+
+    def use(content):
+        monkeypatch.setattr(llm_runner, "get_llm", lambda profile, model=None: FakeLLM(content))
+    return use
+
+
+def test_price_uses_per_model_prices_then_defaults(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PRICES", {"big": {"prompt": 10, "completion": 30}})
+    monkeypatch.setattr(settings, "LLM_PRICE_PROMPT_PER_MTOK", 1)
+    monkeypatch.setattr(settings, "LLM_PRICE_COMPLETION_PER_MTOK", 2)
+
+    assert LLMTelemetry.price("big", 1_000_000, 100_000) == pytest.approx(13)
+    assert LLMTelemetry.price("small", 1_000_000, 1_000_000) == pytest.approx(3)
+
+
+def test_records_are_due_by_size_or_age(telemetry, monkeypatch):
+    assert not telemetry.due()
+    telemetry.record("generation", "m", "OK")
+    assert not telemetry.due()
+
+    monkeypatch.setattr(settings, "LLM_TELEMETRY_BATCH", 2)
+    telemetry.record("generation", "m", "OK")
+    assert telemetry.due()
+
+    monkeypatch.setattr(settings, "LLM_TELEMETRY_BATCH", 100)
+    monkeypatch.setattr(settings, "LLM_TELEMETRY_FLUSH_SECONDS", 0)
+    assert telemetry.due()
+
+
+def test_buffer_is_capped(telemetry, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_TELEMETRY_MAX_BUFFER", 3)
+    for n in range(5):
+        telemetry.record("generation", "m", "OK", results=n)
+
+    assert [row["results"] for row in telemetry._buffer] == [2, 3, 4]
+
+
+def test_cache_hits_cost_nothing(telemetry, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PRICE_PROMPT_PER_MTOK", 5)
+    telemetry.record("generation", "m", "OK", prompt_tokens=1000, cache_hit=True)
+    telemetry.record("generation", "m", "OK", prompt_tokens=1000)
+
+    assert [row["cost_usd"] for row in telemetry._buffer] == [0.0, pytest.approx(0.005)]
+
+
+def test_runner_records_successful_calls(fake_llm, telemetry):
+    fake_llm('{"test_code": "x"}')
+    project_id = uuid.uuid4()
+
+    asyncio.run(LLMRunner.complete(
+        "generation", "prompt", "1", lambda raw: {"a": 1, "b": 2}, project_id=project_id, count_results=len
+    ))
+
+    [row] = telemetry._buffer
+    assert row["outcome"] == "OK" and row["parse_ok"]
+    assert row["results"] == 2
+    assert row["project_id"] == project_id
+    assert row["completion_tokens"] > 0
+    assert row["latency_ms"] is not None
+    assert row["ttft_ms"] is None # Not streamed
+
+
+def test_runner_records_parse_failures(fake_llm, telemetry):
+    fake_llm("I can't do that")
+
+    def parse(raw):
+        raise ValueError("no JSON")
+
+    with pytest.raises(ValueError):
+        asyncio.run(LLMRunner.complete("healing", "prompt", "1", parse))
+
+    [row] = telemetry._buffer
+    assert (row["profile"], row["outcome"], row["parse_ok"], row["results"]) == ("healing", "PARSE_ERROR", False, 0)
+
+
+def test_an_escalated_answer_is_one_attempt(fake_llm, telemetry, monkeypatch):
+    monkeypatch.setattr(settings, "HEALING_FAST_MODEL", "fast")
+    fake_llm('{"reason": "r", "patched_test_code": "x"}')
+    answers = iter([ValueError("no JSON"), {"reason": "r"}])
+
+    def parse(raw):
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    asyncio.run(LLMRunner.complete("healing", "prompt", "1", parse))
+    asyncio.run(LLMRunner.complete("healing", "other prompt", "1", lambda raw: {"reason": "r"}))
+
+    first, escalated, other = telemetry._buffer
+    assert (first["outcome"], escalated["outcome"], other["outcome"]) == ("PARSE_ERROR", "OK", "OK")
+    # The fast model's bad answer and the strong model's fix are one heal attempt
+    assert first["attempt_id"] == escalated["attempt_id"] != other["attempt_id"]
+
+
+def test_records_without_an_attempt_are_their_own(telemetry):
+    telemetry.record("healing", "ast", "OK", results=1)
+
+    [row] = telemetry._buffer
+    assert row["attempt_id"] == row["id"]
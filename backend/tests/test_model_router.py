@@ -0,0 +1,163 @@
+import asyncio
+import json
+
+import pytest
+
+from app.ai import llm_runner
+from app.ai.llm_runner import LLMRunner
+from app.ai.model_router import LLMRouter
+from app.ai.response_parser import AIResponseParser
+from app.ai.telemetry import LLMTelemetry
+from app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def router(monkeypatch):
+    monkeypatch.setattr(LLMRouter, "_latencies", {})
+    monkeypatch.setattr(LLMRouter, "_stats", {"calls": 0, "escalations": 0, "hedges_fired": 0, "hedges_won": 0})
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(settings, "LLM_HEDGE_PERCENTILE", 80.0)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY", 0.0)
+    monkeypatch.setattr(settings, "OPENROUTER_MODEL", "strong")
+    monkeypatch.setattr(settings, "GENERATION_MODEL", "")
+    monkeypatch.setattr(settings, "GENERATION_FAST_MODEL", "")
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_TELEMETRY_ENABLED", False)
+    monkeypatch.setattr(LLMTelemetry, "_buffer", [])
+    return LLMRouter
+
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    def __init__(self, model, answers, calls):
+        self.model, self.answers, self.calls = model, answers, calls
+
+    async def ainvoke(self, prompt):
+        self.calls.append(self.model)
+        delay, content = self.answers[self.model]
+        await asyncio.sleep(delay)
+        return FakeMessage(content)
+
+
+def use_models(monkeypatch, answers):
+    calls = []
+    monkeypatch.setattr(llm_runner, "get_llm", lambda profile, model=None: FakeLLM(model, answers, calls))
+    return calls
+
+
+GOOD = json.dumps({"description": "d", "priority": "LOW", "test_code": "assert True"})
+
+
+def test_route_puts_the_fast_model_first(router, monkeypatch):
+    assert router.route("generation") == ["strong"]
+
+    monkeypatch.setattr(settings, "GENERATION_FAST_MODEL", "fast")
+    assert router.route("generation") == ["fast", "strong"]
+    assert router.route("healing") == ["strong"]
+
+
+def test_no_hedging_until_enough_latencies(router):
+    for seconds in (1, 2, 3, 4):
+        router.record_latency("m", seconds)
+    assert router.hedge_delay("m") is None
+
+    router.record_latency("m", 5)
+    assert router.hedge_delay("m") == 5 # p80 of 1..5
+
+
+def test_slow_call_is_hedged_and_the_loser_cancelled(router):
+    for _ in range(5):
+        router.record_latency("m", 0.01)
+    started, cancelled = [], []
+
+    async def call(on_flight):
+        n = len(started)
+        started.append(n)
+        on_flight(True)
+        try:
+            await asyncio.sleep(1.0 if n == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+        return n
+
+    assert asyncio.run(router.hedged("m", call)) == 1
+    assert cancelled == [0]
+    assert router._stats["hedges_won"] == 1
+
+
+def test_a_failed_hedge_does_not_hide_the_original_answer(router):
+    for _ in range(5):
+        router.record_latency("m", 0.01)
+    started = []
+
+    async def call(on_flight):
+        n = len(started)
+        started.append(n)
+        on_flight(True)
+        if n == 1:
+            raise RuntimeError("provider error")
+        await asyncio.sleep(0.1)
+        return n
+
+    assert asyncio.run(router.hedged("m", call)) == 0
+
+
+def test_rate_limit_waits_do_not_trigger_a_hedge(router, monkeypatch):
+    for _ in range(5):
+        router.record_latency("m", 0.05)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_ENABLED", True)
+    acquired = []
+
+    async def acquire(model, tokens):
+        await asyncio.sleep(0.3) # Queued well past the hedge delay
+        acquired.append(model)
+
+    async def send():
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    monkeypatch.setattr(llm_runner.LLMRateLimiter, "acquire", acquire)
+    call = lambda on_flight: LLMRunner._invoke("generation", "m", 10, send, on_flight)
+
+    assert asyncio.run(router.hedged("m", call)) == "answer"
+    assert acquired == ["m"]
+    assert router._stats["hedges_fired"] == 0
+
+
+def test_rejected_answer_is_escalated_to_the_strong_model(monkeypatch):
+    monkeypatch.setattr(settings, "GENERATION_FAST_MODEL", "fast")
+    broken = json.dumps({"description": "d", "priority": "LOW", "test_code": "def broken(:"})
+    calls = use_models(monkeypatch, {"fast": (0, broken), "strong": (0, GOOD)})
+
+    data = asyncio.run(LLMRunner.complete(
+        "generation", "prompt", "1", AIResponseParser.parse_test_generation,
+        validate=AIResponseParser.validate_test
+    ))
+
+    assert data["test_code"] == "assert True"
+    assert calls == ["fast", "strong"]
+    assert LLMRouter._stats["escalations"] == 1
+
+
+def test_good_fast_answer_never_reaches_the_strong_model(monkeypatch):
+    monkeypatch.setattr(settings, "GENERATION_FAST_MODEL", "fast")
+    calls = use_models(monkeypatch, {"fast": (0, GOOD), "strong": (0, GOOD)})
+
+    asyncio.run(LLMRunner.complete("generation", "prompt", "1", AIResponseParser.parse_test_generation))
+
+    assert calls == ["fast"]
+
+
+def test_batch_validation_drops_items_that_do_not_compile():
+    data = {"a": {"test_code": "assert True"}, "b": {"test_code": "def (:"}}
+    assert list(AIResponseParser.validate_batch(data)) == ["a"]
+
+    with pytest.raises(ValueError):
+        AIResponseParser.validate_batch({"b": {"test_code": "def (:"}})
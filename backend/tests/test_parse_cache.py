@@ -0,0 +1,85 @@
+import os
+import subprocess
+
+import pytest
+
+from app.config import settings
+from app.services.scanner_service import ScannerService
+from app.utils.parse_cache import ParseCache
+
+USERS_V1 = '''from fastapi import APIRouter
+router = APIRouter()
+
+@router.get("/users/{user_id}")
+def get_user(user_id: int):
+    return {}
+'''
+
+ORDERS = '''from fastapi import APIRouter
+router = APIRouter()
+
+@router.get("/orders")
+def list_orders():
+    return []
+'''
+
+
+def git(repo, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PARSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "PARSE_CACHE_PATH", str(tmp_path / "parse_cache.sqlite3"))
+    monkeypatch.setattr(settings, "SCAN_WORKERS", 1)
+    path = str(tmp_path / "repo")
+    os.makedirs(path)
+    git(path, "init", "-q")
+    for name, content in (("users.py", USERS_V1), ("orders.py", ORDERS)):
+        with open(os.path.join(path, name), "w", encoding="utf-8") as f:
+            f.write(content)
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "init")
+    return path
+
+
+def scan(repo):
+    files = [os.path.join(repo, name) for name in ("users.py", "orders.py")]
+    return ScannerService.group_routes(ScannerService.parse_files(repo, files))
+
+
+def test_cached_routes_keep_their_line(repo):
+    first = scan(repo)
+    hits = ParseCache.metrics["hits"]
+    second = scan(repo)
+
+    assert ParseCache.metrics["hits"] == hits + 2
+    assert second == first
+    assert second[("GET", "/users/{user_id}")]["lines"] == {"users.py": 4}
+
+
+def test_rename_is_detected_after_a_cached_scan(repo):
+    scan(repo)
+    cached = scan(repo) # users.py and orders.py both come from the cache
+    existing = [
+        (ep_id, method, path, route["framework"], "users.py" if "users" in path else "orders.py",
+         route["lines"][next(iter(route["files"]))], next(iter(route["files"])))
+        for ep_id, ((method, path), route) in enumerate(sorted(cached.items()))
+    ]
+
+    with open(os.path.join(repo, "users.py"), "w", encoding="utf-8") as f:
+        f.write(USERS_V1.replace('@router.get("/users/{user_id}")', '@router.put("/v2/users/{user_id}")'))
+    git(repo, "commit", "-q", "-am", "rename")
+
+    plan = ScannerService.plan_reconcile(existing, scan(repo))
+
+    assert plan["vanished"] == []
+    [rename] = plan["renames"]
+    assert (rename["method"], rename["path"], rename["source_line"]) == ("PUT", "/v2/users/{user_id}", 4)
+    # The untouched file came from the cache and keeps its line: no NULL write
+    [orders] = [upsert for upsert in plan["upserts"] if upsert["path"] == "/orders"]
+    assert orders["source_line"] == 4
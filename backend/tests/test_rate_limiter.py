@@ -0,0 +1,77 @@
+import httpx
+import openai
+import pytest
+
+from app.ai.rate_limiter import LLMRateLimiter
+from app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiter(monkeypatch):
+    monkeypatch.setattr(LLMRateLimiter, "_local_buckets", {})
+    monkeypatch.setattr(LLMRateLimiter, "_local_backoff", {})
+    monkeypatch.setattr(LLMRateLimiter, "_local_strikes", {})
+    monkeypatch.setattr(settings, "LLM_RPM", 60)
+    monkeypatch.setattr(settings, "LLM_TPM", 6000)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMITS", {})
+
+
+def rate_limit_error(**headers):
+    request = httpx.Request("POST", "https://llm.test/v1/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_per_model_overrides(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMITS", {"fast": {"rpm": 500}})
+
+    assert LLMRateLimiter.limits("fast") == {"rpm": 500, "tpm": 6000}
+    assert LLMRateLimiter.limits("other") == {"rpm": 60, "tpm": 6000}
+
+
+def test_requests_bucket_refills_over_time(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RPM", 2)
+
+    assert LLMRateLimiter._take_local("m", 1, now=100.0) == 0
+    assert LLMRateLimiter._take_local("m", 1, now=100.0) == 0
+    # Empty: one request comes back every 30s at 2 RPM
+    assert LLMRateLimiter._take_local("m", 1, now=100.0) == pytest.approx(30.0)
+    assert LLMRateLimiter._take_local("m", 1, now=130.0) == 0
+
+
+def test_tokens_bucket_delays_big_prompts():
+    assert LLMRateLimiter._take_local("m", 5000, now=0.0) == 0
+    # 1000 tokens left, 3000 wanted: 2000 more take 20s at 6000 TPM
+    assert LLMRateLimiter._take_local("m", 3000, now=0.0) == pytest.approx(20.0)
+
+
+def test_prompt_bigger_than_the_budget_still_goes_through():
+    assert LLMRateLimiter._take_local("m", 10 ** 6, now=0.0) == 0
+
+
+def test_backoff_honours_retry_after_and_grows(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BACKOFF_BASE_SECONDS", 2.0)
+    monkeypatch.setattr(settings, "LLM_BACKOFF_MAX_SECONDS", 60.0)
+
+    assert 2.0 <= LLMRateLimiter.backoff_seconds(1, None) <= 2.4
+    assert 8.0 <= LLMRateLimiter.backoff_seconds(3, None) <= 9.6
+    assert 30.0 <= LLMRateLimiter.backoff_seconds(1, 30.0) <= 36.0
+    assert LLMRateLimiter.backoff_seconds(20, None) <= 72.0
+
+
+def test_retry_after_header_forms():
+    assert LLMRateLimiter.retry_after(rate_limit_error(**{"retry-after": "7"})) == 7.0
+    assert LLMRateLimiter.retry_after(rate_limit_error(**{"retry-after-ms": "1500"})) == 1.5
+    assert LLMRateLimiter.retry_after(rate_limit_error(**{"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert LLMRateLimiter.retry_after(rate_limit_error()) is None
+
+
+def test_a_429_blocks_the_model_until_the_backoff_ends(monkeypatch):
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://127.0.0.1:1/0")
+
+    delay = LLMRateLimiter._record_rate_limited("m", retry_after=5.0)
+
+    assert delay >= 5.0
+    until = LLMRateLimiter._local_backoff["m"]
+    assert LLMRateLimiter._take_local("m", 1, now=until - 1) == pytest.approx(1.0)
+    assert LLMRateLimiter._take_local("m", 1, now=until + 1) == 0
@@ -0,0 +1,165 @@
+from app.services.scanner_service import ScannerService
+
+
+def found(method, path, source_file, framework="EXPRESS", line=None):
+    return {"method": method, "path": path, "framework": framework, "source_file": source_file, "line": line}
+
+
+def row(ep_id, method, path, primary, linked, framework="EXPRESS", line=None):
+    return (ep_id, method, path, framework, primary, line, linked)
+
+
+def test_group_routes_keeps_every_declaring_file():
+    fresh = ScannerService.group_routes([
+        found("GET", "/", "users/routes.js"),
+        found("GET", "/", "orders/routes.js"),
+        found("POST", "/", "users/routes.js"),
+    ])
+    assert fresh[("GET", "/")]["files"] == {"users/routes.js", "orders/routes.js"}
+    assert fresh[("POST", "/")]["files"] == {"users/routes.js"}
+
+
+def test_full_scan_inserts_new_routes_with_their_links():
+    fresh = ScannerService.group_routes([found("GET", "/", "b.js"), found("GET", "/", "a.js")])
+
+    plan = ScannerService.plan_reconcile([], fresh)
+
+    assert plan["vanished"] == []
+    assert plan["upserts"] == [{"method": "GET", "path": "/", "framework": "EXPRESS", "source_file": "a.js", "source_line": None}]
+    assert plan["link"] == [("GET", "/", "a.js"), ("GET", "/", "b.js")]
+
+
+def test_full_scan_removes_routes_that_are_gone():
+    existing = [row(1, "GET", "/old", "a.js", "a.js"), row(2, "GET", "/", "a.js", "a.js")]
+    fresh = ScannerService.group_routes([found("GET", "/", "a.js")])
+
+    plan = ScannerService.plan_reconcile(existing, fresh)
+
+    assert plan["vanished"] == [1]
+    assert plan["unlink"] == [] and plan["link"] == []
+
+
+def test_incremental_scan_keeps_route_declared_in_untouched_file():
+    # GET / is declared in two routers; only a.js changed and no longer declares it
+    existing = [row(1, "GET", "/", "a.js", "a.js"), row(1, "GET", "/", "a.js", "b.js")]
+
+    plan = ScannerService.plan_reconcile(existing, {}, scope_files={"a.js"})
+
+    assert plan["vanished"] == []
+    assert plan["unlink"] == [(1, "a.js")]
+    # The primary file moves to the one that still declares the route
+    assert plan["upserts"] == [{"method": "GET", "path": "/", "framework": "EXPRESS", "source_file": "b.js", "source_line": None}]
+
+
+def test_incremental_scan_deletes_route_once_no_file_declares_it():
+    existing = [row(1, "GET", "/", "a.js", "a.js"), row(1, "GET", "/", "a.js", "b.js")]
+
+    plan = ScannerService.plan_reconcile(existing, {}, scope_files={"a.js", "b.js"})
+
+    assert plan["vanished"] == [1]
+
+
+def test_incremental_scan_adds_new_declaring_file_without_touching_others():
+    existing = [row(1, "GET", "/", "a.js", "a.js"), row(2, "GET", "/other", "z.js", "z.js")]
+    fresh = ScannerService.group_routes([found("GET", "/", "c.js")])
+
+    plan = ScannerService.plan_reconcile(existing, fresh, scope_files={"c.js"})
+
+    assert plan["vanished"] == []
+    assert plan["unlink"] == []
+    assert plan["link"] == [("GET", "/", "c.js")]
+    # a.js still declares it, so it stays the primary file
+    assert plan["upserts"] == [{"method": "GET", "path": "/", "framework": "EXPRESS", "source_file": "a.js", "source_line": None}]
+
+
+def test_incremental_scan_leaves_routes_outside_the_scope_alone():
+    existing = [row(1, "GET", "/", "a.js", "a.js")]
+
+    plan = ScannerService.plan_reconcile(existing, {}, scope_files={"b.js"})
+
+    assert plan == {"vanished": [], "renames": [], "upserts": [], "unlink": [], "link": [], "history": []}
+
+
+def test_endpoint_without_links_falls_back_to_its_source_file():
+    # Rows from before file links existed
+    existing = [row(1, "GET", "/", "a.js", None), row(2, "GET", "/unknown", None, None)]
+
+    plan = ScannerService.plan_reconcile(existing, {}, scope_files={"b.js"})
+    assert plan["vanished"] == []
+    assert plan["link"] == [("GET", "/", "a.js")] # Linked on the way
+
+    plan = ScannerService.plan_reconcile(existing, {}, scope_files={"a.js"})
+    # a.js was re-parsed without GET /; GET /unknown can't be judged and is kept
+    assert plan["vanished"] == [1]
+
+
+def test_group_routes_keeps_the_first_line_per_file():
+    fresh = ScannerService.group_routes([
+        found("GET", "/", "a.js", line=9), found("GET", "/", "a.js", line=3), found("GET", "/", "b.js", line=5),
+    ])
+    assert fresh[("GET", "/")]["lines"] == {"a.js": 3, "b.js": 5}
+
+
+def test_route_edited_on_its_line_is_renamed_in_place():
+    existing = [row(1, "GET", "/users/:id", "a.js", "a.js", line=12), row(2, "GET", "/", "a.js", "a.js", line=4)]
+    fresh = ScannerService.group_routes([
+        found("GET", "/", "a.js", line=4), found("PUT", "/v2/users/:id", "a.js", line=12),
+    ])
+
+    plan = ScannerService.plan_reconcile(existing, fresh, scope_files={"a.js"})
+
+    assert plan["vanished"] == []
+    assert plan["renames"] == [{
+        "id": 1, "method": "PUT", "path": "/v2/users/:id", "framework": "EXPRESS",
+        "source_file": "a.js", "source_line": 12,
+    }]
+    # Same file, so the link stays; nothing else is inserted
+    assert plan["link"] == [] and plan["unlink"] == []
+    assert [u["path"] for u in plan["upserts"]] == ["/"]
+    [entry] = plan["history"]
+    assert (entry["endpoint_id"], entry["change"], entry["old_method"], entry["old_path"]) == (1, "MODIFIED", "GET", "/users/:id")
+
+
+def test_route_replaced_elsewhere_is_removed_and_added():
+    existing = [row(1, "GET", "/old", "a.js", "a.js", line=12)]
+    fresh = ScannerService.group_routes([found("GET", "/new", "a.js", line=30)])
+
+    plan = ScannerService.plan_reconcile(existing, fresh)
+
+    assert plan["renames"] == [] and plan["vanished"] == [1]
+    assert [(e["change"], e["endpoint_id"], e["path"]) for e in plan["history"]] == [
+        ("REMOVED", 1, "/old"), ("ADDED", None, "/new"),
+    ]
+
+
+def test_ambiguous_line_is_not_a_rename():
+    # Minified bundle: two routes left line 1 and two arrived there
+    existing = [row(1, "GET", "/a", "app.js", "app.js", line=1), row(2, "GET", "/b", "app.js", "app.js", line=1)]
+    fresh = ScannerService.group_routes([found("GET", "/c", "app.js", line=1), found("GET", "/d", "app.js", line=1)])
+
+    plan = ScannerService.plan_reconcile(existing, fresh)
+
+    assert plan["renames"] == []
+    assert sorted(plan["vanished"]) == [1, 2]
+
+
+def test_moved_route_updates_its_line_without_history():
+    existing = [row(1, "GET", "/", "a.js", "a.js", line=4)]
+    fresh = ScannerService.group_routes([found("GET", "/", "a.js", line=8)])
+
+    plan = ScannerService.plan_reconcile(existing, fresh)
+
+    assert plan["upserts"] == [{"method": "GET", "path": "/", "framework": "EXPRESS", "source_file": "a.js", "source_line": 8}]
+    assert plan["history"] == []
+
+
+def test_change_set_from_history():
+    existing = [row(1, "GET", "/old", "a.js", "a.js", line=3), row(2, "GET", "/gone", "b.js", "b.js", line=1)]
+    fresh = ScannerService.group_routes([found("POST", "/old", "a.js", line=3), found("GET", "/new", "c.js", line=2)])
+    history = [
+        {**entry, "endpoint_id": entry["endpoint_id"] or 3}
+        for entry in ScannerService.plan_reconcile(existing, fresh)["history"]
+    ]
+
+    assert ScannerService.change_set(history) == {"added": [3], "removed": [2], "modified": [1], "source_changed": []}
+    assert ScannerService.change_set(history, [4])["source_changed"] == [4]
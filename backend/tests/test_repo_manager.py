@@ -0,0 +1,116 @@
+import os
+import subprocess
+
+import pytest
+
+from app.utils.repo_manager import RepoManager
+
+
+def git(repo, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def write(repo, rel_path, content):
+    path = os.path.join(repo, *rel_path.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def commit(repo, message="change"):
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", message)
+    return git(repo, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = str(tmp_path / "repo")
+    os.makedirs(path)
+    git(path, "init", "-q")
+    return path
+
+
+def test_changed_files_sorts_added_modified_deleted(repo):
+    write(repo, "api/users.py", "a")
+    write(repo, "api/orders.py", "a")
+    write(repo, "web/old.js", "a")
+    old = commit(repo)
+
+    write(repo, "api/users.py", "b")
+    os.remove(os.path.join(repo, "web", "old.js"))
+    write(repo, "api/items.py", "a")
+    new = commit(repo)
+
+    assert RepoManager.changed_files(repo, old, new) == {
+        "added": ["api/items.py"],
+        "modified": ["api/users.py"],
+        "deleted": ["web/old.js"],
+    }
+
+
+def test_changed_files_reports_renames_as_delete_and_add(repo):
+    write(repo, "routes/a.py", "@router.get('/a')\n" * 20)
+    old = commit(repo)
+
+    git(repo, "mv", "routes/a.py", "routes/b.py")
+    new = commit(repo)
+
+    assert RepoManager.changed_files(repo, old, new) == {
+        "added": ["routes/b.py"],
+        "modified": [],
+        "deleted": ["routes/a.py"],
+    }
+
+
+def test_changed_files_handles_special_characters(repo):
+    write(repo, "plain.py", "a")
+    old = commit(repo)
+
+    write(repo, "with space/tab name.py", "a")
+    new = commit(repo)
+
+    changes = RepoManager.changed_files(repo, old, new)
+    assert changes["added"] == ["with space/tab name.py"]
+
+
+def test_changed_files_counts_type_changes_as_modified(repo):
+    write(repo, "target.py", "a")
+    write(repo, "link.py", "a")
+    old = commit(repo)
+
+    os.remove(os.path.join(repo, "link.py"))
+    os.symlink("target.py", os.path.join(repo, "link.py"))
+    new = commit(repo)
+
+    assert RepoManager.changed_files(repo, old, new)["modified"] == ["link.py"]
+
+
+def test_changed_files_none_when_old_commit_is_missing(repo):
+    write(repo, "a.py", "a")
+    new = commit(repo)
+
+    assert RepoManager.changed_files(repo, "0" * 40, new) is None
+
+
+def test_blob_shas_match_git(repo):
+    write(repo, "a.py", "hello")
+    write(repo, "dir/b.js", "world")
+    commit(repo)
+
+    shas = RepoManager.blob_shas(repo)
+    assert set(shas) == {"a.py", "dir/b.js"}
+    assert shas["a.py"] == git(repo, "hash-object", "a.py")
+
+
+def test_changed_files_keeps_non_ascii_paths_unquoted(repo):
+    write(repo, "plain.py", "a")
+    old = commit(repo)
+
+    write(repo, "routes/café.py", "a")
+    new = commit(repo)
+
+    assert RepoManager.changed_files(repo, old, new)["added"] == ["routes/café.py"]
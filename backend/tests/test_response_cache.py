@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from app.ai.response_cache import LLMResponseCache
+from app.config import settings
+
+
+@pytest.fixture
+def disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_BACKEND", "disk")
+    monkeypatch.setattr(settings, "LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite3"))
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://127.0.0.1:1/0")
+    return LLMResponseCache
+
+
+def test_key_changes_with_prompt_model_and_version():
+    key = LLMResponseCache.make_key("prompt", "model-a", "1")
+    assert key == LLMResponseCache.make_key("prompt", "model-a", "1")
+    assert key != LLMResponseCache.make_key("prompt!", "model-a", "1")
+    assert key != LLMResponseCache.make_key("prompt", "model-b", "1")
+    assert key != LLMResponseCache.make_key("prompt", "model-a", "2")
+
+
+def test_round_trip(disk_cache):
+    key = disk_cache.make_key("p", "m", "1")
+    assert disk_cache.get(key) is None
+
+    disk_cache.put(key, {"test_code": "import httpx"})
+
+    assert disk_cache.get(key) == {"test_code": "import httpx"}
+
+
+def test_expired_entries_are_misses(disk_cache, monkeypatch):
+    key = disk_cache.make_key("p", "m", "1")
+    disk_cache.put(key, {"a": 1})
+
+    monkeypatch.setattr(settings, "LLM_CACHE_TTL_SECONDS", 60)
+    real_time = time.time
+    monkeypatch.setattr(time, "time", lambda: real_time() + 120)
+
+    assert disk_cache.get(key) is None
+
+
+def test_least_recently_used_entry_is_evicted(disk_cache, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_MAX_ENTRIES", 2)
+    first, second, third = (disk_cache.make_key(p, "m", "1") for p in ("a", "b", "c"))
+
+    disk_cache.put(first, {"n": 1})
+    disk_cache.put(second, {"n": 2})
+    assert disk_cache.get(first) == {"n": 1} # first is now the most recently used
+    disk_cache.put(third, {"n": 3})
+
+    assert disk_cache.get(second) is None
+    assert disk_cache.get(first) == {"n": 1}
+    assert disk_cache.get(third) == {"n": 3}
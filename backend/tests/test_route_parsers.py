@@ -0,0 +1,23 @@
+from app.utils.route_parsers import RouteParsers
+
+
+def test_routes_carry_their_line():
+    source = (
+        "from fastapi import APIRouter\n"
+        "router = APIRouter()\n"
+        "\n"
+        "@router.get('/users')\n"
+        "def users(): ...\n"
+        "\n"
+        "@router.post(\n"
+        "    '/users')\n"
+        "def create(): ...\n"
+    )
+    routes = RouteParsers.parse_fastapi(source)
+    assert [(r["method"], r["path"], r["line"]) for r in routes] == [("GET", "/users", 4), ("POST", "/users", 7)]
+
+
+def test_express_lines_skip_other_receivers():
+    source = "const x = 1;\nclient.get('/nope');\n\nrouter.delete('/items/:id', handler);\n"
+    routes = RouteParsers.parse_express(source)
+    assert [(r["method"], r["path"], r["line"]) for r in routes] == [("DELETE", "/items/:id", 4)]
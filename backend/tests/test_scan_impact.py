@@ -0,0 +1,114 @@
+import asyncio
+import contextlib
+import uuid
+
+import pytest
+
+from app.config import settings
+from app.workers import scan_job
+
+PROJECT = str(uuid.uuid4())
+
+
+@pytest.fixture
+def dispatch(monkeypatch):
+    events, enqueued, runs = [], [], []
+
+    @contextlib.asynccontextmanager
+    async def session():
+        yield None
+
+    class Task:
+        id = "heal-job"
+
+    def delay(project_id, test_case_ids):
+        enqueued.append(test_case_ids)
+        return Task()
+
+    monkeypatch.setattr(scan_job, "async_session_maker", session)
+    monkeypatch.setattr(scan_job, "emit_event", lambda project_id, event: events.append(event))
+    monkeypatch.setattr(scan_job.run_batch_healing, "delay", delay)
+    monkeypatch.setattr(settings, "HEALING_ON_SCAN", True)
+    monkeypatch.setattr(settings, "RUN_TESTS_ON_SCAN", True)
+
+    class Run:
+        id = uuid.uuid4()
+
+    async def create_run(db, project_id, test_case_ids):
+        return Run(), [str(test_id) for test_id in test_case_ids]
+
+    monkeypatch.setattr(scan_job.TestRunService, "create_run", create_run)
+    monkeypatch.setattr(scan_job.run_tests, "apply_async", lambda args, task_id: runs.append((args, task_id)))
+
+    def run(change_set, tests, rerun=()):
+        async def tests_to_heal(db, changes):
+            return tests
+
+        async def tests_to_run(db, changes):
+            return list(rerun)
+        monkeypatch.setattr(scan_job.ImpactService, "tests_to_heal", tests_to_heal)
+        monkeypatch.setattr(scan_job.ImpactService, "tests_to_run", tests_to_run)
+        return scan_job.dispatch_change_set(asyncio.new_event_loop(), PROJECT, {"source_changed": [], **change_set})
+    run.runs = runs
+    run.run_id = str(Run.id)
+    return run, events, enqueued
+
+
+def test_only_tests_of_modified_endpoints_are_healed(dispatch):
+    run, events, enqueued = dispatch
+    endpoint, test = uuid.uuid4(), uuid.uuid4()
+
+    impact = run({"added": [uuid.uuid4()], "removed": [], "modified": [endpoint]}, [test])
+
+    assert enqueued == [[str(test)]]
+    assert impact["healing_job_id"] == "heal-job" and impact["impacted_tests"] == 1
+    assert impact["changes"]["modified"] == [str(endpoint)]
+    assert events == [{
+        "event": "SCAN_CHANGES", "source_changed": 0, "added": 1, "removed": 0, "modified": 1,
+        "impacted_tests": 1, "rerun_tests": 0, "healing_job_id": "heal-job", "test_run_id": None
+    }]
+    assert run.runs == []
+
+
+def test_scan_without_modified_endpoints_enqueues_nothing(dispatch):
+    run, events, enqueued = dispatch
+
+    impact = run({"added": [uuid.uuid4()], "removed": [uuid.uuid4()], "modified": []}, [uuid.uuid4()])
+
+    assert enqueued == [] and impact["healing_job_id"] is None
+    assert run.runs == [] and impact["test_run_id"] is None
+    assert events[0]["impacted_tests"] == 0
+
+
+def test_impact_failures_never_fail_the_scan(dispatch, monkeypatch):
+    run, events, enqueued = dispatch
+    monkeypatch.setattr(scan_job, "emit_event", lambda project_id, event: 1 / 0)
+
+    impact = run({"added": [], "removed": [], "modified": [uuid.uuid4()]}, [uuid.uuid4()])
+
+    assert impact["healing_job_id"] == "heal-job"
+
+
+def test_tests_of_endpoints_whose_source_changed_are_run_again(dispatch):
+    run, events, enqueued = dispatch
+    renamed, edited = uuid.uuid4(), uuid.uuid4()
+    to_heal, to_rerun = uuid.uuid4(), uuid.uuid4()
+
+    impact = run({"added": [], "removed": [], "modified": [renamed], "source_changed": [edited]}, [to_heal], [to_rerun])
+
+    # Renamed: healed. Same signature, new code: run, not healed
+    assert enqueued == [[str(to_heal)]]
+    assert run.runs == [([PROJECT, run.run_id, [str(to_rerun)]], run.run_id)]
+    assert impact["test_run_id"] == run.run_id and impact["rerun_tests"] == 1
+    assert impact["changes"]["source_changed"] == [str(edited)]
+    assert events[0]["test_run_id"] == run.run_id and events[0]["source_changed"] == 1
+
+
+def test_test_runs_on_scan_can_be_turned_off(dispatch, monkeypatch):
+    run, events, enqueued = dispatch
+    monkeypatch.setattr(settings, "RUN_TESTS_ON_SCAN", False)
+
+    impact = run({"added": [], "removed": [], "modified": [], "source_changed": [uuid.uuid4()]}, [], [uuid.uuid4()])
+
+    assert run.runs == [] and impact["test_run_id"] is None
+    assert impact["rerun_tests"] == 1
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import time
+
+from app.ai.stream_preview import StreamingJSONPreview
+from app.config import settings
+from app.websocket import dispatcher
+from app.websocket.dispatcher import PreviewPublisher
+
+
+def feed_all(text, step=3, **kwargs):
+    preview = StreamingJSONPreview(**kwargs)
+    for i in range(0, len(text), step):
+        preview.feed(text[i:i + step])
+    return preview
+
+
+def test_nothing_before_the_field_starts():
+    preview = feed_all('{"description": "checks users", "prio')
+    assert preview.current() is None
+    assert preview.malformed is None
+
+
+def test_partial_code_is_decoded_as_it_arrives():
+    answer = json.dumps({"description": "d", "priority": "LOW", "test_code": 'import httpx\nassert r.json()["ok"]'})
+    preview = StreamingJSONPreview()
+    seen = []
+    for char in answer:
+        preview.feed(char)
+        current = preview.current()
+        if current:
+            seen.append(current[1])
+
+    assert seen[-1] == 'import httpx\nassert r.json()["ok"]'
+    # Every intermediate value is a clean prefix: escapes are never shown half-received
+    assert all('import httpx\nassert r.json()["ok"]'.startswith(value) for value in seen)
+
+
+def test_unicode_escape_waits_for_all_its_digits():
+    preview = feed_all('{"test_code": "caf\\u00', step=100)
+    assert preview.current() == (None, "caf")
+
+    preview.feed('e9!"}')
+    assert preview.current() == (None, "café!")
+
+
+def test_raw_newlines_inside_the_string_are_tolerated():
+    preview = feed_all('{"test_code": "line one\nline two', step=100)
+    assert preview.current() == (None, "line one\nline two")
+
+
+def test_batched_answers_report_the_endpoint_being_written():
+    answer = json.dumps([
+        {"endpoint_id": "a", "description": "d", "priority": "LOW", "test_code": "first"},
+        {"endpoint_id": "b", "description": "d", "priority": "LOW", "test_code": "second"},
+    ])
+    unfinished = answer[:answer.index("second") + 3]
+
+    assert feed_all(unfinished, step=5).current() == ("b", "sec")
+
+
+def test_item_without_its_own_key_is_not_attributed_to_the_previous_one():
+    answer = '[{"endpoint_id": "a", "test_code": "first"}, {"test_code": "orphan'
+
+    assert feed_all(answer).current() == (None, "orphan")
+
+
+def test_markdown_fence_and_short_preamble_are_fine():
+    preview = feed_all('Here you go:\n```json\n{"test_code": "x')
+    assert preview.malformed is None
+    assert preview.current() == (None, "x")
+
+
+def test_prose_instead_of_json_is_flagged_early():
+    preview = feed_all("I'm sorry, I can't help with that. " * 20)
+    assert preview.malformed
+
+
+def test_json_without_the_field_is_flagged():
+    preview = feed_all(json.dumps({"description": "x" * 5000}), step=50)
+    assert preview.malformed
+
+
+class SlowRedis:
+    """Async Redis stand-in whose publishes take `delay` seconds (or fail)."""
+    def __init__(self, delay=0.05, fail=False):
+        self.delay, self.fail, self.published, self.closed = delay, fail, [], False
+
+    async def publish(self, channel, message):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("redis is down")
+        self.published.append(json.loads(message))
+
+    async def close(self):
+        self.closed = True
+
+
+def use_redis(monkeypatch, client):
+    monkeypatch.setattr(dispatcher.redis, "from_url", lambda url, **kwargs: client)
+    return client
+
+
+def test_previews_never_block_and_only_the_latest_waits(monkeypatch):
+    redis = use_redis(monkeypatch, SlowRedis())
+    publisher = PreviewPublisher()
+
+    async def stream():
+        start = time.perf_counter()
+        for n in range(50):
+            publisher.offer("p", "ep1", {"test_code": f"v{n}"})
+            publisher.offer("p", "ep2", {"test_code": f"w{n}"})
+        offered = time.perf_counter() - start
+        await asyncio.sleep(0.2)
+        await publisher.close()
+        return offered
+
+    offered = asyncio.run(stream())
+
+    assert offered < 0.05 # 100 offers, each publish takes 50ms
+    codes = [message["data"]["test_code"] for message in redis.published]
+    # Publisher behind: stale previews were replaced, the latest of each endpoint made it
+    assert set(codes[-2:]) == {"v49", "w49"}
+    assert len(codes) < 10 and publisher.dropped == 100 - len(codes)
+    assert redis.closed
+
+
+def test_pending_previews_are_capped(monkeypatch):
+    use_redis(monkeypatch, SlowRedis())
+    monkeypatch.setattr(settings, "STREAM_PREVIEW_MAX_PENDING", 3)
+    publisher = PreviewPublisher()
+
+    async def stream():
+        for n in range(10):
+            publisher.offer("p", f"ep{n}", {"test_code": "x"})
+        pending = len(publisher._pending)
+        await publisher.close()
+        return pending
+
+    assert asyncio.run(stream()) == 3
+    assert publisher.dropped == 7
+
+
+def test_redis_failures_drop_previews_without_raising(monkeypatch):
+    use_redis(monkeypatch, SlowRedis(delay=0, fail=True))
+    publisher = PreviewPublisher()
+
+    async def stream():
+        publisher.offer("p", "ep1", {"test_code": "x"})
+        publisher.offer("p", "ep2", {"test_code": "y"})
+        await asyncio.sleep(0.05)
+        await publisher.close()
+
+    asyncio.run(stream())
+
+    assert publisher.sent == 0 and publisher.dropped == 2
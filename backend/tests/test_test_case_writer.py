@@ -0,0 +1,86 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.services import test_case_writer
+from app.services.test_case_writer import BufferedTestCaseWriter
+
+
+class FakeSession:
+    opened = 0
+
+    async def __aenter__(self):
+        FakeSession.opened += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def records(monkeypatch):
+    calls = []
+
+    async def record(db, job_id, generated, failed):
+        calls.append((dict(generated), dict(failed)))
+        return len(generated)
+
+    monkeypatch.setattr(test_case_writer.GenerationJobService, "record", staticmethod(record))
+    FakeSession.opened = 0
+    return calls
+
+
+def make_writer(**kwargs):
+    return BufferedTestCaseWriter(uuid.uuid4(), session_maker=FakeSession, **kwargs)
+
+
+def test_rows_are_written_once_the_buffer_is_full(records):
+    async def run():
+        writer = make_writer(max_rows=3, max_seconds=60)
+        await writer.add({"a": {}, "b": {}}, {})
+        assert records == []
+        await writer.add({"c": {}}, {"d": "boom"})
+        assert writer.pending == 0
+        await writer.add({"e": {}}, {})
+        return await writer.close()
+
+    assert asyncio.run(run()) == 4
+    assert [sorted(generated) for generated, _ in records] == [["a", "b", "c"], ["e"]]
+    assert records[0][1] == {"d": "boom"}
+    # One session per flush, none while rows are only buffered
+    assert FakeSession.opened == 2
+
+
+def test_old_rows_are_written_without_waiting_for_more(records):
+    async def run():
+        writer = make_writer(max_rows=100, max_seconds=0.05)
+        await writer.add({"a": {}}, {})
+        await asyncio.sleep(0.2)
+        assert writer.pending == 0
+        return await writer.close()
+
+    assert asyncio.run(run()) == 1
+    assert len(records) == 1
+
+
+def test_failed_flush_keeps_the_rows_for_the_next_one(monkeypatch, records):
+    attempts = []
+
+    async def flaky(db, job_id, generated, failed):
+        attempts.append(sorted(generated))
+        if len(attempts) == 1:
+            raise RuntimeError("db down")
+        return len(generated)
+
+    monkeypatch.setattr(test_case_writer.GenerationJobService, "record", staticmethod(flaky))
+
+    async def run():
+        writer = make_writer(max_rows=2, max_seconds=60)
+        with pytest.raises(RuntimeError):
+            await writer.add({"a": {}, "b": {}}, {})
+        await writer.add({"c": {}}, {})
+        return await writer.close()
+
+    assert asyncio.run(run()) == 3
+    assert attempts == [["a", "b"], ["a", "b", "c"]]
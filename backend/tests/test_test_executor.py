@@ -0,0 +1,125 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.services.test_run_service import TestRunService
+from app.utils.test_executor import TestExecutor, ExecutorUnavailable, run_case
+
+
+@pytest.fixture
+def api():
+    """A local API that answers every GET with the path it received."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = self.path.encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_statuses():
+    assert run_case("def test_ok():\n    assert 1 + 1 == 2\n", 5)["status"] == "PASSED"
+    assert run_case("class TestThing:\n    def test_ok(self):\n        pass\n", 5)["status"] == "PASSED"
+    assert run_case("import asyncio\nasync def test_ok():\n    await asyncio.sleep(0)\n", 5)["status"] == "PASSED"
+
+    failed = run_case("def test_bad():\n    assert 1 == 2\n", 5)
+    assert failed["status"] == "FAILED"
+    assert "AssertionError" in failed["error"]
+
+    assert run_case("def test_broken(:\n", 5)["status"] == "ERROR"
+    assert run_case("x = 1\n", 5)["status"] == "ERROR"
+    assert run_case("def test_exit():\n    raise SystemExit(1)\n", 5)["status"] == "ERROR"
+    assert run_case("import pytest\ndef test_skip():\n    pytest.skip('later')\n", 5)["status"] == "SKIPPED"
+
+
+def test_fixtures_are_reported_not_crashed():
+    result = run_case("def test_needs(client):\n    pass\n", 5)
+    assert result["status"] == "ERROR"
+    assert "client" in result["error"]
+
+
+def test_timeout():
+    result = run_case("import time\ndef test_slow():\n    time.sleep(5)\n", 0.2)
+    assert result["status"] == "TIMEOUT"
+    assert result["duration_ms"] < 2000
+
+
+def test_error_is_truncated_to_its_end():
+    result = run_case("def test_long():\n    raise ValueError('x' * 5000 + 'END')\n", 5, max_error_chars=100)
+    assert len(result["error"]) == 103
+    assert result["error"].rstrip().endswith("END")
+
+
+def results_of(cases, base_url=None, **kwargs):
+    return [result for batch in TestExecutor.iter_results(cases, base_url, 5, **kwargs) for result in batch]
+
+
+def test_tests_are_pointed_at_the_base_url(api):
+    code = (
+        "import httpx\n"
+        "def test_users():\n"
+        "    response = httpx.get('http://localhost:8000/users?page=2')\n"
+        "    assert response.text == '/v1/users?page=2', response.text\n"
+    )
+    [result] = results_of([("t1", code)], api + "/v1")
+    assert result["status"] == "PASSED", result["error"]
+
+    # Only the test processes are redirected
+    assert httpx.get(api + "/direct").text == "/direct"
+
+
+def test_tests_never_run_in_the_callers_process(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql://secret")
+    handle_request = httpx.HTTPTransport.handle_request
+    code = (
+        "import os, httpx\n"
+        "def test_isolated():\n"
+        f"    assert os.getpid() != {os.getpid()}\n"
+        "    assert 'DATABASE_URL' not in os.environ\n"
+        "    assert not os.path.exists('.env') and os.listdir('.') == []\n"
+        "    os.environ['LEAKED'] = '1'\n"
+        "    httpx.LEAKED = True\n"
+    )
+    # A small run (one chunk) gets a test process too
+    [result] = results_of([("t1", code)], workers=1, chunk_size=10)
+    assert result["status"] == "PASSED", result["error"]
+    assert "LEAKED" not in os.environ
+    assert not hasattr(httpx, "LEAKED")
+    assert httpx.HTTPTransport.handle_request is handle_request
+
+
+def test_no_test_process_fails_instead_of_running_here(monkeypatch):
+    def no_processes(*args, **kwargs):
+        raise AssertionError("daemonic processes are not allowed to have children")
+        yield
+
+    monkeypatch.setattr(TestExecutor, "iter_parallel", no_processes)
+    with pytest.raises(ExecutorUnavailable):
+        results_of([("t1", "def test_ok():\n    pass\n")])
+
+
+def test_results_cover_every_case():
+    cases = [(f"t{i}", "def test_ok():\n    pass\n" if i % 2 else "def test_bad():\n    assert False\n") for i in range(25)]
+    results = results_of(cases, workers=2, chunk_size=10)
+    assert sorted(result["test_case_id"] for result in results) == sorted(case_id for case_id, _ in cases)
+    assert TestRunService.count(results) == {"passed": 12, "failed": 13, "errors": 0, "skipped": 0}
+
+
+def test_pass_rate_leaves_skipped_tests_out():
+    assert TestRunService.pass_rate(3, 1, 0) == 75.0
+    assert TestRunService.pass_rate(1, 1, 1) == 33.3
+    assert TestRunService.pass_rate(0, 0, 0) is None
@@ -11,8 +11,8 @@ export const analyticsApi = {
         return response.data;
     },
 
-    getAIEfficiency: async () => {
-        const response = await client.get('/analytics/ai-efficiency');
+    getAIEfficiency: async (window = '7d') => {
+        const response = await client.get('/analytics/ai-efficiency', { params: { window } });
         return response.data;
     },
 };
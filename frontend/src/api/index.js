@@ -4,3 +4,4 @@ export { endpointsApi } from './endpoints.api';
 export { testsApi } from './tests.api';
 export { analyticsApi } from './analytics.api';
 export { apiKeysApi } from './apiKeys.api';
+export { runsApi } from './runs.api';
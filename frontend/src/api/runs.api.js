@@ -0,0 +1,24 @@
+import client from './client';
+
+export const runsApi = {
+    list: async (projectId) => {
+        const response = await client.get(`/projects/${projectId}/runs`);
+        return response.data;
+    },
+
+    // status: only results with this status (e.g. 'FAILED')
+    get: async (projectId, runId, status) => {
+        const response = await client.get(`/projects/${projectId}/runs/${runId}`, {
+            params: status ? { status } : undefined,
+        });
+        return response.data;
+    },
+
+    // testCaseIds omitted: every test of the project
+    start: async (projectId, testCaseIds) => {
+        const response = await client.post(`/projects/${projectId}/runs`, {
+            testCaseIds,
+        });
+        return response.data;
+    },
+};
@@ -22,4 +22,12 @@ export const testsApi = {
         const response = await client.post(`/projects/${projectId}/tests/${testCaseId}/heal`);
         return response.data;
     },
+
+    // testCaseIds omitted: every test of the project that needs healing
+    healMany: async (projectId, testCaseIds) => {
+        const response = await client.post(`/projects/${projectId}/tests/heal`, {
+            testCaseIds,
+        });
+        return response.data;
+    },
 };